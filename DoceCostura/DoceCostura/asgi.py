@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DoceCostura.settings')
 
 application = get_asgi_application()
+
+# Índice de sugestões (autocomplete) montado antes da primeira requisição
+from product.suggest import suggest_index  # noqa: E402
+
+suggest_index.ensure_ready()
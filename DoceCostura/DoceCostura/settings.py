@@ -81,8 +81,20 @@ WSGI_APPLICATION = 'DoceCostura.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Sem DB_ENGINE, SQLite local. O serviço principal, o payment_worker e o
+# payment_reconciler precisam do mesmo banco (DB_* no docker-compose): a fila
+# de pagamentos e a conciliação trabalham sobre os pedidos do serviço.
+DB_ENGINE = os.environ.get('DB_ENGINE', '')
+
 DATABASES = {
     'default': {
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME', ''),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+    } if DB_ENGINE else {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
@@ -134,7 +146,101 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Configurações do microserviço de autenticação
 AUTH_SERVICE_URL = os.environ.get('AUTH_SERVICE_URL', 'http://auth_service:8000/api/auth')
-AUTH_VALIDATE_TOKEN_ENDPOINT = f"{AUTH_SERVICE_URL}/api/auth/token/validate"
+AUTH_VALIDATE_TOKEN_ENDPOINT = f"{AUTH_SERVICE_URL}/token/validate/"
+AUTH_AUTHORIZE_ENDPOINT = f"{AUTH_SERVICE_URL}/authorize/"
+
+# Verificação local dos access tokens emitidos pelo auth_service (SimpleJWT).
+# HS256: SIGNING_KEY deve ser a mesma chave de assinatura do auth_service.
+# RS256/ES256: VERIFYING_KEY recebe a chave pública publicada pelo auth_service.
+# Sem nenhuma das chaves, cada token é validado no auth_service (comportamento antigo).
+# REMOTE_CHECK: além da verificação local, consulta o auth_service para
+# detectar tokens revogados (se ele estiver fora do ar, vale a verificação local).
+AUTH_JWT = {
+    'ALGORITHM': os.environ.get('AUTH_JWT_ALGORITHM', 'HS256'),
+    'SIGNING_KEY': os.environ.get('AUTH_JWT_SIGNING_KEY', ''),
+    'VERIFYING_KEY': os.environ.get('AUTH_JWT_VERIFYING_KEY', ''),
+    'LEEWAY': 0,
+    'USER_ID_CLAIM': 'user_id',
+    'TOKEN_TYPE_CLAIM': 'token_type',
+    'REMOTE_CHECK': os.environ.get('AUTH_JWT_REMOTE_CHECK', 'False') == 'True',
+}
+
+# Cache em memória dos resultados de validação e autorização de tokens
+# (CACHES[CACHE_ALIAS]). Nenhuma entrada positiva passa do exp do token nem
+# de MAX_TTL segundos; tokens inválidos ficam em cache negativo por
+# NEGATIVE_TTL segundos.
+# As revogações avisadas pelo auth_service (logout, usuário desativado ou
+# troca de senha) ficam no cache 'default', compartilhado com CACHE_LOCATION;
+# USER_REVOCATION_TTL precisa cobrir a validade do access token.
+AUTH_TOKEN_CACHE = {
+    'CACHE_ALIAS': 'tokens',
+    'MAX_TTL': 300,
+    'NEGATIVE_TTL': 30,
+    'USER_REVOCATION_TTL': 3600,
+}
+
+# Cache dos payloads do catálogo (ex.: produtos por categoria da página inicial).
+# Invalidado a cada escrita em produtos/categorias; TIMEOUT cobre alterações
+# feitas com queryset.update(), que não disparam sinais.
+# SNAPSHOT: listagens de produtos, destaques e categorias respondidas pelo
+# catálogo em memória de cada processo (product.snapshot), refeito quando a
+# versão do catálogo muda. A versão fica no cache 'default', que precisa ser
+# compartilhado entre os processos (Redis em CACHE_LOCATION).
+# LOCAL_VERSION_TTL: sem CACHE_LOCATION, a versão de cada processo expira
+# nesse prazo (segundos), o que limita o atraso de escritas feitas em outro
+# processo (outro worker, manage.py import_products).
+CATALOG_CACHE = {
+    'TIMEOUT': 300,
+    'PRODUCTS_PER_CATEGORY': 10,
+    'SNAPSHOT': True,
+    'LOCAL_VERSION_TTL': 30,
+}
+
+# Importação de produtos em lote (bulk_upsert e manage.py import_products).
+# Cada lote de BATCH_SIZE linhas é gravado com um INSERT ... ON CONFLICT (sku);
+# a resposta lista até MAX_ERRORS linhas inválidas.
+PRODUCT_IMPORT = {
+    'BATCH_SIZE': 500,
+    'MAX_ERRORS': 1000,
+}
+
+# Armazenamento do carrinho ativo (product.cart_storage). DatabaseCartStorage
+# grava cada alteração em Cart/CartItem; CacheCartStorage mantém os itens no
+# cache CACHE_ALIAS e só grava no checkout e em manage.py flush_carts.
+# O cache precisa ser compartilhado entre os processos (Redis em CART_CACHE_LOCATION).
+CART_STORAGE = {
+    'BACKEND': os.environ.get('CART_STORAGE_BACKEND', 'product.cart_storage.DatabaseCartStorage'),
+    'CACHE_ALIAS': 'carts',
+    'KEY_PREFIX': 'cart',
+    'TIMEOUT': 7 * 24 * 3600,
+    'LOCK_TIMEOUT': 5,
+}
+
+CART_CACHE_LOCATION = os.environ.get('CART_CACHE_LOCATION', '')
+
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_LOCATION,
+    } if CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CART_CACHE_LOCATION,
+    } if CART_CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'carts',
+    },
+    # Validação de tokens (AUTH_TOKEN_CACHE): sempre no processo, sem rede
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
 
 # Configurações dos gateways de pagamento
 # Stripe (cartão de crédito)
@@ -146,11 +252,56 @@ STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
 MERCADOPAGO_PUBLIC_KEY = os.environ.get('MERCADOPAGO_PUBLIC_KEY', '')
 MERCADOPAGO_ACCESS_TOKEN = os.environ.get('MERCADOPAGO_ACCESS_TOKEN', '')
 MERCADOPAGO_USER_ID = os.environ.get('MERCADOPAGO_USER_ID', '')
+MERCADOPAGO_WEBHOOK_SECRET = os.environ.get('MERCADOPAGO_WEBHOOK_SECRET', '')
 
 # PagHiper (Boleto)
 PAGHIPER_API_KEY = os.environ.get('PAGHIPER_API_KEY', '')
 PAGHIPER_TOKEN = os.environ.get('PAGHIPER_TOKEN', '')
 
+# Webhooks dos gateways (payment/webhooks/<gateway>/): devem apontar direto para
+# este serviço, pois a assinatura é calculada sobre o corpo original da requisição.
+# Com o webhook de um gateway configurado, check_status apenas lê o banco.
+# PagHiper não assina as notificações: a apiKey é conferida e o status é
+# confirmado na API da PagHiper.
+
+# Timeout (conexão, leitura) em segundos das chamadas HTTP aos gateways
+PAYMENT_GATEWAY_TIMEOUT = (3.05, 20)
+
+# Clientes dos gateways (payment.providers): um por processo, com pool de
+# POOL_SIZE conexões HTTP. BACKEND='stub' troca os gateways por um provedor
+# local com latência STUB_LATENCY e status final STUB_STATUS (sem rede).
+PAYMENT_PROVIDERS = {
+    'BACKEND': os.environ.get('PAYMENT_PROVIDER_BACKEND', 'live'),
+    'POOL_SIZE': 10,
+    'STUB_LATENCY': 0.05,
+    'STUB_STATUS': 'approved',
+}
+
+# Fila de pagamentos (payment.jobs), processada por manage.py run_payment_worker.
+# Falhas temporárias do gateway são tentadas de novo com backoff exponencial
+# (BACKOFF_BASE * 2^tentativa, até BACKOFF_MAX segundos, com jitter).
+# Jobs em execução há mais de LOCK_TIMEOUT segundos (worker encerrado) voltam à fila.
+PAYMENT_JOBS = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 600,
+    'LOCK_TIMEOUT': 300,
+    'BATCH_SIZE': 10,
+    'POLL_INTERVAL': 1,
+}
+
+# Conciliação dos pagamentos pendentes (manage.py reconcile_payments).
+# Consulta pagamentos com idade entre MIN_AGE e MAX_AGE segundos, WORKERS
+# consultas simultâneas e RATE_LIMITS requisições por segundo em cada gateway.
+PAYMENT_RECONCILER = {
+    'METHODS': ['credit_card', 'pix', 'boleto'],
+    'MIN_AGE': 60,
+    'MAX_AGE': 7 * 24 * 3600,
+    'BATCH_SIZE': 200,
+    'WORKERS': 8,
+    'RATE_LIMITS': {'credit_card': 20, 'pix': 10, 'boleto': 5},
+}
+
 # Configurações CORS
 CORS_ALLOW_ALL_ORIGINS = True  # Apenas para desenvolvimento!
 
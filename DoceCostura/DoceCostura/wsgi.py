@@ -4,4 +4,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DoceCostura.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Índice de sugestões (autocomplete) montado antes da primeira requisição
+from product.suggest import suggest_index  # noqa: E402
+
+suggest_index.ensure_ready()
@@ -0,0 +1,159 @@
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from product.catalog import bump_catalog_version
+from product.models import Cart, CartItem, Product
+from .jobs import PaymentJobQueue
+from .models import Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    """Checkout recusado; status_code é o código HTTP sugerido para a resposta."""
+
+    def __init__(self, message, status_code=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or {}
+
+
+class CheckoutService:
+    """
+    Converte o carrinho ativo do usuário em pedido dentro de uma única transação:
+
+    1. Reserva o carrinho (UPDATE ... WHERE is_active), o que impede dois
+       checkouts do mesmo carrinho.
+    2. Bloqueia as linhas dos produtos em um único SELECT ... FOR UPDATE,
+       sempre na ordem do id para não haver deadlock entre checkouts.
+    3. Baixa o estoque de todos os produtos em um único UPDATE com F().
+    4. Grava o pedido e todos os itens (bulk_create).
+    5. Registra o pagamento pendente e enfileira o envio ao gateway
+       (payment.jobs), que acontece fora da requisição.
+
+    Qualquer falha desfaz tudo, inclusive a reserva do carrinho.
+    """
+
+    @staticmethod
+    def checkout(user_id, checkout_data):
+        """
+        Returns:
+            O pedido criado (itens em order.created_items e pagamento
+            pendente em order.pending_payment)
+
+        Raises:
+            CheckoutError se o carrinho não existir, estiver vazio ou algum
+            produto não tiver estoque suficiente
+        """
+        cart_id = (
+            Cart.objects
+            .filter(user_id=user_id, is_active=True)
+            .values_list('id', flat=True)
+            .first()
+        )
+        if cart_id is None:
+            raise CheckoutError('Carrinho não encontrado', status_code=404)
+
+        with transaction.atomic():
+            # A primeira instrução da transação é uma escrita: no PostgreSQL
+            # bloqueia a linha do carrinho; no SQLite já reserva o banco para escrita
+            claimed = Cart.objects.filter(pk=cart_id, is_active=True).update(
+                is_active=False,
+                updated_at=timezone.now()
+            )
+            if not claimed:
+                raise CheckoutError('Carrinho já finalizado por outro checkout', status_code=409)
+
+            quantities = dict(
+                CartItem.objects.filter(cart_id=cart_id).values_list('product_id', 'quantity')
+            )
+            if not quantities:
+                raise CheckoutError('Carrinho está vazio')
+
+            products = list(
+                Product.objects
+                .select_for_update()
+                .filter(id__in=quantities)
+                .order_by('id')
+                .only('id', 'name', 'price', 'stock', 'is_active')
+            )
+            CheckoutService._check_availability(products, quantities)
+
+            CheckoutService._decrement_stock(quantities)
+            # update() não dispara sinais: o estoque vendido invalida o catálogo
+            # (ETag e catálogo em memória) só depois do commit
+            transaction.on_commit(bump_catalog_version)
+
+            subtotal = sum(
+                (product.price * quantities[product.id] for product in products),
+                Decimal('0')
+            )
+            shipping_fee = checkout_data.get('shipping_fee', 0)
+            discount = checkout_data.get('discount', 0)
+
+            order = Order.objects.create(
+                user_id=user_id,
+                shipping_address=checkout_data['address'],
+                shipping_city=checkout_data['city'],
+                shipping_state=checkout_data['state'],
+                shipping_zipcode=checkout_data['zipcode'],
+                subtotal=subtotal,
+                shipping_fee=shipping_fee,
+                discount=discount,
+                payment_method=checkout_data['payment_method'],
+                total=subtotal + shipping_fee - discount
+            )
+
+            order.created_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=product.id,
+                    product_name=product.name,
+                    quantity=quantities[product.id],
+                    price=product.price
+                )
+                for product in products
+            ])
+
+            order.pending_payment = PaymentJobQueue.enqueue(order, {
+                'payment_method': checkout_data['payment_method'],
+                **checkout_data.get('payment_details', {})
+            })
+
+        logger.info(f"Checkout do usuário {user_id}: pedido {order.order_number} com {len(products)} produtos")
+        return order
+
+    @staticmethod
+    def _check_availability(products, quantities):
+        """Valida, com as linhas já bloqueadas, se todos os produtos podem ser vendidos."""
+        found = {product.id: product for product in products}
+        unavailable = {}
+        for product_id, quantity in quantities.items():
+            product = found.get(product_id)
+            if product is None or not product.is_active:
+                unavailable[product_id] = 'Produto indisponível'
+            elif product.stock < quantity:
+                unavailable[product_id] = f'Estoque insuficiente (disponível: {product.stock})'
+
+        if unavailable:
+            raise CheckoutError(
+                'Alguns produtos não estão disponíveis na quantidade solicitada',
+                status_code=409,
+                details=unavailable
+            )
+
+    @staticmethod
+    def _decrement_stock(quantities):
+        """Baixa o estoque de todos os produtos em um único UPDATE."""
+        Product.objects.filter(id__in=quantities).update(
+            stock=F('stock') - Case(
+                *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+                output_field=IntegerField()
+            ),
+            updated_at=timezone.now()
+        )
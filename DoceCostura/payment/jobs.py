@@ -0,0 +1,217 @@
+import logging
+import random
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Payment, PaymentJob
+from .services import PaymentGatewayUnavailable, PaymentService
+
+logger = logging.getLogger(__name__)
+
+# Dados de cartão nunca são gravados na fila; o Stripe usa apenas o token
+SENSITIVE_PAYMENT_FIELDS = ('card_number', 'card_holder', 'expiry_date', 'cvv')
+
+
+def get_payment_jobs_settings():
+    config = {
+        'MAX_ATTEMPTS': 5,
+        'BACKOFF_BASE': 5,
+        'BACKOFF_MAX': 600,
+        'LOCK_TIMEOUT': 300,
+        'BATCH_SIZE': 10,
+        'POLL_INTERVAL': 1,
+    }
+    config.update(getattr(settings, 'PAYMENT_JOBS', {}))
+    return config
+
+
+class PaymentJobQueue:
+    """
+    Fila de pagamentos no banco de dados.
+
+    O checkout apenas registra o pagamento como pendente e enfileira um job;
+    o worker envia ao gateway, com novas tentativas e backoff em falhas
+    temporárias. A idempotency_key do job é repetida em todas as tentativas.
+    """
+
+    @staticmethod
+    def enqueue(order, payment_data):
+        """
+        Registra o pagamento pendente do pedido e o job que vai processá-lo.
+        Deve ser chamado na mesma transação que cria o pedido.
+
+        Se o pedido já tem um pagamento pendente na fila, devolve esse: um
+        envio repetido não gera um segundo job (nem uma segunda cobrança).
+        """
+        config = get_payment_jobs_settings()
+        existing = (
+            Payment.objects
+            .select_related('job')
+            .filter(order=order, status='pending', job__status__in=('queued', 'running'))
+            .first()
+        )
+        if existing is not None:
+            return existing
+
+        payment = Payment.objects.create(
+            order=order,
+            amount=order.total,
+            payment_method=payment_data.get('payment_method', order.payment_method),
+            status='pending'
+        )
+        payment.job = PaymentJob.objects.create(
+            payment=payment,
+            idempotency_key=uuid.uuid4().hex,
+            payload={
+                key: value for key, value in payment_data.items()
+                if key not in SENSITIVE_PAYMENT_FIELDS
+            },
+            max_attempts=config['MAX_ATTEMPTS']
+        )
+        return payment
+
+    @staticmethod
+    def claim(worker_id, limit):
+        """
+        Reserva até limit jobs prontos para execução.
+
+        A reserva é um UPDATE condicional por job, então dois workers nunca
+        pegam o mesmo job, em qualquer banco (inclusive SQLite).
+        """
+        config = get_payment_jobs_settings()
+        now = timezone.now()
+        stale_before = now - timedelta(seconds=config['LOCK_TIMEOUT'])
+        claimable = (
+            Q(status='queued', run_after__lte=now)
+            | Q(status='running', locked_at__lt=stale_before)
+        )
+
+        candidate_ids = list(
+            PaymentJob.objects
+            .filter(claimable)
+            .order_by('run_after')
+            .values_list('id', flat=True)[:limit]
+        )
+
+        claimed_ids = [
+            job_id for job_id in candidate_ids
+            if PaymentJob.objects.filter(claimable, id=job_id).update(
+                status='running',
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=F('attempts') + 1
+            )
+        ]
+        return list(
+            PaymentJob.objects
+            .select_related('payment__order')
+            .filter(id__in=claimed_ids)
+            .order_by('run_after')
+        )
+
+    @staticmethod
+    def get_backoff(attempts):
+        """Atraso até a próxima tentativa: exponencial, com teto e jitter."""
+        config = get_payment_jobs_settings()
+        delay = min(config['BACKOFF_MAX'], config['BACKOFF_BASE'] * 2 ** max(0, attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    @staticmethod
+    def process(job):
+        """Envia o pagamento do job ao gateway e registra o resultado."""
+        payment = job.payment
+
+        # Pagamento já resolvido (ex.: tentativa anterior concluída antes de o
+        # worker cair, ou webhook recebido): nada a enviar
+        if payment.status != 'pending' or payment.transaction_id:
+            PaymentJobQueue._finish(job, 'succeeded')
+            return
+
+        try:
+            result = PaymentService.execute_payment(
+                payment,
+                job.payload,
+                idempotency_key=job.idempotency_key
+            )
+        except PaymentGatewayUnavailable as e:
+            PaymentJobQueue._retry_or_fail(job, str(e))
+            return
+        except Exception as e:
+            logger.exception(f"Erro inesperado no job de pagamento {job.idempotency_key}")
+            PaymentJobQueue._retry_or_fail(job, str(e))
+            return
+
+        logger.info(
+            f"Pagamento {payment.id} processado (tentativa {job.attempts}): {result.get('message')}"
+        )
+        PaymentJobQueue._finish(job, 'succeeded')
+
+    @staticmethod
+    def _finish(job, status, error=None):
+        job.status = status
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = error
+        # O payload (ex.: token do cartão) não é mais necessário
+        job.payload = {}
+        job.save(update_fields=['status', 'locked_by', 'locked_at', 'last_error', 'payload', 'updated_at'])
+
+    @staticmethod
+    def _retry_or_fail(job, error):
+        if job.attempts >= job.max_attempts:
+            logger.error(f"Job de pagamento {job.idempotency_key} falhou após {job.attempts} tentativas: {error}")
+            payment = job.payment
+            payment.status = 'declined'
+            payment.transaction_data = {'error': error}
+            payment.save()
+            PaymentJobQueue._finish(job, 'failed', error)
+            return
+
+        delay = PaymentJobQueue.get_backoff(job.attempts)
+        logger.warning(
+            f"Job de pagamento {job.idempotency_key} (tentativa {job.attempts}) "
+            f"reagendado em {delay:.0f}s: {error}"
+        )
+        job.status = 'queued'
+        job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.locked_by = None
+        job.locked_at = None
+        job.last_error = error
+        job.save(update_fields=['status', 'run_after', 'locked_by', 'locked_at', 'last_error', 'updated_at'])
+
+    @staticmethod
+    def run_worker(worker_id, stop_event=None, once=False):
+        """
+        Laço de um worker: reserva lotes de jobs e os processa até stop_event
+        ser sinalizado (ou, com once=True, até a fila ficar vazia).
+
+        Returns:
+            Quantidade de jobs processados
+        """
+        config = get_payment_jobs_settings()
+        stop_event = stop_event or threading.Event()
+        processed = 0
+
+        try:
+            while not stop_event.is_set():
+                close_old_connections()
+                jobs = PaymentJobQueue.claim(worker_id, config['BATCH_SIZE'])
+                if not jobs:
+                    if once:
+                        break
+                    stop_event.wait(config['POLL_INTERVAL'])
+                    continue
+
+                for job in jobs:
+                    PaymentJobQueue.process(job)
+                    processed += 1
+        finally:
+            connection.close()
+
+        return processed
@@ -0,0 +1,172 @@
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test.runner import DiscoverRunner
+
+from payment.checkout import CheckoutError, CheckoutService
+from payment.models import Order, OrderItem
+from product.models import Cart, CartItem, Category, Product
+
+CHECKOUT_DATA = {
+    'address': 'Rua das Linhas, 10',
+    'city': 'São Paulo',
+    'state': 'SP',
+    'zipcode': '01000-000',
+    'payment_method': 'pix',
+    'shipping_fee': Decimal('0'),
+    'discount': Decimal('0'),
+}
+
+
+def legacy_checkout(user_id, checkout_data):
+    """Fluxo anterior do OrderViewSet.checkout: sem transação e com read-modify-write."""
+    cart = Cart.objects.get(user_id=user_id, is_active=True)
+    order = Order.objects.create(
+        user_id=user_id,
+        shipping_address=checkout_data['address'],
+        shipping_city=checkout_data['city'],
+        shipping_state=checkout_data['state'],
+        shipping_zipcode=checkout_data['zipcode'],
+        subtotal=cart.subtotal,
+        payment_method=checkout_data['payment_method'],
+        total=cart.subtotal
+    )
+    for cart_item in cart.items.all():
+        product = cart_item.product
+        OrderItem.objects.create(
+            order=order,
+            product_id=product.id,
+            product_name=product.name,
+            quantity=cart_item.quantity,
+            price=product.price
+        )
+        product.stock -= cart_item.quantity
+        product.save()
+    cart.is_active = False
+    cart.save()
+    return order
+
+
+class Command(BaseCommand):
+    help = (
+        'Checkouts paralelos disputando o estoque de um produto: mede '
+        'checkouts/s e verifica se houve venda acima do estoque (oversell).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=300,
+                            help='Total de checkouts (um carrinho por usuário)')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Checkouts simultâneos')
+        parser.add_argument('--stock', type=int, default=100,
+                            help='Estoque inicial do produto disputado')
+        parser.add_argument('--items', type=int, default=5,
+                            help='Itens por carrinho (o produto disputado e outros)')
+        parser.add_argument('--mode', choices=['both', 'atomic', 'legacy'], default='both')
+
+    def handle(self, *args, **options):
+        db_settings = connection.settings_dict
+        if db_settings['ENGINE'] == 'django.db.backends.sqlite3':
+            # Banco de teste em arquivo: o SQLite em memória não é compartilhado
+            # entre as threads; o timeout faz os escritores aguardarem a vez
+            handle, test_name = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            db_settings['TEST']['NAME'] = test_name
+            db_settings['OPTIONS']['timeout'] = 60
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            modes = ['legacy', 'atomic'] if options['mode'] == 'both' else [options['mode']]
+            for mode in modes:
+                self._run(mode, options)
+        finally:
+            connections.close_all()
+            runner.teardown_databases(old_config)
+
+    def _prepare(self, options):
+        OrderItem.objects.all().delete()
+        Order.objects.all().delete()
+        Cart.objects.all().delete()
+        Product.objects.all().delete()
+
+        category = Category.objects.get_or_create(name='Bench')[0]
+        hot = Product.objects.create(
+            name='Produto disputado', description='', price=Decimal('10.00'),
+            stock=options['stock'], category=category, sku='BENCH-HOT'
+        )
+        others = Product.objects.bulk_create([
+            Product(
+                name=f'Produto {i}', description='', price=Decimal('5.00'),
+                stock=1_000_000, category=category, sku=f'BENCH-{i}'
+            )
+            for i in range(50)
+        ])
+
+        carts = Cart.objects.bulk_create([Cart(user_id=user_id) for user_id in range(1, options['checkouts'] + 1)])
+        items = []
+        for cart in carts:
+            items.append(CartItem(cart=cart, product=hot, quantity=1))
+            for product in random.sample(others, options['items'] - 1):
+                items.append(CartItem(cart=cart, product=product, quantity=1))
+        CartItem.objects.bulk_create(items)
+        return hot
+
+    def _run(self, mode, options):
+        hot = self._prepare(options)
+        checkout = CheckoutService.checkout if mode == 'atomic' else legacy_checkout
+
+        pending = queue.Queue()
+        for user_id in range(1, options['checkouts'] + 1):
+            pending.put(user_id)
+
+        results = {'ok': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        user_id = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        checkout(user_id, CHECKOUT_DATA)
+                        outcome = 'ok'
+                    except CheckoutError:
+                        outcome = 'rejected'
+                    except Exception as e:
+                        self.stderr.write(f"Erro no checkout do usuário {user_id}: {str(e)}")
+                        outcome = 'errors'
+                    with lock:
+                        results[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        hot.refresh_from_db()
+        sold = OrderItem.objects.filter(product_id=hot.id).aggregate(total=Sum('quantity'))['total'] or 0
+        oversell = max(0, sold - options['stock'])
+        lost_updates = hot.stock - (options['stock'] - sold)
+
+        self.stdout.write(
+            f"{mode:6}: {options['checkouts'] / elapsed:8.1f} checkouts/s | "
+            f"ok {results['ok']} | recusados {results['rejected']} | erros {results['errors']} | "
+            f"vendidos {sold}/{options['stock']} | estoque final {hot.stock} | "
+            f"oversell {oversell} | baixas perdidas {lost_updates}"
+        )
@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+from django.core.management.base import BaseCommand
+
+from payment import providers
+from payment.providers import PagHiperProvider
+
+STATUS_RESPONSE = json.dumps({'result': 'success', 'status': {'status': 'pending'}}).encode()
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """Gateway local: responde a qualquer POST com um status de boleto."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(STATUS_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STATUS_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara, contra um gateway HTTP local, chamadas com requests.post '
+        '(uma conexão por chamada) e com o cliente do registro de provedores '
+        '(sessão com pool de conexões).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calls', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), GatewayHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        try:
+            def cold_call():
+                # Fluxo anterior: requests.post sem sessão
+                requests.post(
+                    f'{base_url}/transaction/status/',
+                    data=json.dumps({'apiKey': '', 'token': '', 'transaction_id': 'X'}),
+                    headers={'Content-Type': 'application/json'},
+                    timeout=(3.05, 20)
+                ).json()
+
+            with mock.patch.object(providers, 'PAGHIPER_API_URL', base_url):
+                provider = PagHiperProvider('', '', (3.05, 20), options['threads'])
+                self._run('requests.post', cold_call, options)
+                self._run('registro', lambda: provider.transaction_status('X').json(), options)
+        finally:
+            server.shutdown()
+
+    def _run(self, label, call, options):
+        per_thread = options['calls'] // options['threads']
+
+        def worker():
+            for _ in range(per_thread):
+                call()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = per_thread * options['threads']
+        self.stdout.write(
+            f"{label:14}: {total / elapsed:8.1f} chamadas/s | {elapsed / total * 1000 * options['threads']:6.2f} ms por chamada"
+        )
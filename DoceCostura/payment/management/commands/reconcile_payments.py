@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from payment.reconciler import PaymentReconciler
+
+
+class Command(BaseCommand):
+    help = (
+        'Concilia os pagamentos pendentes consultando os gateways em paralelo '
+        '(com limite de requisições por gateway) e grava os status em lote.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', action='append', dest='methods',
+                            choices=['credit_card', 'pix', 'boleto'],
+                            help='Método de pagamento a conciliar (pode repetir; padrão: todos)')
+        parser.add_argument('--min-age', type=int,
+                            help='Só pagamentos criados há pelo menos N segundos')
+        parser.add_argument('--max-age', type=int,
+                            help='Ignora pagamentos criados há mais de N segundos')
+        parser.add_argument('--workers', type=int,
+                            help='Consultas simultâneas aos gateways')
+        parser.add_argument('--limit', type=int,
+                            help='Máximo de pagamentos consultados por execução')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repete a conciliação a cada N segundos (0 executa uma vez)')
+
+    def handle(self, *args, **options):
+        reconciler = PaymentReconciler(
+            methods=options['methods'],
+            min_age=options['min_age'],
+            max_age=options['max_age'],
+            workers=options['workers']
+        )
+
+        while True:
+            close_old_connections()
+            stats = reconciler.run(limit=options['limit'])
+            by_method = ', '.join(f'{method} {count}' for method, count in stats['by_method'].items())
+            self.stdout.write(
+                f"{stats['checked']} consultados ({by_method}) | {stats['changed']} alterados | "
+                f"{stats['approved']} pedidos pagos | {stats['unavailable']} gateway indisponível | "
+                f"{stats['errors']} erros | {stats['elapsed']:.2f}s ({stats['throughput']:.1f}/s)"
+            )
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
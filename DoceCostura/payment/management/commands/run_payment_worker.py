@@ -0,0 +1,47 @@
+import os
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+
+from payment.jobs import PaymentJobQueue
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de pagamentos (PaymentJob), enviando os pagamentos aos gateways.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Threads processando jobs em paralelo')
+        parser.add_argument('--once', action='store_true',
+                            help='Processa os jobs prontos e encerra (útil em cron ou testes)')
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        processed = []
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+        def work(index):
+            processed.append(
+                PaymentJobQueue.run_worker(f"{prefix}:{index}", stop_event, once=options['once'])
+            )
+
+        threads = [
+            threading.Thread(target=work, args=(index,), daemon=True)
+            for index in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(f"{options['workers']} workers de pagamento iniciados ({prefix})")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            # Termina o job em andamento e encerra
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(f"{sum(processed)} jobs de pagamento processados")
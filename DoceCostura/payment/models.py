@@ -1,3 +1,4 @@
+import random
 from decimal import Decimal
 from django.db import models
 from django.utils import timezone
@@ -44,6 +45,12 @@ class Order(models.Model):
     payment_id = models.CharField(max_length=100, blank=True, null=True)  # ID da transação no gateway
     paid_at = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # Pedidos do usuário, paginados por cursor (docecostura_common.pagination)
+            models.Index(fields=('user_id', 'created_at', 'id'), name='order_user_created'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.order_number}"
     
@@ -60,8 +67,9 @@ class Order(models.Model):
     
     def _generate_order_number(self):
         # Cria um número de pedido único baseado na data e ID
+        # (8 dígitos aleatórios: vários checkouts simultâneos no mesmo minuto)
         timestamp = timezone.now().strftime('%Y%m%d%H%M')
-        random_suffix = ''.join([str(random.randint(0, 9)) for _ in range(4)])
+        random_suffix = ''.join([str(random.randint(0, 9)) for _ in range(8)])
         return f"{timestamp}{random_suffix}"
     
     def mark_as_paid(self, payment_id):
@@ -99,5 +107,76 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=('order', 'created_at', 'id'), name='payment_order_created'),
+        ]
+    
     def __str__(self):
         return f"Payment {self.transaction_id} for Order #{self.order.order_number}"
+    
+    @property
+    def status_etag(self):
+        """ETag da representação de status: muda a cada gravação do pagamento."""
+        return f'"{self.pk}-{self.status}-{int(self.updated_at.timestamp() * 1000000)}"'
+
+
+class PaymentJob(models.Model):
+    """
+    Fila de envio de pagamentos aos gateways, processada pelo worker
+    (manage.py run_payment_worker) fora da requisição de checkout.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Na fila'),
+        ('running', 'Em execução'),
+        ('succeeded', 'Concluído'),
+        ('failed', 'Falhou'),
+    )
+    
+    payment = models.OneToOneField(Payment, related_name='job', on_delete=models.CASCADE)
+    idempotency_key = models.CharField(max_length=64, unique=True)  # Repetida em cada tentativa no gateway
+    payload = models.JSONField(default=dict)  # Dados do pagamento, sem dados de cartão
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)  # Próxima tentativa (backoff)
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=('status', 'run_after')),
+        ]
+    
+    def __str__(self):
+        return f"Job {self.idempotency_key} ({self.status})"
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Eventos recebidos dos gateways. A unicidade (provider, event_id) descarta
+    reenvios do mesmo evento.
+    """
+    PROVIDER_CHOICES = (
+        ('stripe', 'Stripe'),
+        ('mercadopago', 'MercadoPago'),
+        ('paghiper', 'PagHiper'),
+    )
+    
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    event_id = models.CharField(max_length=100)
+    event_type = models.CharField(max_length=100, blank=True)
+    payment = models.ForeignKey(Payment, related_name='webhook_events', null=True, blank=True, on_delete=models.SET_NULL)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('provider', 'event_id'), name='unique_webhook_event'),
+        ]
+    
+    def __str__(self):
+        return f"{self.provider} {self.event_id}"
@@ -0,0 +1,279 @@
+import json
+import logging
+import threading
+import time
+import uuid
+
+import mercadopago
+import requests
+import stripe
+from django.conf import settings
+from mercadopago.config import RequestOptions
+from mercadopago.http.http_client import HttpClient
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PAGHIPER_API_URL = 'https://api.paghiper.com'
+
+
+def get_payment_providers_settings():
+    config = {
+        'BACKEND': 'live',
+        'POOL_SIZE': 10,
+        'STUB_LATENCY': 0.05,
+        'STUB_STATUS': 'approved',
+    }
+    config.update(getattr(settings, 'PAYMENT_PROVIDERS', {}))
+    return config
+
+
+def build_session(pool_size):
+    """Sessão HTTP com pool de conexões (keep-alive) e sem novas tentativas automáticas."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class PooledHttpClient(HttpClient):
+    """
+    HttpClient do SDK do MercadoPago com uma sessão compartilhada: o cliente
+    padrão abre uma sessão (e um handshake TLS) por requisição. As novas
+    tentativas ficam com a fila de pagamentos, então maxretries é ignorado.
+    """
+
+    def __init__(self, session, timeout):
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        # RequestOptions só aceita um timeout único; aqui vale o (conexão, leitura)
+        kwargs['timeout'] = self.timeout
+        api_result = self.session.request(method, url, **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                logger.warning(f"Resposta inválida do MercadoPago ({api_result.status_code})")
+
+        return response
+
+
+class StripeProvider:
+    """Cliente do Stripe (API de Charges); o RequestsClient mantém uma sessão por thread."""
+
+    def __init__(self, api_key, timeout):
+        self.client = stripe.StripeClient(
+            api_key,
+            http_client=stripe.RequestsClient(timeout=timeout),
+            max_network_retries=0
+        )
+
+    def create_charge(self, params, idempotency_key=None):
+        options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+        return self.client.charges.create(params=params, options=options)
+
+    def retrieve_charge(self, charge_id):
+        return self.client.charges.retrieve(charge_id)
+
+
+class MercadoPagoProvider:
+    """Cliente do MercadoPago; retorna o dict {'status', 'response'} do SDK."""
+
+    def __init__(self, access_token, timeout, pool_size):
+        self.sdk = mercadopago.SDK(
+            access_token,
+            http_client=PooledHttpClient(build_session(pool_size), timeout)
+        )
+
+    def _options(self, idempotency_key=None):
+        custom_headers = {'x-idempotency-key': idempotency_key} if idempotency_key else None
+        return RequestOptions(custom_headers=custom_headers)
+
+    def create_payment(self, payment_object, idempotency_key=None):
+        return self.sdk.payment().create(payment_object, self._options(idempotency_key))
+
+    def get_payment(self, payment_id):
+        return self.sdk.payment().get(payment_id, self._options())
+
+
+class PagHiperProvider:
+    """Cliente da API de boletos da PagHiper; retorna a requests.Response."""
+
+    def __init__(self, api_key, token, timeout, pool_size):
+        self.api_key = api_key
+        self.token = token
+        self.timeout = timeout
+        self.session = build_session(pool_size)
+        self.session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+
+    def _post(self, path, payload):
+        return self.session.post(
+            f'{PAGHIPER_API_URL}{path}',
+            data=json.dumps({'apiKey': self.api_key, **payload}),
+            timeout=self.timeout
+        )
+
+    def create_transaction(self, payload):
+        return self._post('/transaction/create/', payload)
+
+    def transaction_status(self, transaction_id):
+        return self._post('/transaction/status/', {
+            'token': self.token,
+            'transaction_id': transaction_id
+        })
+
+    def confirm_notification(self, transaction_id, notification_id):
+        return self._post('/transaction/notification/', {
+            'token': self.token,
+            'transaction_id': transaction_id,
+            'notification_id': notification_id
+        })
+
+
+class StubResponse:
+    """Resposta HTTP mínima (status_code e json()) devolvida pelo provedor local."""
+
+    def __init__(self, data, status_code=201):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+class StubProvider:
+    """
+    Provedor local que simula os três gateways sem acessar a rede, com
+    latência fixa (STUB_LATENCY). Usado em desenvolvimento e benchmarks.
+    Todos os pagamentos terminam com o status STUB_STATUS.
+    """
+
+    def __init__(self, latency, status):
+        self.latency = latency
+        self.approved = status == 'approved'
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _new_id(self, prefix=''):
+        return f'{prefix}{uuid.uuid4().hex[:24]}'
+
+    # Stripe
+
+    def _charge(self, charge_id):
+        return stripe.Charge.construct_from({
+            'id': charge_id,
+            'object': 'charge',
+            'status': 'succeeded' if self.approved else 'failed',
+            'payment_method_details': {'card': {'last4': '4242', 'brand': 'visa'}},
+            'outcome': {'type': 'authorized', 'seller_message': 'Pagamento simulado'},
+        }, None)
+
+    def create_charge(self, params, idempotency_key=None):
+        self._wait()
+        return self._charge(self._new_id('ch_'))
+
+    def retrieve_charge(self, charge_id):
+        self._wait()
+        return self._charge(charge_id)
+
+    # MercadoPago
+
+    def _mp_payment(self, payment_id, status):
+        return {
+            'id': payment_id,
+            'status': status,
+            'status_detail': 'accredited' if status == 'approved' else 'pending_waiting_transfer',
+            'date_last_updated': None,
+            'point_of_interaction': {
+                'transaction_data': {'qr_code': f'stub-pix-{payment_id}', 'qr_code_base64': ''}
+            },
+        }
+
+    def create_payment(self, payment_object, idempotency_key=None):
+        self._wait()
+        return {'status': 201, 'response': self._mp_payment(uuid.uuid4().int % 10 ** 12, 'pending')}
+
+    def get_payment(self, payment_id):
+        self._wait()
+        return {'status': 200, 'response': self._mp_payment(payment_id, 'approved' if self.approved else 'pending')}
+
+    # PagHiper
+
+    def create_transaction(self, payload):
+        self._wait()
+        transaction_id = self._new_id().upper()
+        return StubResponse({
+            'result': 'success',
+            'transaction': {
+                'transaction_id': transaction_id,
+                'bank_slip': {
+                    'digitable_line': '00000.00000 00000.000000 00000.000000 0 00000000000000',
+                    'url_slip': f'https://stub.local/boleto/{transaction_id}',
+                    'url_slip_pdf': f'https://stub.local/boleto/{transaction_id}.pdf',
+                },
+            },
+        })
+
+    def _boleto_status(self):
+        return {'status': 'paid' if self.approved else 'pending', 'paid_date': None}
+
+    def transaction_status(self, transaction_id):
+        self._wait()
+        return StubResponse({'result': 'success', 'status': self._boleto_status()}, status_code=200)
+
+    def confirm_notification(self, transaction_id, notification_id):
+        self._wait()
+        return StubResponse({'status_request': {'result': 'success', **self._boleto_status()}}, status_code=200)
+
+
+class ProviderRegistry:
+    """
+    Um cliente por gateway, criado no primeiro uso e reaproveitado por todas
+    as requisições e threads do processo (conexões HTTP mantidas abertas).
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = self._build(name)
+        return client
+
+    def reset(self):
+        """Descarta os clientes (ex.: após mudar credenciais ou PAYMENT_PROVIDERS)."""
+        with self._lock:
+            self._clients.clear()
+
+    def _build(self, name):
+        config = get_payment_providers_settings()
+        if config['BACKEND'] == 'stub':
+            return StubProvider(config['STUB_LATENCY'], config['STUB_STATUS'])
+
+        timeout = settings.PAYMENT_GATEWAY_TIMEOUT
+        if name == 'stripe':
+            return StripeProvider(settings.STRIPE_SECRET_KEY, timeout)
+        if name == 'mercadopago':
+            return MercadoPagoProvider(settings.MERCADOPAGO_ACCESS_TOKEN, timeout, config['POOL_SIZE'])
+        if name == 'paghiper':
+            return PagHiperProvider(settings.PAGHIPER_API_KEY, settings.PAGHIPER_TOKEN, timeout, config['POOL_SIZE'])
+        raise ValueError(f'Gateway de pagamento desconhecido: {name}')
+
+
+provider_registry = ProviderRegistry()
+
+
+def get_provider(name):
+    return provider_registry.get(name)
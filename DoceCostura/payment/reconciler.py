@@ -0,0 +1,201 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, Payment
+from .services import PAYMENT_STATUS_TRANSITIONS, PaymentGatewayUnavailable, PaymentService
+
+logger = logging.getLogger(__name__)
+
+
+def get_payment_reconciler_settings():
+    config = {
+        'METHODS': ['credit_card', 'pix', 'boleto'],
+        'MIN_AGE': 60,
+        'MAX_AGE': 7 * 24 * 3600,
+        'BATCH_SIZE': 200,
+        'WORKERS': 8,
+        'RATE_LIMITS': {'credit_card': 20, 'pix': 10, 'boleto': 5},
+    }
+    config.update(getattr(settings, 'PAYMENT_RECONCILER', {}))
+    return config
+
+
+class RateLimiter:
+    """Limita as chamadas a rate por segundo, compartilhado entre threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class PaymentReconciler:
+    """
+    Atualiza em lote os pagamentos pendentes consultando os gateways.
+
+    Os pagamentos são lidos em lotes (por id); cada lote é consultado em
+    paralelo, com no máximo `workers` chamadas simultâneas e respeitando o
+    limite de requisições por segundo de cada gateway. Os resultados do lote
+    são gravados de uma vez (bulk_update), em uma transação.
+    """
+
+    def __init__(self, methods=None, min_age=None, max_age=None, workers=None,
+                 batch_size=None, rate_limits=None):
+        config = get_payment_reconciler_settings()
+        self.methods = methods or config['METHODS']
+        self.min_age = config['MIN_AGE'] if min_age is None else min_age
+        self.max_age = config['MAX_AGE'] if max_age is None else max_age
+        self.workers = workers or config['WORKERS']
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        rate_limits = {**config['RATE_LIMITS'], **(rate_limits or {})}
+        self.limiters = {method: RateLimiter(rate_limits.get(method)) for method in self.methods}
+
+    def get_pending(self):
+        now = timezone.now()
+        return (
+            Payment.objects
+            .filter(
+                status='pending',
+                payment_method__in=self.methods,
+                transaction_id__isnull=False,
+                created_at__lte=now - timedelta(seconds=self.min_age),
+                created_at__gte=now - timedelta(seconds=self.max_age),
+            )
+            .exclude(transaction_id='')
+            .only('id', 'order_id', 'payment_method', 'transaction_id', 'status')
+            .order_by('id')
+        )
+
+    def run(self, limit=None):
+        """
+        Returns:
+            Métricas da execução (consultados, alterados, erros, tempo, vazão)
+        """
+        stats = {
+            'checked': 0,
+            'changed': 0,
+            'approved': 0,
+            'unavailable': 0,
+            'errors': 0,
+            'by_method': {method: 0 for method in self.methods},
+        }
+        started = time.perf_counter()
+        pending = self.get_pending()
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while limit is None or stats['checked'] < limit:
+                size = self.batch_size if limit is None else min(self.batch_size, limit - stats['checked'])
+                batch = list(pending.filter(id__gt=last_id)[:size])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+
+                results = list(executor.map(self._fetch, batch))
+                for payment, result in zip(batch, results):
+                    stats['checked'] += 1
+                    stats['by_method'][payment.payment_method] += 1
+                    if isinstance(result, PaymentGatewayUnavailable):
+                        stats['unavailable'] += 1
+                    elif isinstance(result, Exception):
+                        stats['errors'] += 1
+
+                changed, approved = self.apply(
+                    [(payment, result) for payment, result in zip(batch, results)
+                     if not isinstance(result, Exception)]
+                )
+                stats['changed'] += changed
+                stats['approved'] += approved
+
+        stats['elapsed'] = time.perf_counter() - started
+        stats['throughput'] = stats['checked'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        logger.info(
+            f"Conciliação: {stats['checked']} pagamentos consultados, {stats['changed']} alterados, "
+            f"{stats['unavailable'] + stats['errors']} falhas em {stats['elapsed']:.1f}s "
+            f"({stats['throughput']:.1f}/s)"
+        )
+        return stats
+
+    def _fetch(self, payment):
+        # Roda nas threads do executor: só chama o gateway, sem acessar o banco
+        self.limiters[payment.payment_method].acquire()
+        try:
+            return PaymentService.fetch_gateway_status(payment)
+        except Exception as e:
+            logger.warning(f"Conciliação do pagamento {payment.id} falhou: {str(e)}")
+            return e
+
+    @staticmethod
+    def apply(results):
+        """
+        Grava em lote os status consultados. Pagamentos já alterados por
+        outro caminho (webhook, check_status) são reavaliados com a linha
+        bloqueada e só mudam se a transição for válida.
+
+        Returns:
+            (pagamentos com status alterado, pedidos marcados como pagos)
+        """
+        fetched = {payment.id: result for payment, result in results}
+        if not fetched:
+            return 0, 0
+
+        now = timezone.now()
+        with transaction.atomic():
+            payments = list(
+                Payment.objects
+                .select_for_update()
+                .filter(id__in=fetched)
+                .only('id', 'order_id', 'status', 'transaction_id', 'transaction_data', 'updated_at')
+            )
+
+            updated = []
+            changed_count = 0
+            approved = {}
+            for payment in payments:
+                new_status, transaction_data = fetched[payment.id]
+                changed = new_status in PAYMENT_STATUS_TRANSITIONS.get(payment.status, set())
+                stale = any(payment.transaction_data.get(key) != value for key, value in transaction_data.items())
+                if not changed and not stale:
+                    continue
+                if changed:
+                    changed_count += 1
+                    payment.status = new_status
+                    if new_status == 'approved':
+                        approved[payment.order_id] = payment.transaction_id
+                payment.transaction_data.update(transaction_data)
+                payment.updated_at = now
+                updated.append(payment)
+
+            Payment.objects.bulk_update(updated, ['status', 'transaction_data', 'updated_at'])
+
+            orders = list(
+                Order.objects
+                .select_for_update()
+                .filter(id__in=approved, status='pending')
+                .only('id', 'status', 'payment_id', 'paid_at', 'updated_at')
+            )
+            for order in orders:
+                order.status = 'paid'
+                order.payment_id = approved[order.id]
+                order.paid_at = now
+                order.updated_at = now
+            Order.objects.bulk_update(orders, ['status', 'payment_id', 'paid_at', 'updated_at'])
+
+        return changed_count, len(orders)
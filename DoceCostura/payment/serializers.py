@@ -30,14 +30,31 @@ class PaymentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
+class PaymentStatusSerializer(serializers.ModelSerializer):
+    """Representação compacta para listagens e consulta de status (sem transaction_data)."""
+    order_number = serializers.CharField(source='order.order_number', read_only=True)
+    
+    class Meta:
+        model = Payment
+        fields = [
+            'id', 'order', 'order_number', 'amount', 'payment_method',
+            'status', 'transaction_id', 'created_at', 'updated_at'
+        ]
+
 class PaymentDetailSerializer(serializers.Serializer):
     # Campos para cartão de crédito
     card_number = serializers.CharField(required=False)
     card_holder = serializers.CharField(required=False)
     expiry_date = serializers.CharField(required=False)
     cvv = serializers.CharField(required=False)
+    token = serializers.CharField(required=False)  # Token do cartão gerado no frontend (Stripe)
     
-    # Para outros métodos, adicione campos específicos
+    # Dados do pagador (PIX e boleto)
+    email = serializers.EmailField(required=False)
+    name = serializers.CharField(required=False)
+    document = serializers.CharField(required=False)
+    document_type = serializers.CharField(required=False)
+    document_number = serializers.CharField(required=False)
 
 class CheckoutSerializer(serializers.Serializer):
     address = serializers.CharField()
@@ -3,11 +3,49 @@ import uuid
 from django.conf import settings
 from .models import Order, Payment
 import stripe
-import mercadopago
 from django.utils import timezone
 import datetime
 import requests
 import json
+from django.db import transaction
+from .providers import get_provider
+
+# Status dos gateways mapeados para Payment.status
+STRIPE_STATUS_MAP = {
+    'succeeded': 'approved',
+    'pending': 'pending',
+    'failed': 'declined'
+}
+
+MERCADOPAGO_STATUS_MAP = {
+    'approved': 'approved',
+    'pending': 'pending',
+    'rejected': 'declined',
+    'cancelled': 'declined',
+    'refunded': 'refunded'
+}
+
+PAGHIPER_STATUS_MAP = {
+    'paid': 'approved',
+    'completed': 'approved',
+    'pending': 'pending',
+    'canceled': 'declined',
+    'refunded': 'refunded'
+}
+
+# Transições aceitas a partir de cada status (eventos fora de ordem são ignorados)
+PAYMENT_STATUS_TRANSITIONS = {
+    'pending': {'approved', 'declined', 'cancelled', 'refunded'},
+    'approved': {'refunded'},
+}
+
+
+class PaymentGatewayUnavailable(Exception):
+    """
+    Falha temporária do gateway (rede, timeout, limite de requisições, erro 5xx).
+    O pagamento continua pendente e pode ser tentado de novo.
+    """
+
 
 class PaymentService:
     """
@@ -29,13 +67,28 @@ class PaymentService:
             status='pending'
         )
         
+        return PaymentService.execute_payment(payment, payment_data)
+
+    @staticmethod
+    def execute_payment(payment, payment_data, idempotency_key=None):
+        """
+        Envia um pagamento já registrado ao gateway do seu método.
+
+        A mesma idempotency_key em novas tentativas garante que o gateway
+        não cobre duas vezes o mesmo pagamento.
+
+        Raises:
+            PaymentGatewayUnavailable em falhas temporárias do gateway
+        """
+        payment_method = payment.payment_method
+        
         # Selecionar gateway de pagamento baseado no método
         if payment_method == 'credit_card':
-            return PaymentService._process_credit_card(payment, payment_data)
+            return PaymentService._process_credit_card(payment, payment_data, idempotency_key)
         elif payment_method == 'pix':
-            return PaymentService._process_pix(payment, payment_data)
+            return PaymentService._process_pix(payment, payment_data, idempotency_key)
         elif payment_method == 'boleto':
-            return PaymentService._process_boleto(payment, payment_data)
+            return PaymentService._process_boleto(payment, payment_data, idempotency_key)
         else:
             payment.status = 'declined'
             payment.transaction_data = {'error': 'Método de pagamento não suportado'}
@@ -47,26 +100,23 @@ class PaymentService:
             }
     
     @staticmethod
-    def _process_credit_card(payment, payment_data):
+    def _process_credit_card(payment, payment_data, idempotency_key=None):
         """
         Processa pagamento com cartão de crédito via Stripe
         """
         try:
             
-            # Configurar API key do Stripe
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-            
             # Criar o pagamento no Stripe
-            stripe_charge = stripe.Charge.create(
-                amount=int(payment.amount * 100),  # Stripe usa centavos
-                currency="brl",
-                source=payment_data.get('token'),  # Token do cartão obtido no frontend
-                description=f"Pedido #{payment.order.order_number}",
-                metadata={
+            stripe_charge = get_provider('stripe').create_charge({
+                'amount': int(payment.amount * 100),  # Stripe usa centavos
+                'currency': "brl",
+                'source': payment_data.get('token'),  # Token do cartão obtido no frontend
+                'description': f"Pedido #{payment.order.order_number}",
+                'metadata': {
                     'order_id': str(payment.order.id),
                     'customer_id': str(payment.order.user_id)
                 }
-            )
+            }, idempotency_key=idempotency_key)
             
             # Processar resposta do Stripe
             transaction_id = stripe_charge.id
@@ -109,6 +159,10 @@ class PaymentService:
                 'payment': payment
             }
             
+        except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError) as e:
+            # Stripe fora do ar ou sobrecarregado: nova tentativa mais tarde
+            raise PaymentGatewayUnavailable(f'Stripe indisponível: {str(e)}')
+            
         except (stripe.error.StripeError, Exception) as e:
             # Outros erros
             payment.status = 'declined'
@@ -121,14 +175,11 @@ class PaymentService:
             }
     
     @staticmethod
-    def _process_pix(payment, payment_data):
+    def _process_pix(payment, payment_data, idempotency_key=None):
         """
         Gera um código PIX usando a API do MercadoPago
         """
         try:
-                        
-            # Configurar SDK do MercadoPago
-            sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
             
             # Data de expiração (24 horas)
             expiration_date = timezone.now() + datetime.timedelta(hours=24)
@@ -148,7 +199,15 @@ class PaymentService:
                 "date_of_expiration": expiration_date.strftime("%Y-%m-%dT%H:%M:%S.000-03:00")
             }
             
-            payment_response = sdk.payment().create(payment_data)
+            try:
+                payment_response = get_provider('mercadopago').create_payment(payment_data, idempotency_key)
+            except requests.RequestException as e:
+                raise PaymentGatewayUnavailable(f'MercadoPago indisponível: {str(e)}')
+            
+            if payment_response["status"] == 429 or payment_response["status"] >= 500:
+                raise PaymentGatewayUnavailable(
+                    f'MercadoPago indisponível (HTTP {payment_response["status"]})'
+                )
             
             if payment_response["status"] == 201:
                 mp_payment = payment_response["response"]
@@ -191,6 +250,9 @@ class PaymentService:
                     'payment': payment
                 }
         
+        except PaymentGatewayUnavailable:
+            raise
+        
         except Exception as e:
             payment.status = 'declined'
             payment.transaction_data = {'error': str(e)}
@@ -203,21 +265,16 @@ class PaymentService:
             }
     
     @staticmethod
-    def _process_boleto(payment, payment_data):
+    def _process_boleto(payment, payment_data, idempotency_key=None):
         """
         Gera um boleto usando a API da PagHiper
         """
         try:           
-            # Configurações da PagHiper
-            api_key = settings.PAGHIPER_API_KEY
-            token = settings.PAGHIPER_TOKEN
-            
             # Data de vencimento (3 dias úteis)
             due_date = (timezone.now() + datetime.timedelta(days=3)).strftime('%Y-%m-%d')
             
             # Preparar dados para a API
             payload = {
-                "apiKey": api_key,
                 "order_id": str(payment.order.order_number),
                 "payer_email": payment_data.get('email', 'cliente@exemplo.com'),
                 "payer_name": payment_data.get('name', 'Cliente Teste'),
@@ -233,13 +290,14 @@ class PaymentService:
                 ]
             }
             
-            # Chamar a API da PagHiper
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(
-                'https://api.paghiper.com/transaction/create/',
-                data=json.dumps(payload),
-                headers=headers
-            )
+            # Chamar a API da PagHiper (o order_id já impede boletos duplicados)
+            try:
+                response = get_provider('paghiper').create_transaction(payload)
+            except requests.RequestException as e:
+                raise PaymentGatewayUnavailable(f'PagHiper indisponível: {str(e)}')
+            
+            if response.status_code == 429 or response.status_code >= 500:
+                raise PaymentGatewayUnavailable(f'PagHiper indisponível (HTTP {response.status_code})')
             
             response_json = response.json()
             
@@ -279,6 +337,9 @@ class PaymentService:
                     'payment': payment
                 }
         
+        except PaymentGatewayUnavailable:
+            raise
+        
         except Exception as e:
             payment.status = 'declined'
             payment.transaction_data = {'error': str(e)}
@@ -290,6 +351,34 @@ class PaymentService:
                 'payment': payment
             }
     
+    @staticmethod
+    def update_status(payment, new_status, transaction_data=None):
+        """
+        Aplica um status informado pelo gateway (webhook ou consulta) de forma
+        idempotente: a linha do pagamento é bloqueada, transições inválidas ou
+        repetidas não mudam nada e o pedido só é marcado como pago uma vez.
+
+        Returns:
+            (pagamento atualizado, True se o status mudou)
+        """
+        with transaction.atomic():
+            payment = Payment.objects.select_for_update().get(pk=payment.pk)
+            
+            changed = new_status in PAYMENT_STATUS_TRANSITIONS.get(payment.status, set())
+            if changed:
+                payment.status = new_status
+            if transaction_data:
+                payment.transaction_data.update(transaction_data)
+            if changed or transaction_data:
+                payment.save()
+            
+            if changed and new_status == 'approved':
+                order = Order.objects.select_for_update().get(pk=payment.order_id)
+                if order.status == 'pending':
+                    order.mark_as_paid(payment.transaction_id)
+        
+        return payment, changed
+    
     @staticmethod
     def check_payment_status(payment_id):
         """
@@ -332,32 +421,28 @@ class PaymentService:
             }
 
     @staticmethod
-    def _check_credit_card_status(payment):
-        """Verifica status de pagamento com cartão no Stripe"""
-        import stripe
-        from django.conf import settings
-        
-        stripe.api_key = settings.STRIPE_SECRET_KEY
-        
+    def fetch_gateway_status(payment):
+        """
+        Consulta o status do pagamento no gateway, sem gravar nada.
+
+        Returns:
+            (status mapeado para Payment.status, dados da transação a mesclar)
+
+        Raises:
+            PaymentGatewayUnavailable em falhas temporárias do gateway
+        """
+        fetchers = {
+            'credit_card': PaymentService._fetch_credit_card_status,
+            'pix': PaymentService._fetch_pix_status,
+            'boleto': PaymentService._fetch_boleto_status,
+        }
+        return fetchers[payment.payment_method](payment)
+
+    @staticmethod
+    def _check_status(payment, gateway_name):
         try:
-            charge = stripe.Charge.retrieve(payment.transaction_id)
-            
-            # Mapear status do Stripe para nosso sistema
-            status_map = {
-                'succeeded': 'approved',
-                'pending': 'pending',
-                'failed': 'declined'
-            }
-            
-            new_status = status_map.get(charge.status, 'pending')
-            
-            # Atualiza se o status mudou
-            if new_status != payment.status:
-                payment.status = new_status
-                payment.save()
-                
-                if new_status == 'approved':
-                    payment.order.mark_as_paid(payment.transaction_id)
+            new_status, transaction_data = PaymentService.fetch_gateway_status(payment)
+            payment, changed = PaymentService.update_status(payment, new_status, transaction_data)
             
             return {
                 'success': True,
@@ -367,125 +452,73 @@ class PaymentService:
         except Exception as e:
             return {
                 'success': False,
-                'message': f'Erro ao consultar status no Stripe: {str(e)}'
+                'message': f'Erro ao consultar status no {gateway_name}: {str(e)}'
             }
 
+    @staticmethod
+    def _check_credit_card_status(payment):
+        """Verifica status de pagamento com cartão no Stripe"""
+        return PaymentService._check_status(payment, 'Stripe')
+
     @staticmethod
     def _check_pix_status(payment):
         """Verifica status de pagamento PIX no MercadoPago"""
-        import mercadopago
-        from django.conf import settings
-        
-        sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
-        
-        try:
-            mp_payment_id = payment.transaction_id
-            response = sdk.payment().get(mp_payment_id)
-            
-            if response["status"] == 200:
-                mp_payment = response["response"]
-                
-                # Mapear status do MercadoPago para nosso sistema
-                status_map = {
-                    'approved': 'approved',
-                    'pending': 'pending',
-                    'rejected': 'declined',
-                    'cancelled': 'declined'
-                }
-                
-                new_status = status_map.get(mp_payment['status'], 'pending')
-                
-                # Atualiza se o status mudou
-                if new_status != payment.status:
-                    payment.status = new_status
-                    payment.save()
-                    
-                    if new_status == 'approved':
-                        payment.order.mark_as_paid(payment.transaction_id)
-                
-                # Atualiza dados da transação
-                payment.transaction_data.update({
-                    'payment_status': mp_payment['status'],
-                    'payment_status_detail': mp_payment['status_detail'],
-                    'last_updated': mp_payment['date_last_updated']
-                })
-                payment.save()
-                
-            return {
-                'success': True,
-                'status': payment.status,
-                'payment': payment
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'message': f'Erro ao consultar status no MercadoPago: {str(e)}'
-            }
+        return PaymentService._check_status(payment, 'MercadoPago')
 
     @staticmethod
     def _check_boleto_status(payment):
         """Verifica status de pagamento com boleto na PagHiper"""
-        import requests
-        import json
-        from django.conf import settings
+        return PaymentService._check_status(payment, 'PagHiper')
+
+    @staticmethod
+    def _fetch_credit_card_status(payment):
+        try:
+            charge = get_provider('stripe').retrieve_charge(payment.transaction_id)
+        except (stripe.error.APIConnectionError, stripe.error.RateLimitError, stripe.error.APIError) as e:
+            raise PaymentGatewayUnavailable(f'Stripe indisponível: {str(e)}')
         
+        # Mapear status do Stripe para nosso sistema
+        return STRIPE_STATUS_MAP.get(charge.status, 'pending'), {}
+
+    @staticmethod
+    def _fetch_pix_status(payment):
         try:
-            # Configurações da PagHiper
-            api_key = settings.PAGHIPER_API_KEY
-            token = settings.PAGHIPER_TOKEN
-            
-            # Preparar dados para a API
-            payload = {
-                "apiKey": api_key,
-                "token": token,
-                "transaction_id": payment.transaction_id
-            }
-            
-            # Chamar a API da PagHiper
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(
-                'https://api.paghiper.com/transaction/status/',
-                data=json.dumps(payload),
-                headers=headers
-            )
-            
-            response_json = response.json()
-            
-            if response_json['result'] == 'success':
-                status_data = response_json['status']
-                
-                # Mapear status da PagHiper para nosso sistema
-                status_map = {
-                    'paid': 'approved',
-                    'pending': 'pending', 
-                    'canceled': 'declined',
-                    'refunded': 'refunded'
-                }
-                
-                new_status = status_map.get(status_data['status'], 'pending')
-                
-                # Atualiza se o status mudou
-                if new_status != payment.status:
-                    payment.status = new_status
-                    payment.save()
-                    
-                    if new_status == 'approved':
-                        payment.order.mark_as_paid(payment.transaction_id)
-                
-                # Atualiza dados da transação
-                payment.transaction_data.update({
-                    'payment_status': status_data['status'],
-                    'payment_date': status_data.get('paid_date', None)
-                })
-                payment.save()
-                
-            return {
-                'success': True,
-                'status': payment.status,
-                'payment': payment
-            }
-        except Exception as e:
-            return {
-                'success': False,
-                'message': f'Erro ao consultar status na PagHiper: {str(e)}'
-            }
\ No newline at end of file
+            response = get_provider('mercadopago').get_payment(payment.transaction_id)
+        except requests.RequestException as e:
+            raise PaymentGatewayUnavailable(f'MercadoPago indisponível: {str(e)}')
+        
+        if response["status"] == 429 or response["status"] >= 500:
+            raise PaymentGatewayUnavailable(f'MercadoPago indisponível (HTTP {response["status"]})')
+        if response["status"] != 200:
+            raise ValueError(f'Pagamento {payment.transaction_id} não encontrado no MercadoPago')
+        
+        mp_payment = response["response"]
+        
+        # Mapear status do MercadoPago para nosso sistema
+        return MERCADOPAGO_STATUS_MAP.get(mp_payment['status'], 'pending'), {
+            'payment_status': mp_payment['status'],
+            'payment_status_detail': mp_payment['status_detail'],
+            'last_updated': mp_payment['date_last_updated']
+        }
+
+    @staticmethod
+    def _fetch_boleto_status(payment):
+        try:
+            response = get_provider('paghiper').transaction_status(payment.transaction_id)
+        except requests.RequestException as e:
+            raise PaymentGatewayUnavailable(f'PagHiper indisponível: {str(e)}')
+        
+        if response.status_code == 429 or response.status_code >= 500:
+            raise PaymentGatewayUnavailable(f'PagHiper indisponível (HTTP {response.status_code})')
+        
+        response_json = response.json()
+        if response_json['result'] != 'success':
+            raise ValueError(response_json.get('response_message', 'Consulta recusada pela PagHiper'))
+        
+        status_data = response_json['status']
+        
+        # Mapear status da PagHiper para nosso sistema
+        return PAGHIPER_STATUS_MAP.get(status_data['status'], 'pending'), {
+            'payment_status': status_data['status'],
+            'payment_date': status_data.get('paid_date', None)
+        }
@@ -1,3 +1,500 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from product.models import Cart, CartItem, Product
+from product.tests import TEST_SIGNING_KEY, make_access_token
+from product.tokens import token_cache
+from .checkout import CheckoutService
+from .jobs import PaymentJobQueue
+from .models import Order, Payment, PaymentJob, PaymentWebhookEvent
+from .providers import (
+    PAGHIPER_API_URL, MercadoPagoProvider, PagHiperProvider, ProviderRegistry, StripeProvider, StubProvider, provider_registry
+)
+from .reconciler import PaymentReconciler, RateLimiter
+from .services import PaymentGatewayUnavailable
+
+STRIPE_WEBHOOK_SECRET = 'whsec_teste'
+
+
+def sign_stripe_payload(payload, secret=STRIPE_WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=STRIPE_WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+    """Webhooks atualizam pagamento e pedido uma única vez por evento."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.order = Order.objects.create(
+            user_id=1,
+            shipping_address='Rua das Linhas, 10',
+            shipping_city='São Paulo',
+            shipping_state='SP',
+            shipping_zipcode='01000-000',
+            subtotal=10,
+            total=10,
+            payment_method='credit_card'
+        )
+        self.payment = Payment.objects.create(
+            order=self.order,
+            amount=10,
+            payment_method='credit_card',
+            status='pending',
+            transaction_id='ch_teste'
+        )
+
+    def post_event(self, event_id, event_type, signature=None):
+        payload = json.dumps({
+            'id': event_id,
+            'object': 'event',
+            'type': event_type,
+            'data': {'object': {'id': 'ch_teste', 'object': 'charge', 'status': 'succeeded'}}
+        })
+        return self.client.post(
+            '/api/payment/webhooks/stripe/',
+            payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature or sign_stripe_payload(payload)
+        )
+
+    def test_charge_succeeded_marks_payment_and_order_as_paid(self):
+        response = self.post_event('evt_1', 'charge.succeeded')
+
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.payment.status, 'approved')
+        self.assertEqual(self.order.status, 'paid')
+
+    def test_duplicate_event_is_ignored(self):
+        self.post_event('evt_1', 'charge.succeeded')
+        response = self.post_event('evt_1', 'charge.succeeded')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['duplicate'])
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 1)
+
+    def test_invalid_signature_is_rejected(self):
+        response = self.post_event('evt_1', 'charge.succeeded', signature='t=1,v1=invalida')
+
+        self.assertEqual(response.status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='')
+    def test_unset_secret_rejects_payloads_signed_with_an_empty_key(self):
+        payload = json.dumps({'id': 'evt_1', 'object': 'event', 'type': 'charge.succeeded', 'data': {
+            'object': {'id': 'ch_teste', 'object': 'charge', 'status': 'succeeded'}
+        }})
+        response = self.client.post(
+            '/api/payment/webhooks/stripe/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=sign_stripe_payload(payload, secret='')
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.payment.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertEqual(self.order.status, 'pending')
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+
+class MercadoPagoWebhookTests(TestCase):
+    """Notificações do MercadoPago só são aceitas com MERCADOPAGO_WEBHOOK_SECRET definido."""
+
+    def setUp(self):
+        self.payment = Payment.objects.create(
+            order=create_order('pix'),
+            amount=10,
+            payment_method='pix',
+            status='pending',
+            transaction_id='123'
+        )
+
+    def post_notification(self, secret):
+        ts = str(int(time.time()))
+        manifest = f'id:123;request-id:req-1;ts:{ts};'
+        signature = hmac.new(secret.encode(), manifest.encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/api/payment/webhooks/mercadopago/?data.id=123',
+            json.dumps({'id': 'n-1', 'type': 'payment', 'action': 'payment.updated', 'data': {'id': '123'}}),
+            content_type='application/json',
+            HTTP_X_SIGNATURE=f'ts={ts},v1={signature}',
+            HTTP_X_REQUEST_ID='req-1'
+        )
+
+    @override_settings(MERCADOPAGO_WEBHOOK_SECRET='segredo')
+    def test_signed_notification_updates_the_payment(self):
+        get_payment = mock.Mock(return_value={'status': 200, 'response': {'status': 'approved'}})
+        with mock.patch.object(StubProvider, 'get_payment', get_payment), \
+                override_settings(PAYMENT_PROVIDERS={'BACKEND': 'stub', 'STUB_LATENCY': 0}):
+            provider_registry.reset()
+            self.addCleanup(provider_registry.reset)
+            response = self.post_notification('segredo')
+
+        self.assertEqual(response.status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'approved')
+
+    @override_settings(MERCADOPAGO_WEBHOOK_SECRET='')
+    def test_unset_secret_rejects_notifications_before_calling_the_gateway(self):
+        with mock.patch('payment.webhooks.get_provider') as get_provider:
+            response = self.post_notification('')
+
+        self.assertEqual(response.status_code, 404)
+        get_provider.assert_not_called()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertFalse(PaymentWebhookEvent.objects.exists())
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class PaymentStatusTests(TestCase):
+    """Consulta de status compacta, em uma consulta e com ETag."""
+
+    USER_ID = 42
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_access_token(self.USER_ID)}')
+        self.payments = []
+        for i in range(5):
+            order = Order.objects.create(
+                user_id=self.USER_ID,
+                shipping_address='Rua das Linhas, 10',
+                shipping_city='São Paulo',
+                shipping_state='SP',
+                shipping_zipcode='01000-000',
+                subtotal=10,
+                total=10,
+                payment_method='pix'
+            )
+            self.payments.append(Payment.objects.create(
+                order=order,
+                amount=10,
+                payment_method='pix',
+                status='pending',
+                transaction_id=f'mp-{i}',
+                transaction_data={'qr_code_base64': 'A' * 5000}
+            ))
+
+    def test_status_is_compact_and_uses_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/payment/payments/{self.payments[0].id}/status/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response.data['order_number'], self.payments[0].order.order_number)
+        self.assertNotIn('transaction_data', response.data)
+
+    def test_status_returns_304_until_payment_changes(self):
+        url = f'/api/payment/payments/{self.payments[0].id}/status/'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        payment = self.payments[0]
+        payment.status = 'approved'
+        payment.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'approved')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_query_count_does_not_grow_with_payments(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/payment/payments/')
+
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertNotIn('transaction_data', response.data['results'][0])
+
+
+def create_order(payment_method='pix', user_id=1):
+    return Order.objects.create(
+        user_id=user_id,
+        shipping_address='Rua das Linhas, 10',
+        shipping_city='São Paulo',
+        shipping_state='SP',
+        shipping_zipcode='01000-000',
+        subtotal=10,
+        total=10,
+        payment_method=payment_method
+    )
+
+
+class RateLimiterTests(TestCase):
+    """Chamadas espaçadas em 1/rate segundos, sem limite quando rate é vazio."""
+
+    def test_calls_are_spaced_by_the_rate(self):
+        with mock.patch('payment.reconciler.time.monotonic', return_value=100.0), \
+                mock.patch('payment.reconciler.time.sleep') as sleep:
+            limiter = RateLimiter(10)
+            for _ in range(3):
+                limiter.acquire()
+
+        self.assertEqual([round(call.args[0], 6) for call in sleep.call_args_list], [0.1, 0.2])
+
+    def test_no_rate_never_waits(self):
+        with mock.patch('payment.reconciler.time.sleep') as sleep:
+            limiter = RateLimiter(None)
+            for _ in range(3):
+                limiter.acquire()
+
+        sleep.assert_not_called()
+
+
+@override_settings(PAYMENT_PROVIDERS={'BACKEND': 'stub', 'STUB_LATENCY': 0, 'STUB_STATUS': 'approved'})
+class PaymentReconcilerTests(TestCase):
+    """Conciliação em lotes: seleção dos pendentes, limite e transições válidas."""
+
+    def setUp(self):
+        provider_registry.reset()
+        self.addCleanup(provider_registry.reset)
+        self.payments = [self.create_payment(f'mp-{i}') for i in range(5)]
+        self.reconciler = PaymentReconciler(
+            methods=['pix'], workers=2, batch_size=2, rate_limits={'pix': None}
+        )
+
+    def create_payment(self, transaction_id, status='pending', age=120, payment_method='pix'):
+        payment = Payment.objects.create(
+            order=create_order(payment_method),
+            amount=10,
+            payment_method=payment_method,
+            status=status,
+            transaction_id=transaction_id
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(seconds=age))
+        return payment
+
+    def test_pending_excludes_recent_other_methods_and_missing_transaction(self):
+        self.create_payment('mp-novo', age=10)
+        self.create_payment('', age=120)
+        self.create_payment('ch_1', payment_method='credit_card')
+        self.create_payment('mp-pago', status='approved')
+
+        self.assertEqual(list(self.reconciler.get_pending()), self.payments)
+
+    def test_run_reads_in_batches_and_honors_the_limit(self):
+        with mock.patch.object(PaymentReconciler, 'apply', wraps=PaymentReconciler.apply) as apply:
+            stats = self.reconciler.run(limit=3)
+
+        self.assertEqual([len(call.args[0]) for call in apply.call_args_list], [2, 1])
+        self.assertEqual((stats['checked'], stats['changed'], stats['approved']), (3, 3, 3))
+        self.assertEqual(Payment.objects.filter(status='approved').count(), 3)
+        self.assertEqual(Order.objects.filter(status='paid').count(), 3)
+
+    def test_gateway_failures_are_counted_and_left_pending(self):
+        results = [
+            PaymentGatewayUnavailable('MercadoPago indisponível'),
+            ValueError('não encontrado'),
+            ('approved', {}), ('pending', {}), ('pending', {}),
+        ]
+        with mock.patch('payment.reconciler.PaymentService.fetch_gateway_status', side_effect=results):
+            stats = self.reconciler.run()
+
+        self.assertEqual(
+            (stats['checked'], stats['unavailable'], stats['errors'], stats['changed']), (5, 1, 1, 1)
+        )
+        self.assertEqual(Payment.objects.filter(status='pending').count(), 4)
+
+    def test_apply_follows_payment_status_transitions(self):
+        pending, declined, approved, unchanged = self.payments[:4]
+        Payment.objects.filter(pk=declined.pk).update(status='declined')
+        Payment.objects.filter(pk=approved.pk).update(status='approved')
+
+        changed, paid = PaymentReconciler.apply([
+            (pending, ('approved', {'payment_status': 'approved'})),
+            (declined, ('approved', {'payment_status': 'approved'})),
+            (approved, ('refunded', {})),
+            (unchanged, ('pending', {})),
+        ])
+
+        self.assertEqual((changed, paid), (2, 1))
+        statuses = dict(Payment.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[pending.pk], 'approved')
+        # Transição inválida: o status fica, os dados novos do gateway são gravados
+        self.assertEqual(statuses[declined.pk], 'declined')
+        self.assertEqual(Payment.objects.get(pk=declined.pk).transaction_data, {'payment_status': 'approved'})
+        self.assertEqual(statuses[approved.pk], 'refunded')
+        self.assertEqual(statuses[unchanged.pk], 'pending')
+        self.assertEqual(Order.objects.get(pk=pending.order_id).status, 'paid')
+        self.assertEqual(Order.objects.get(pk=declined.order_id).status, 'pending')
+
+
+@override_settings(
+    STRIPE_SECRET_KEY='sk_test_123',
+    MERCADOPAGO_ACCESS_TOKEN='TEST-123',
+    PAGHIPER_API_KEY='apk_123',
+    PAGHIPER_TOKEN='token',
+)
+class ProviderRegistryTests(TestCase):
+    """Um cliente por gateway, stub ou real conforme PAYMENT_PROVIDERS['BACKEND']."""
+
+    @override_settings(PAYMENT_PROVIDERS={'BACKEND': 'live', 'POOL_SIZE': 4})
+    def test_live_backend_builds_one_client_per_gateway(self):
+        registry = ProviderRegistry()
+
+        self.assertIsInstance(registry.get('stripe'), StripeProvider)
+        self.assertIsInstance(registry.get('mercadopago'), MercadoPagoProvider)
+        paghiper = registry.get('paghiper')
+        self.assertIsInstance(paghiper, PagHiperProvider)
+        self.assertIs(registry.get('paghiper'), paghiper)
+        self.assertEqual(paghiper.session.get_adapter(PAGHIPER_API_URL)._pool_maxsize, 4)
+        with self.assertRaises(ValueError):
+            registry.get('paypal')
+
+    @override_settings(PAYMENT_PROVIDERS={'BACKEND': 'stub', 'STUB_LATENCY': 0})
+    def test_stub_backend_serves_every_gateway_until_reset(self):
+        registry = ProviderRegistry()
+        stub = registry.get('mercadopago')
+
+        self.assertIsInstance(stub, StubProvider)
+        self.assertIsInstance(registry.get('stripe'), StubProvider)
+        registry.reset()
+        self.assertIsNot(registry.get('mercadopago'), stub)
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class CheckoutCatalogVersionTests(TestCase):
+    """A baixa de estoque do checkout invalida o ETag do catálogo."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+        self.product = Product.objects.create(
+            name='Linha de costura', description='', price=10, stock=5, sku='LIN-01'
+        )
+        cart = Cart.objects.create(user_id=7)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+    def test_retrieve_after_checkout_returns_new_stock(self):
+        url = f'/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CheckoutService.checkout(7, {
+                'address': 'Rua das Linhas, 10',
+                'city': 'São Paulo',
+                'state': 'SP',
+                'zipcode': '01000-000',
+                'payment_method': 'pix',
+            })
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 3)
+
+
+@override_settings(
+    PAYMENT_PROVIDERS={'BACKEND': 'stub', 'STUB_LATENCY': 0},
+    PAYMENT_JOBS={'MAX_ATTEMPTS': 3, 'BACKOFF_BASE': 5, 'BACKOFF_MAX': 60, 'LOCK_TIMEOUT': 300},
+)
+class PaymentJobQueueTests(TestCase):
+    """Fila de pagamentos: reserva, novas tentativas com backoff e esgotamento."""
+
+    def setUp(self):
+        provider_registry.reset()
+        self.addCleanup(provider_registry.reset)
+        self.order = Order.objects.create(
+            user_id=1,
+            shipping_address='Rua das Linhas, 10',
+            shipping_city='São Paulo',
+            shipping_state='SP',
+            shipping_zipcode='01000-000',
+            subtotal=10,
+            total=10,
+            payment_method='pix'
+        )
+        self.payment = PaymentJobQueue.enqueue(self.order, {'payment_method': 'pix', 'cvv': '123'})
+
+    def gateway_down(self):
+        return mock.patch.object(
+            StubProvider, 'create_payment', side_effect=requests.ConnectionError('timeout')
+        )
+
+    def test_enqueue_is_idempotent_and_drops_card_data(self):
+        again = PaymentJobQueue.enqueue(self.order, {'payment_method': 'pix'})
+
+        self.assertEqual(again.id, self.payment.id)
+        self.assertEqual(PaymentJob.objects.count(), 1)
+        self.assertNotIn('cvv', self.payment.job.payload)
+
+    def test_claim_reserves_each_job_once(self):
+        jobs = PaymentJobQueue.claim('worker:1', 10)
+
+        self.assertEqual([job.payment_id for job in jobs], [self.payment.id])
+        self.assertEqual(jobs[0].status, 'running')
+        self.assertEqual(jobs[0].attempts, 1)
+        self.assertEqual(PaymentJobQueue.claim('worker:2', 10), [])
+
+    def test_stale_lock_is_reclaimed(self):
+        PaymentJobQueue.claim('worker:1', 10)
+        PaymentJob.objects.update(locked_at=timezone.now() - timedelta(seconds=301))
+
+        jobs = PaymentJobQueue.claim('worker:2', 10)
+
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0].locked_by, 'worker:2')
+        self.assertEqual(jobs[0].attempts, 2)
+
+    def test_unavailable_gateway_retries_with_exponential_backoff(self):
+        with mock.patch('payment.jobs.random.uniform', return_value=0):
+            self.assertEqual(
+                [PaymentJobQueue.get_backoff(attempts) for attempts in (1, 2, 3, 5, 10)],
+                [2.5, 5, 10, 30, 30]
+            )
+
+        before = timezone.now()
+        with self.gateway_down():
+            PaymentJobQueue.process(PaymentJobQueue.claim('worker:1', 10)[0])
+
+        job = PaymentJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertIsNone(job.locked_by)
+        self.assertIn('MercadoPago indisponível', job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=2.5))
+        # Ainda no backoff: nada a reservar
+        self.assertEqual(PaymentJobQueue.claim('worker:1', 10), [])
+
+    def test_max_attempts_declines_the_payment(self):
+        with self.gateway_down():
+            for _ in range(3):
+                PaymentJob.objects.update(run_after=timezone.now())
+                PaymentJobQueue.process(PaymentJobQueue.claim('worker:1', 10)[0])
+
+        job = PaymentJob.objects.get()
+        self.payment.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(job.payload, {})
+        self.assertEqual(self.payment.status, 'declined')
+
+    def test_worker_sends_payment_with_the_job_idempotency_key(self):
+        stub = provider_registry.get('mercadopago')
+        with mock.patch.object(StubProvider, 'create_payment', wraps=stub.create_payment) as create:
+            processed = PaymentJobQueue.run_worker('worker:1', once=True)
+
+        self.assertEqual(processed, 1)
+        self.assertEqual(create.call_args.args[1], self.payment.job.idempotency_key)
+        self.assertEqual(PaymentJob.objects.get().status, 'succeeded')
+        self.payment.refresh_from_db()
+        self.assertTrue(self.payment.transaction_id)
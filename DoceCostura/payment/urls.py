@@ -8,5 +8,8 @@ router.register(r'orders', views.OrderViewSet)
 router.register(r'payments', views.PaymentViewSet)
 
 urlpatterns = [
+    path('webhooks/stripe/', views.StripeWebhookView.as_view(), name='stripe-webhook'),
+    path('webhooks/mercadopago/', views.MercadoPagoWebhookView.as_view(), name='mercadopago-webhook'),
+    path('webhooks/paghiper/', views.PagHiperWebhookView.as_view(), name='paghiper-webhook'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
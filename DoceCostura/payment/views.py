@@ -1,10 +1,18 @@
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from docecostura_common.pagination import KeysetPagination
 from .models import Order, Payment, OrderItem
-from .serializers import OrderSerializer, PaymentSerializer, CheckoutSerializer
+from .serializers import OrderSerializer, PaymentSerializer, PaymentStatusSerializer, CheckoutSerializer
 from .services import PaymentService
+from .checkout import CheckoutService, CheckoutError
+from . import webhooks
+from product.cart_storage import get_cart_storage
+from product.carts import CartError
 from product.permissions import MicroservicePermission
 
 class OrderViewSet(viewsets.ModelViewSet):
@@ -14,6 +22,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [MicroservicePermission]
+    pagination_class = KeysetPagination
+    authorization_resource = 'order'
     
     def get_queryset(self):
         """
@@ -27,7 +37,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def checkout(self, request):
         """
-        Processa checkout: converte carrinho em pedido e inicia pagamento
+        Processa checkout: converte carrinho em pedido e enfileira o pagamento
         """
         # Validar dados do checkout
         serializer = CheckoutSerializer(data=request.data)
@@ -41,70 +51,33 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Obter carrinho do usuário
-        from product.models import Cart
-        try:
-            cart = Cart.objects.get(user_id=user_id, is_active=True)
-            if not cart.items.exists():
-                return Response(
-                    {"error": "Carrinho está vazio"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except Cart.DoesNotExist:
-            return Response(
-                {"error": "Carrinho não encontrado"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Criar pedido a partir do carrinho
         checkout_data = serializer.validated_data
         
-        # 1. Criar o pedido
-        order = Order.objects.create(
-            user_id=user_id,
-            shipping_address=checkout_data['address'],
-            shipping_city=checkout_data['city'],
-            shipping_state=checkout_data['state'],
-            shipping_zipcode=checkout_data['zipcode'],
-            subtotal=cart.subtotal,
-            shipping_fee=checkout_data.get('shipping_fee', 0),
-            discount=checkout_data.get('discount', 0),
-            payment_method=checkout_data['payment_method'],
-            total=cart.subtotal + checkout_data.get('shipping_fee', 0) - checkout_data.get('discount', 0)
-        )
-        
-        # 2. Criar itens do pedido a partir dos itens do carrinho
-        from product.models import Product
-        for cart_item in cart.items.all():
-            product = cart_item.product
-            OrderItem.objects.create(
-                order=order,
-                product_id=product.id,
-                product_name=product.name,
-                quantity=cart_item.quantity,
-                price=product.price
-            )
-            
-            # Atualizar estoque
-            product.stock -= cart_item.quantity
-            product.save()
-        
-        # 3. Limpar o carrinho
-        cart.is_active = False
-        cart.save()
+        # Gravar no banco os itens do carrinho que ainda estejam só no cache
+        cart_storage = get_cart_storage()
+        try:
+            cart_storage.flush(user_id)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
         
-        # 4. Processar pagamento
-        payment_result = PaymentService.process_payment(order, {
-            'payment_method': checkout_data['payment_method'],
-            **checkout_data.get('payment_details', {})
-        })
+        # Criar pedido e itens, baixar estoque, finalizar o carrinho e
+        # enfileirar o pagamento em uma única transação
+        try:
+            order = CheckoutService.checkout(user_id, checkout_data)
+        except CheckoutError as e:
+            response_data = {"error": e.message}
+            if e.details:
+                response_data['products'] = e.details
+            return Response(response_data, status=e.status_code)
+        cart_storage.discard(user_id)
         
-        # 5. Retornar resultado
+        # O envio ao gateway é feito pelo worker (manage.py run_payment_worker);
+        # o cliente acompanha o pagamento pendente em payments/<id>/
         order_serializer = OrderSerializer(order)
         return Response({
             'order': order_serializer.data,
-            'payment': payment_result
-        })
+            'payment': PaymentSerializer(order.pending_payment).data
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get'])
     def payments(self, request, pk=None):
@@ -123,19 +96,64 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [MicroservicePermission]
+    pagination_class = KeysetPagination
+    authorization_resource = 'payment'
+    
+    # Ações que usam a representação compacta (sem transaction_data, que no
+    # PIX inclui o QR code em base64)
+    compact_actions = ('list', 'payment_status')
     
     def get_queryset(self):
         user_id = self.request.user_data.get('id')
-        if user_id:
-            return Payment.objects.filter(order__user_id=user_id)
-        return Payment.objects.none()
+        if not user_id:
+            return Payment.objects.none()
+        
+        queryset = Payment.objects.filter(order__user_id=user_id).select_related('order')
+        if self.action in self.compact_actions:
+            queryset = queryset.only(
+                'id', 'order', 'order__order_number', 'amount', 'payment_method',
+                'status', 'transaction_id', 'created_at', 'updated_at'
+            )
+        return queryset
+    
+    def get_serializer_class(self):
+        if self.action in self.compact_actions:
+            return PaymentStatusSerializer
+        return PaymentSerializer
+    
+    @action(detail=True, methods=['get'], url_path='status')
+    def payment_status(self, request, pk=None):
+        """
+        Status do pagamento para polling: uma consulta, sem transaction_data,
+        com ETag. Se o cliente enviar If-None-Match com o ETag atual, responde
+        304 sem corpo.
+        """
+        payment = self.get_object()
+        etag = payment.status_etag
+        
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        
+        response = Response(self.get_serializer(payment).data)
+        response['ETag'] = etag
+        return response
     
     @action(detail=True, methods=['post'])
     def check_status(self, request, pk=None):
         """
-        Verifica status atual do pagamento
+        Retorna o status atual do pagamento.
+
+        O status é atualizado pelos webhooks dos gateways, então a consulta é
+        só uma leitura no banco; o gateway só é consultado quando o webhook do
+        método de pagamento não está configurado.
         """
         payment = self.get_object()
+        if payment.status != 'pending' or webhooks.webhook_enabled(payment.payment_method):
+            serializer = self.get_serializer(payment)
+            return Response(serializer.data)
+
         result = PaymentService.check_payment_status(payment.id)
         
         if result['success']:
@@ -146,3 +164,35 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 {"error": result['message']},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+
+class PaymentWebhookView(APIView):
+    """
+    Recebe notificações assinadas de um gateway de pagamento.
+
+    Não usa a autenticação JWT: a origem é verificada pela assinatura
+    (ou apiKey) do gateway. Eventos repetidos respondem 200 sem efeito;
+    falhas respondem 4xx/5xx para o gateway reenviar.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    handler = None
+
+    def post(self, request):
+        try:
+            processed = self.handler(request)
+        except webhooks.WebhookError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        return Response({"received": True, "duplicate": not processed})
+
+
+class StripeWebhookView(PaymentWebhookView):
+    handler = staticmethod(webhooks.handle_stripe)
+
+
+class MercadoPagoWebhookView(PaymentWebhookView):
+    handler = staticmethod(webhooks.handle_mercadopago)
+
+
+class PagHiperWebhookView(PaymentWebhookView):
+    handler = staticmethod(webhooks.handle_paghiper)
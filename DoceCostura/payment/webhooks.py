@@ -0,0 +1,222 @@
+import hashlib
+import hmac
+import json
+import logging
+
+import requests
+import stripe
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Payment, PaymentWebhookEvent
+from .providers import get_provider
+from .services import (
+    MERCADOPAGO_STATUS_MAP,
+    PAGHIPER_STATUS_MAP,
+    PaymentService,
+)
+
+logger = logging.getLogger(__name__)
+
+# Eventos do Stripe (API de Charges) que alteram o status do pagamento
+STRIPE_EVENT_STATUS = {
+    'charge.succeeded': 'approved',
+    'charge.failed': 'declined',
+    'charge.refunded': 'refunded',
+}
+
+
+class WebhookError(Exception):
+    """Notificação recusada; status_code é o código HTTP devolvido ao gateway."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def webhook_enabled(payment_method):
+    """Indica se o gateway do método de pagamento envia webhooks configurados."""
+    if payment_method == 'credit_card':
+        return bool(settings.STRIPE_WEBHOOK_SECRET)
+    if payment_method == 'pix':
+        return bool(settings.MERCADOPAGO_WEBHOOK_SECRET)
+    if payment_method == 'boleto':
+        return bool(settings.PAGHIPER_API_KEY and settings.PAGHIPER_TOKEN)
+    return False
+
+
+def is_duplicate(provider, event_id):
+    return PaymentWebhookEvent.objects.filter(provider=provider, event_id=event_id).exists()
+
+
+def record_event(provider, event_id, event_type, payload, transaction_id, new_status, transaction_data):
+    """
+    Registra o evento e aplica o status na mesma transação: se a aplicação
+    falhar o evento não fica registrado e o reenvio do gateway é processado.
+
+    Returns:
+        False se o evento já tinha sido processado
+    """
+    payment = Payment.objects.filter(transaction_id=str(transaction_id)).first()
+
+    try:
+        with transaction.atomic():
+            PaymentWebhookEvent.objects.create(
+                provider=provider,
+                event_id=event_id,
+                event_type=event_type,
+                payment=payment,
+                payload=payload
+            )
+            if payment is None:
+                logger.warning(f"Webhook {provider} {event_id}: pagamento {transaction_id} não encontrado")
+            elif new_status:
+                PaymentService.update_status(payment, new_status, transaction_data)
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def handle_stripe(request):
+    """Webhook do Stripe, assinado com STRIPE_WEBHOOK_SECRET (cabeçalho Stripe-Signature)."""
+    # Sem segredo qualquer um assinaria com a chave vazia
+    if not webhook_enabled('credit_card'):
+        raise WebhookError('Webhook do Stripe não configurado', status_code=404)
+
+    try:
+        event = stripe.Webhook.construct_event(
+            request.body,
+            request.META.get('HTTP_STRIPE_SIGNATURE', ''),
+            settings.STRIPE_WEBHOOK_SECRET
+        )
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        raise WebhookError(f'Assinatura inválida: {str(e)}')
+
+    event_type = event['type']
+    new_status = STRIPE_EVENT_STATUS.get(event_type)
+    charge = event['data']['object']
+
+    return record_event(
+        'stripe',
+        event['id'],
+        event_type,
+        json.loads(request.body),
+        charge.get('id'),
+        new_status,
+        {'stripe_event': event_type, 'stripe_status': charge.get('status')}
+    )
+
+
+def verify_mercadopago_signature(request, data_id):
+    """
+    Confere o cabeçalho x-signature (ts=...,v1=...) do MercadoPago:
+    HMAC-SHA256 de 'id:<data.id>;request-id:<x-request-id>;ts:<ts>;'.
+    """
+    parts = dict(
+        item.strip().split('=', 1)
+        for item in request.META.get('HTTP_X_SIGNATURE', '').split(',')
+        if '=' in item
+    )
+    if 'ts' not in parts or 'v1' not in parts:
+        raise WebhookError('Assinatura ausente')
+
+    manifest = f"id:{data_id};request-id:{request.META.get('HTTP_X_REQUEST_ID', '')};ts:{parts['ts']};"
+    expected = hmac.new(
+        settings.MERCADOPAGO_WEBHOOK_SECRET.encode(),
+        manifest.encode(),
+        hashlib.sha256
+    ).hexdigest()
+    if not hmac.compare_digest(expected, parts['v1']):
+        raise WebhookError('Assinatura inválida')
+
+
+def handle_mercadopago(request):
+    """
+    Webhook do MercadoPago. A notificação só traz o id do pagamento; o status
+    é lido uma vez na API, em vez de a cada consulta do cliente.
+    """
+    if not webhook_enabled('pix'):
+        raise WebhookError('Webhook do MercadoPago não configurado', status_code=404)
+
+    try:
+        body = json.loads(request.body or b'{}')
+    except ValueError:
+        raise WebhookError('JSON inválido')
+
+    data_id = str(request.GET.get('data.id') or body.get('data', {}).get('id', ''))
+    if data_id.isalnum():
+        data_id = data_id.lower()
+    verify_mercadopago_signature(request, data_id)
+
+    if body.get('type') != 'payment' or not data_id:
+        return True
+
+    event_id = str(body.get('id') or f"{data_id}:{body.get('action', '')}")
+    if is_duplicate('mercadopago', event_id):
+        return False
+
+    try:
+        response = get_provider('mercadopago').get_payment(data_id)
+    except requests.RequestException as e:
+        raise WebhookError(f'MercadoPago indisponível: {str(e)}', status_code=503)
+    if response['status'] != 200:
+        raise WebhookError(f"Pagamento {data_id} não encontrado no MercadoPago", status_code=503)
+
+    mp_payment = response['response']
+    return record_event(
+        'mercadopago',
+        event_id,
+        body.get('action', ''),
+        body,
+        data_id,
+        MERCADOPAGO_STATUS_MAP.get(mp_payment['status'], 'pending'),
+        {
+            'payment_status': mp_payment['status'],
+            'payment_status_detail': mp_payment.get('status_detail'),
+            'last_updated': mp_payment.get('date_last_updated')
+        }
+    )
+
+
+def handle_paghiper(request):
+    """
+    Notificação da PagHiper (POST de formulário com apiKey, transaction_id e
+    notification_id). Sem assinatura: a apiKey é conferida e o status é
+    confirmado na API de notificações da PagHiper.
+    """
+    data = request.POST
+    api_key = data.get('apiKey', '')
+    if not settings.PAGHIPER_API_KEY or not hmac.compare_digest(api_key, settings.PAGHIPER_API_KEY):
+        raise WebhookError('apiKey inválida')
+
+    notification_id = data.get('notification_id')
+    transaction_id = data.get('transaction_id') or data.get('idTransacao')
+    if not notification_id or not transaction_id:
+        raise WebhookError('Notificação incompleta')
+
+    if is_duplicate('paghiper', notification_id):
+        return False
+
+    try:
+        response = get_provider('paghiper').confirm_notification(transaction_id, notification_id)
+        status_request = response.json()['status_request']
+    except (requests.RequestException, ValueError, KeyError) as e:
+        raise WebhookError(f'PagHiper indisponível: {str(e)}', status_code=503)
+
+    if status_request.get('result') != 'success':
+        raise WebhookError('Notificação não confirmada pela PagHiper')
+
+    return record_event(
+        'paghiper',
+        notification_id,
+        status_request.get('status', ''),
+        dict(data.items()),
+        transaction_id,
+        PAGHIPER_STATUS_MAP.get(status_request.get('status'), 'pending'),
+        {
+            'payment_status': status_request.get('status'),
+            'payment_date': status_request.get('paid_date')
+        }
+    )
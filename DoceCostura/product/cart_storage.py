@@ -0,0 +1,325 @@
+import logging
+import secrets
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .carts import CartError, CartService
+from .models import Cart, CartItem, Product
+
+logger = logging.getLogger(__name__)
+
+
+def get_cart_storage_settings():
+    config = {
+        'BACKEND': 'product.cart_storage.DatabaseCartStorage',
+        'CACHE_ALIAS': 'default',
+        'KEY_PREFIX': 'cart',
+        'TIMEOUT': 7 * 24 * 3600,
+        'LOCK_TIMEOUT': 5,
+    }
+    config.update(getattr(settings, 'CART_STORAGE', {}))
+    return config
+
+
+class DatabaseCartStorage:
+    """Carrinho direto nas tabelas Cart/CartItem: cada alteração é gravada no banco."""
+
+    def get_cart(self, user_id):
+        """Carrinho ativo do usuário com itens e produtos carregados, ou None."""
+        return Cart.objects.filter(user_id=user_id, is_active=True).with_items().first()
+
+    def get_or_create_cart(self, user_id):
+        cart = self.get_cart(user_id)
+        if cart is None:
+            cart = Cart.objects.create(user_id=user_id)
+        return cart
+
+    def _get_active(self, user_id):
+        try:
+            return Cart.objects.get(user_id=user_id, is_active=True)
+        except Cart.DoesNotExist:
+            raise CartError('Carrinho não encontrado', status_code=404)
+
+    def add_item(self, user_id, product, quantity):
+        cart, created = Cart.objects.get_or_create(user_id=user_id, is_active=True)
+        CartService.add_item(cart, product, quantity)
+
+    def set_item(self, user_id, product, quantity):
+        CartService.set_item(self._get_active(user_id), product, quantity)
+
+    def remove_item(self, user_id, product_id):
+        CartService.remove_item(self._get_active(user_id), product_id)
+
+    def clear(self, user_id):
+        CartService.clear(self._get_active(user_id))
+
+    def flush(self, user_id):
+        """Grava no banco as alterações pendentes do carrinho (nada a fazer aqui)."""
+
+    def discard(self, user_id):
+        """Esquece o carrinho após o checkout (nada a fazer aqui)."""
+
+
+class CacheCartStorage(DatabaseCartStorage):
+    """
+    Carrinho ativo mantido em um cache chave-valor (Redis em produção,
+    LocMemCache nos testes), no cache CACHE_ALIAS.
+
+    Navegar no carrinho não escreve no banco: a linha de Cart é criada uma
+    vez, os itens ficam no cache e só são gravados em Cart/CartItem por
+    flush(), chamado no checkout e periodicamente por manage.py flush_carts.
+    Cart.needs_flush marca os carrinhos com alterações ainda não gravadas.
+
+    As alterações de um mesmo usuário são serializadas por um lock no cache.
+    Se a entrada sair do cache antes do flush, o carrinho volta ao último
+    estado gravado no banco.
+    """
+
+    def __init__(self):
+        config = get_cart_storage_settings()
+        self.cache = caches[config['CACHE_ALIAS']]
+        self.prefix = config['KEY_PREFIX']
+        self.timeout = config['TIMEOUT']
+        self.lock_timeout = config['LOCK_TIMEOUT']
+
+    def _key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def _lock(self, user_id):
+        return CacheLock(self.cache, f'{self._key(user_id)}:lock', self.lock_timeout)
+
+    def _load(self, user_id):
+        """Estado do carrinho no cache; na falta, lido do banco (None se não houver carrinho)."""
+        state = self.cache.get(self._key(user_id))
+        if state is not None:
+            return state
+
+        cart = Cart.objects.filter(user_id=user_id, is_active=True).first()
+        if cart is None:
+            return None
+
+        state = {
+            'cart_id': cart.id,
+            'created_at': cart.created_at.isoformat(),
+            'updated_at': cart.updated_at.isoformat(),
+            'dirty': False,
+            'items': {
+                product_id: (quantity, added_at.isoformat())
+                for product_id, quantity, added_at in cart.items.values_list('product_id', 'quantity', 'added_at')
+            },
+        }
+        self.cache.set(self._key(user_id), state, self.timeout)
+        return state
+
+    def _save(self, user_id, state):
+        if not state['dirty']:
+            # Primeira alteração desde o último flush
+            Cart.objects.filter(pk=state['cart_id']).update(needs_flush=True)
+            state['dirty'] = True
+        state['updated_at'] = timezone.now().isoformat()
+        self.cache.set(self._key(user_id), state, self.timeout)
+
+    def _build_cart(self, user_id, state):
+        """Monta Cart/CartItem em memória, no formato que o CartSerializer espera."""
+        products = Product.objects.in_bulk(list(state['items']))
+        items = [
+            CartItem(
+                cart_id=state['cart_id'],
+                product=products[product_id],
+                quantity=quantity,
+                added_at=parse_datetime(added_at)
+            )
+            for product_id, (quantity, added_at) in sorted(state['items'].items(), key=lambda item: item[1][1])
+            if product_id in products
+        ]
+
+        cart = Cart(
+            id=state['cart_id'],
+            user_id=user_id,
+            created_at=parse_datetime(state['created_at']),
+            updated_at=parse_datetime(state['updated_at']),
+            is_active=True,
+            subtotal=sum((item.line_total for item in items), Decimal('0')),
+            total_items=len(items)
+        )
+        cart._prefetched_objects_cache = {'items': items}
+        return cart
+
+    def get_cart(self, user_id):
+        state = self._load(user_id)
+        if state is None:
+            return None
+        return self._build_cart(user_id, state)
+
+    def get_or_create_cart(self, user_id):
+        with self._lock(user_id):
+            state = self._load(user_id) or self._create(user_id)
+        return self._build_cart(user_id, state)
+
+    def _create(self, user_id):
+        cart = Cart.objects.create(user_id=user_id)
+        state = {
+            'cart_id': cart.id,
+            'created_at': cart.created_at.isoformat(),
+            'updated_at': cart.updated_at.isoformat(),
+            'dirty': False,
+            'items': {},
+        }
+        self.cache.set(self._key(user_id), state, self.timeout)
+        return state
+
+    def _get_state(self, user_id):
+        state = self._load(user_id)
+        if state is None:
+            raise CartError('Carrinho não encontrado', status_code=404)
+        return state
+
+    def add_item(self, user_id, product, quantity):
+        with self._lock(user_id):
+            state = self._load(user_id) or self._create(user_id)
+            current, added_at = state['items'].get(product.id, (0, timezone.now().isoformat()))
+
+            # Verificar estoque novamente após aumentar quantidade
+            if current and product.stock < current + quantity:
+                raise CartError('Quantidade solicitada não disponível em estoque')
+
+            state['items'][product.id] = (current + quantity, added_at)
+            self._save(user_id, state)
+
+    def set_item(self, user_id, product, quantity):
+        with self._lock(user_id):
+            state = self._get_state(user_id)
+            if quantity == 0:
+                state['items'].pop(product.id, None)
+            else:
+                added_at = state['items'].get(product.id, (0, timezone.now().isoformat()))[1]
+                state['items'][product.id] = (quantity, added_at)
+            self._save(user_id, state)
+
+    def remove_item(self, user_id, product_id):
+        with self._lock(user_id):
+            state = self._get_state(user_id)
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                product_id = None
+            if state['items'].pop(product_id, None) is None:
+                raise CartError('Item não encontrado no carrinho', status_code=404)
+            self._save(user_id, state)
+
+    def clear(self, user_id):
+        with self._lock(user_id):
+            state = self._get_state(user_id)
+            state['items'] = {}
+            self._save(user_id, state)
+
+    def flush(self, user_id):
+        """Grava os itens do cache em CartItem e os totais em Cart, se houver alterações."""
+        with self._lock(user_id):
+            state = self.cache.get(self._key(user_id))
+            if state is None or not state['dirty']:
+                return False
+
+            with transaction.atomic():
+                cart_id = state['cart_id']
+                # Produtos excluídos enquanto estavam no carrinho ficam de fora
+                product_ids = set(
+                    Product.objects.filter(id__in=list(state['items'])).values_list('id', flat=True)
+                )
+                CartItem.objects.filter(cart_id=cart_id).exclude(product_id__in=product_ids).delete()
+                CartItem.objects.bulk_create(
+                    [
+                        CartItem(cart_id=cart_id, product_id=product_id, quantity=quantity,
+                                 added_at=parse_datetime(added_at))
+                        for product_id, (quantity, added_at) in state['items'].items()
+                        if product_id in product_ids
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product'],
+                    update_fields=['quantity']
+                )
+                carts = Cart.objects.filter(pk=cart_id)
+                carts.recalculate_totals()
+                carts.update(needs_flush=False, updated_at=parse_datetime(state['updated_at']))
+
+            state['dirty'] = False
+            self.cache.set(self._key(user_id), state, self.timeout)
+            return True
+
+    def discard(self, user_id):
+        self.cache.delete(self._key(user_id))
+
+
+# Apaga a chave só se ela ainda guarda o token de quem adquiriu o lock
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class CacheLock:
+    """
+    Lock simples com cache.add (atômico no Redis e no LocMemCache).
+
+    Cada aquisição grava um token próprio e a liberação só apaga a chave se
+    ela ainda guarda esse token: se o lock expirou e outro worker o adquiriu,
+    o lock dele continua valendo.
+    """
+
+    def __init__(self, cache, key, timeout):
+        self.cache = cache
+        self.key = key
+        self.timeout = timeout
+        self.token = None
+
+    def __enter__(self):
+        # Inteiro: o RedisCache guarda inteiros sem pickle, comparáveis no script
+        self.token = secrets.randbits(62)
+        deadline = time.monotonic() + self.timeout
+        while not self.cache.add(self.key, self.token, self.timeout):
+            if time.monotonic() > deadline:
+                logger.warning(f"Lock {self.key} não liberado em {self.timeout}s")
+                raise CartError('Carrinho em uso, tente novamente', status_code=409)
+            time.sleep(0.005)
+        return self
+
+    def __exit__(self, *exc_info):
+        if isinstance(self.cache, RedisCache):
+            # Comparação e remoção atômicas, no próprio Redis
+            key = self.cache.make_and_validate_key(self.key)
+            client = self.cache._cache.get_client(key, write=True)
+            client.eval(RELEASE_LOCK_SCRIPT, 1, key, self.token)
+        elif self.cache.get(self.key) == self.token:
+            # Cache local do processo: não há outro processo disputando a chave
+            self.cache.delete(self.key)
+
+
+_storage = None
+
+
+def get_cart_storage():
+    """Backend de carrinho configurado em CART_STORAGE['BACKEND'] (um por processo)."""
+    global _storage
+    if _storage is None:
+        _storage = import_string(get_cart_storage_settings()['BACKEND'])()
+    return _storage
+
+
+def reset_cart_storage(**kwargs):
+    global _storage
+    if kwargs.get('setting', 'CART_STORAGE') == 'CART_STORAGE':
+        _storage = None
+
+
+setting_changed.connect(reset_cart_storage)
@@ -0,0 +1,114 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+
+class CartError(Exception):
+    """Alteração do carrinho recusada; status_code é o código HTTP sugerido."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class CartService:
+    """
+    Alterações dos itens do carrinho.
+
+    Cada operação grava o item e ajusta, na mesma transação, os totais
+    armazenados no carrinho (subtotal e total_items) com um UPDATE
+    incremental; ler os totais não exige percorrer os itens.
+    """
+
+    @staticmethod
+    def _adjust_totals(cart, amount, count):
+        Cart.objects.filter(pk=cart.pk).update(
+            subtotal=F('subtotal') + amount,
+            total_items=F('total_items') + count,
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def add_item(cart, product, quantity):
+        """Adiciona quantity unidades do produto (somando à quantidade atual)."""
+        with transaction.atomic():
+            cart_item, created = CartItem.objects.select_for_update().get_or_create(
+                cart=cart,
+                product=product,
+                defaults={'quantity': quantity}
+            )
+
+            if not created:
+                # Verificar estoque novamente após aumentar quantidade
+                if product.stock < cart_item.quantity + quantity:
+                    raise CartError('Quantidade solicitada não disponível em estoque')
+                CartItem.objects.filter(pk=cart_item.pk).update(quantity=F('quantity') + quantity)
+
+            CartService._adjust_totals(cart, product.price * quantity, 1 if created else 0)
+
+    @staticmethod
+    def set_item(cart, product, quantity):
+        """Define a quantidade do produto no carrinho; zero remove o item."""
+        with transaction.atomic():
+            cart_item = CartItem.objects.select_for_update().filter(cart=cart, product=product).first()
+            previous = cart_item.quantity if cart_item else 0
+
+            if quantity == 0:
+                if cart_item:
+                    cart_item.delete()
+            elif cart_item:
+                CartItem.objects.filter(pk=cart_item.pk).update(quantity=quantity)
+            else:
+                CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+
+            count = (1 if quantity else 0) - (1 if cart_item else 0)
+            CartService._adjust_totals(cart, product.price * (quantity - previous), count)
+
+    @staticmethod
+    def remove_item(cart, product_id):
+        """
+        Raises:
+            CartError se o produto não estiver no carrinho
+        """
+        with transaction.atomic():
+            cart_item = (
+                CartItem.objects
+                .select_for_update()
+                .select_related('product')
+                .filter(cart=cart, product_id=product_id)
+                .first()
+            )
+            if cart_item is None:
+                raise CartError('Item não encontrado no carrinho', status_code=404)
+
+            cart_item.delete()
+            CartService._adjust_totals(cart, -cart_item.line_total, -1)
+
+    @staticmethod
+    def clear(cart):
+        with transaction.atomic():
+            cart.items.all().delete()
+            Cart.objects.filter(pk=cart.pk).update(
+                subtotal=0,
+                total_items=0,
+                updated_at=timezone.now()
+            )
+
+    @staticmethod
+    def recalculate_for_product(product_id):
+        """Recalcula os carrinhos ativos que contêm o produto (ex.: preço alterado)."""
+        updated = (
+            Cart.objects
+            .filter(is_active=True, items__product_id=product_id)
+            .recalculate_totals()
+        )
+        if updated:
+            logger.info(f"Totais de {updated} carrinhos recalculados após alteração do produto {product_id}")
+        return updated
@@ -0,0 +1,189 @@
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.views.decorators.http import condition
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product
+from .serializers import CategorySerializer, ProductListSerializer
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODIFIED_KEY = 'catalog:modified'
+
+# Backends de cache que só existem dentro do processo
+LOCAL_CACHE_BACKENDS = ('LocMemCache', 'DummyCache')
+
+
+def get_catalog_cache_settings():
+    config = {
+        'TIMEOUT': 300,
+        'PRODUCTS_PER_CATEGORY': 10,
+        'SNAPSHOT': True,
+        'LOCAL_VERSION_TTL': 30,
+    }
+    config.update(getattr(settings, 'CATALOG_CACHE', {}))
+    return config
+
+
+def catalog_version_is_shared():
+    """Se o cache padrão (onde fica a versão) é visto por todos os processos."""
+    return not settings.CACHES['default']['BACKEND'].endswith(LOCAL_CACHE_BACKENDS)
+
+
+def catalog_version_timeout():
+    # Com um cache local, escritas de outros processos (outro worker,
+    # manage.py import_products) não chegam à versão deste: ela expira e
+    # recomeça com um valor novo, o que limita o tempo servindo dados antigos
+    if catalog_version_is_shared():
+        return None
+    return get_catalog_cache_settings()['LOCAL_VERSION_TTL']
+
+
+def initial_catalog_version():
+    # Aleatória: se a chave se perder (cache reiniciado, evicção), a contagem
+    # não recomeça em um número que os processos já viram com outro catálogo
+    return random.randrange(1, 2 ** 31)
+
+
+def start_catalog_version():
+    """Cria a versão, se não existir; uma versão nova também move o Last-Modified."""
+    timeout = catalog_version_timeout()
+    if cache.add(CATALOG_VERSION_KEY, initial_catalog_version(), timeout=timeout):
+        cache.set(CATALOG_MODIFIED_KEY, time.time(), timeout=timeout)
+
+
+def get_catalog_version():
+    """Versão atual do catálogo; muda a cada escrita em produtos ou categorias."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        start_catalog_version()
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalida os payloads do catálogo. As entradas antigas ficam órfãs (com a
+    versão anterior na chave) e expiram sozinhas, o que também evita gravar
+    um payload calculado antes da escrita com a versão nova.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        start_catalog_version()
+        cache.incr(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_MODIFIED_KEY, time.time(), timeout=catalog_version_timeout())
+
+
+def get_catalog_last_modified():
+    """Momento da última escrita no catálogo (o de agora, se a chave se perdeu)."""
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        cache.add(CATALOG_MODIFIED_KEY, time.time(), timeout=catalog_version_timeout())
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return datetime.fromtimestamp(modified, tz=timezone.utc)
+
+
+def catalog_etag(request, *args, **kwargs):
+    # Fraco: o mesmo catálogo pode sair do banco ou do catálogo em memória;
+    # o formato entra para a API navegável não validar o JSON
+    renderer_format = getattr(getattr(request, 'accepted_renderer', None), 'format', 'json')
+    return f'W/"catalog-{get_catalog_version()}-{renderer_format}"'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return get_catalog_last_modified()
+
+
+# GETs do catálogo com ETag e Last-Modified calculados da versão do catálogo,
+# sem montar o corpo: If-None-Match/If-Modified-Since que casam recebem 304
+# antes da view consultar o banco
+catalog_condition = condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+
+
+def get_product_updated_at(request, pk):
+    """updated_at do produto (None se não existir), lido uma vez por requisição."""
+    cache_attr = '_product_updated_at'
+    cached = getattr(request, cache_attr, None)
+    if cached is None or cached[0] != pk:
+        try:
+            updated_at = Product.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+        cached = (pk, updated_at)
+        setattr(request, cache_attr, cached)
+    return cached[1]
+
+
+def product_etag(request, pk=None, **kwargs):
+    # A versão cobre a categoria (category_details); o updated_at da linha
+    # cobre escritas no produto que não incrementem a versão
+    updated_at = get_product_updated_at(request, pk)
+    row_version = updated_at.timestamp() if updated_at else 0
+    return f'{catalog_etag(request)[:-1]}-{row_version}"'
+
+
+def product_last_modified(request, pk=None, **kwargs):
+    updated_at = get_product_updated_at(request, pk)
+    catalog_modified = get_catalog_last_modified()
+    return max(updated_at, catalog_modified) if updated_at else catalog_modified
+
+
+# Detalhe do produto: uma consulta pela chave primária (sem serializar)
+# antes de responder 304
+product_condition = condition(etag_func=product_etag, last_modified_func=product_last_modified)
+
+
+def build_by_category(limit):
+    """
+    Monta a lista [{category, products}] com os primeiros produtos ativos de
+    cada categoria em uma única consulta (ROW_NUMBER() OVER (PARTITION BY categoria)).
+    """
+    products = (
+        Product.objects
+        .filter(is_active=True, category__isnull=False)
+        .select_related('category')
+        .annotate(
+            category_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('category_id')],
+                order_by=F('id').asc(),
+            )
+        )
+        .filter(category_rank__lte=limit)
+        .order_by('category_id', 'category_rank')
+    )
+
+    result = []
+    for _, category_products in groupby(products, key=lambda product: product.category_id):
+        category_products = list(category_products)
+        result.append({
+            'category': CategorySerializer(category_products[0].category).data,
+            'products': ProductListSerializer(category_products, many=True).data,
+        })
+    return result
+
+
+def get_by_category_payload():
+    """
+    JSON já renderizado do endpoint by_category, em cache até a próxima
+    escrita em produtos/categorias (ou até CATALOG_CACHE['TIMEOUT']).
+    """
+    config = get_catalog_cache_settings()
+    key = f"catalog:by_category:{get_catalog_version()}"
+
+    payload = cache.get(key)
+    if payload is None:
+        data = build_by_category(config['PRODUCTS_PER_CATEGORY'])
+        payload = JSONRenderer().render(data)
+        cache.set(key, payload, timeout=config['TIMEOUT'])
+    return payload
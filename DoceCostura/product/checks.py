@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .catalog import catalog_version_is_shared, get_catalog_cache_settings
+
+
+@register(Tags.caches)
+def check_catalog_version_cache(app_configs, **kwargs):
+    """Avisa quando o catálogo em memória depende de uma versão que não é compartilhada."""
+    if settings.DEBUG or not get_catalog_cache_settings()['SNAPSHOT'] or catalog_version_is_shared():
+        return []
+    return [
+        Warning(
+            "CATALOG_CACHE['SNAPSHOT'] com o cache 'default' local ao processo.",
+            hint=(
+                "Defina CACHE_LOCATION (Redis) para compartilhar a versão do catálogo; "
+                "sem ele, escritas de outros processos levam até "
+                "CATALOG_CACHE['LOCAL_VERSION_TTL'] segundos para aparecer."
+            ),
+            id='product.W001',
+        )
+    ]
@@ -0,0 +1,247 @@
+import csv
+import json
+import logging
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .catalog import bump_catalog_version
+from .models import Cart, Category, Product
+from .search import product_index
+
+logger = logging.getLogger(__name__)
+
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+INVALID_ENCODING_ERROR = 'A linha não está em UTF-8'
+
+
+def get_product_import_settings():
+    config = {
+        'BATCH_SIZE': 500,
+        'MAX_ERRORS': 1000,
+    }
+    config.update(getattr(settings, 'PRODUCT_IMPORT', {}))
+    return config
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    Validação de uma linha da importação, sem consultas ao banco: a
+    unicidade do sku é resolvida pelo upsert e as categorias são
+    conferidas uma vez por lote.
+    """
+    sku = serializers.CharField(max_length=50)
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    stock = serializers.IntegerField(required=False)
+    category = serializers.IntegerField(required=False, allow_null=True)
+    is_featured = serializers.BooleanField(required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("O preço deve ser maior que zero.")
+        return value
+
+    def validate_stock(self, value):
+        if value < 0:
+            raise serializers.ValidationError("O estoque não pode ser negativo.")
+        return value
+
+
+def iter_jsonl_rows(lines):
+    """(número da linha, dict ou mensagem de erro) para cada linha não vazia."""
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+            except UnicodeDecodeError:
+                yield line_number, INVALID_ENCODING_ERROR
+                continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'JSON inválido: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, 'Cada linha deve ser um objeto JSON'
+            continue
+        yield line_number, row
+
+
+def iter_csv_rows(lines):
+    """
+    (número da linha, dict ou mensagem de erro) para cada registro do CSV;
+    colunas vazias são omitidas. Um registro com bytes fora de UTF-8 vira
+    um erro da linha, sem interromper a leitura das demais.
+    """
+    invalid_lines = set()
+
+    def decode(lines):
+        for line_number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+                except UnicodeDecodeError:
+                    invalid_lines.add(line_number)
+                    line = line.decode('utf-8', errors='replace')
+            yield line
+
+    reader = csv.DictReader(decode(lines))
+    first_line = 2  # depois do cabeçalho
+    for row in reader:
+        # Um registro pode ocupar várias linhas (campos entre aspas)
+        if invalid_lines.intersection(range(first_line, reader.line_num + 1)):
+            yield reader.line_num, INVALID_ENCODING_ERROR
+        else:
+            yield reader.line_num, {
+                field: value for field, value in row.items()
+                if field and value not in (None, '')
+            }
+        first_line = reader.line_num + 1
+
+
+class ProductImporter:
+    """
+    Upsert de produtos em lote, com chave no sku.
+
+    As linhas são lidas do iterável (sem carregar o arquivo todo), validadas
+    e gravadas em lotes de BATCH_SIZE com bulk_create(update_conflicts=True):
+    um INSERT ... ON CONFLICT (sku) DO UPDATE por lote. Só as colunas
+    presentes na linha são atualizadas em produtos existentes. Cada lote tem
+    sua própria transação; linhas inválidas são relatadas e não impedem as
+    demais.
+    """
+
+    def __init__(self, user_id=None, batch_size=None, max_errors=None):
+        config = get_product_import_settings()
+        self.user_id = user_id
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        self.max_errors = config['MAX_ERRORS'] if max_errors is None else max_errors
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self.error_count = 0
+
+    def _add_error(self, line_number, sku, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line_number, 'sku': sku, 'errors': errors})
+
+    def run(self, rows):
+        """
+        Importa os registros de rows, pares (número da linha, dict ou mensagem de erro).
+
+        Returns:
+            dict com created, updated, error_count, errors e elapsed
+        """
+        started = time.monotonic()
+        rows = iter(rows)
+        try:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self._import_batch(batch)
+        finally:
+            # Os lotes já gravados ficam no banco mesmo se a importação falhar
+            if self.created or self.updated:
+                bump_catalog_version()
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Importação de produtos: {self.created} criados, {self.updated} atualizados, "
+            f"{self.error_count} erros em {elapsed:.1f}s"
+        )
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'elapsed': round(elapsed, 3),
+        }
+
+    def _validate(self, batch):
+        """Linhas válidas do lote, {sku: (número da linha, dados)}; a última ocorrência do sku vale."""
+        # Uma instância para o lote todo: os campos do serializer são montados
+        # uma vez (cópia profunda cara), não a cada linha
+        row_serializer = ProductImportRowSerializer()
+        valid = {}
+        for line_number, row in batch:
+            if isinstance(row, str):
+                self._add_error(line_number, None, {'non_field_errors': [row]})
+                continue
+            try:
+                data = row_serializer.run_validation(row)
+            except serializers.ValidationError as e:
+                self._add_error(line_number, row.get('sku'), e.detail)
+                continue
+            valid.pop(data['sku'], None)
+            valid[data['sku']] = (line_number, data)
+
+        category_ids = {data['category'] for _, data in valid.values() if data.get('category')}
+        existing_categories = set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+        for sku, (line_number, data) in list(valid.items()):
+            if data.get('category') and data['category'] not in existing_categories:
+                self._add_error(line_number, sku, {'category': ['Categoria não encontrada.']})
+                del valid[sku]
+        return valid
+
+    def _import_batch(self, batch):
+        valid = self._validate(batch)
+        if not valid:
+            return
+
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {
+                sku: (product_id, price)
+                for sku, product_id, price in Product.objects.filter(sku__in=list(valid)).values_list('sku', 'id', 'price')
+            }
+
+            # As linhas de um lote podem trazer colunas diferentes (JSON lines):
+            # um upsert por conjunto de colunas, para não sobrescrever as ausentes
+            groups = {}
+            for sku, (line_number, data) in valid.items():
+                fields = frozenset(data) - {'sku'}
+                groups.setdefault(fields, []).append(
+                    Product(
+                        **{('category_id' if field == 'category' else field): value for field, value in data.items()},
+                        creator_id=self.user_id,
+                        last_modified_by=self.user_id,
+                        created_at=now,
+                        updated_at=now
+                    )
+                )
+
+            for fields, products in groups.items():
+                update_fields = sorted(fields) + ['last_modified_by', 'updated_at']
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=update_fields
+                )
+
+            # bulk_create não dispara post_save nem devolve os ids dos existentes
+            product_index.update(Product.objects.filter(sku__in=list(valid)))
+
+            repriced = [
+                product_id for sku, (product_id, price) in existing.items()
+                if 'price' in valid[sku][1] and valid[sku][1]['price'] != price
+            ]
+            if repriced:
+                # Mesmo efeito do sinal de preço alterado, uma vez por lote
+                Cart.objects.filter(is_active=True, items__product_id__in=repriced).recalculate_totals()
+
+        self.updated += len(existing)
+        self.created += len(valid) - len(existing)
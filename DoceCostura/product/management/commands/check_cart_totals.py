@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from product.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        'Confere os totais armazenados dos carrinhos (subtotal e total_items) '
+        'com os calculados a partir dos itens e, com --fix, corrige as divergências.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Inclui carrinhos inativos (já finalizados)')
+        parser.add_argument('--fix', action='store_true',
+                            help='Recalcula os totais dos carrinhos divergentes')
+        parser.add_argument('--show', type=int, default=20,
+                            help='Quantidade de divergências listadas')
+
+    def handle(self, *args, **options):
+        carts = Cart.objects.all() if options['all'] else Cart.objects.filter(is_active=True)
+        mismatched = (
+            carts
+            .with_computed_totals()
+            .filter(~Q(subtotal=F('computed_subtotal')) | ~Q(total_items=F('computed_total_items')))
+            .order_by('id')
+        )
+
+        mismatched_ids = []
+        for cart in mismatched.values('id', 'subtotal', 'computed_subtotal', 'total_items', 'computed_total_items'):
+            if len(mismatched_ids) < options['show']:
+                self.stdout.write(
+                    f"Carrinho {cart['id']}: subtotal {cart['subtotal']} (esperado {cart['computed_subtotal']}), "
+                    f"itens {cart['total_items']} (esperado {cart['computed_total_items']})"
+                )
+            mismatched_ids.append(cart['id'])
+
+        total = carts.count()
+        if not mismatched_ids:
+            self.stdout.write(self.style.SUCCESS(f"{total} carrinhos conferidos, nenhuma divergência"))
+            return
+
+        message = f"{len(mismatched_ids)} de {total} carrinhos com totais divergentes"
+        if not options['fix']:
+            # Código de saída diferente de zero para uso em monitoramento
+            raise CommandError(message)
+
+        self.stdout.write(self.style.WARNING(message))
+        fixed = Cart.objects.filter(id__in=mismatched_ids).recalculate_totals()
+        self.stdout.write(self.style.SUCCESS(f"{fixed} carrinhos recalculados"))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from product.cart_storage import get_cart_storage
+from product.carts import CartError
+from product.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava nas tabelas Cart/CartItem os carrinhos com alterações ainda só '
+        'no cache (CART_STORAGE com CacheCartStorage).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repete a gravação a cada N segundos (0 executa uma vez)')
+
+    def handle(self, *args, **options):
+        storage = get_cart_storage()
+
+        while True:
+            close_old_connections()
+            started = time.perf_counter()
+            flushed = skipped = 0
+
+            pending = Cart.objects.filter(needs_flush=True, is_active=True).values_list('id', 'user_id')
+            for cart_id, user_id in pending.iterator():
+                try:
+                    if storage.flush(user_id):
+                        flushed += 1
+                        continue
+                except CartError:
+                    # Carrinho em uso: fica para a próxima execução
+                    skipped += 1
+                    continue
+                # Entrada expirada no cache: não há mais o que gravar
+                Cart.objects.filter(pk=cart_id).update(needs_flush=False)
+
+            self.stdout.write(
+                f"{flushed} carrinhos gravados, {skipped} em uso "
+                f"em {time.perf_counter() - started:.2f}s"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.imports import ProductImporter, iter_csv_rows, iter_jsonl_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa produtos de um arquivo JSON lines ou CSV (upsert pelo sku), '
+        'como o feed noturno dos fornecedores.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo .jsonl ou .csv')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, help='Produtos por lote')
+        parser.add_argument('--user-id', type=int, help='ID gravado em creator_id/last_modified_by')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'jsonl')
+        reader = iter_csv_rows if file_format == 'csv' else iter_jsonl_rows
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as source:
+                report = ProductImporter(
+                    user_id=options['user_id'],
+                    batch_size=options['batch_size']
+                ).run(reader(source))
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler {options['path']}: {e}")
+
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"Linha {error['line']} ({error['sku']}): {error['errors']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['created']} produtos criados, {report['updated']} atualizados, "
+            f"{report['error_count']} linhas com erro em {report['elapsed']:.1f}s"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from product.models import Category, Product
+from product.search import category_index, product_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói o índice de busca de produtos e categorias. O índice é '
+        'mantido a cada escrita; use após alterações feitas com queryset.update().'
+    )
+
+    def handle(self, *args, **options):
+        for index, queryset in ((product_index, Product.objects.all()), (category_index, Category.objects.all())):
+            total = index.rebuild(queryset)
+            self.stdout.write(self.style.SUCCESS(f"Índice '{index.scope}': {total} objetos indexados"))
@@ -1,5 +1,4 @@
-import requests
-from django.conf import settings
+from .tokens import authenticate_token
 
 class JWTUserMiddleware:
     def __init__(self, get_response):
@@ -14,18 +13,9 @@ class JWTUserMiddleware:
         
         if auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
-            try:
-                # Verificar via microserviço
-                response = requests.post(
-                    settings.AUTH_VALIDATE_TOKEN_ENDPOINT,
-                    json={'token': token},
-                    timeout=3
-                )
-                
-                if response.status_code == 200:
-                    request.user_data = response.json().get('user', {'id': None})
-            except Exception:
-                # Falha silenciosa - o user_data já tem um valor padrão
-                pass
+            # Verificação local da assinatura e expiração (sem chamada ao auth_service)
+            user_data = authenticate_token(token)
+            if user_data:
+                request.user_data = user_data
                 
         return self.get_response(request)
\ No newline at end of file
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:18
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('product', 'Cart')
+    CartItem = apps.get_model('product', 'CartItem')
+    money = DecimalField(max_digits=10, decimal_places=2)
+    items = CartItem.objects.filter(cart_id=OuterRef('pk')).order_by().values('cart_id')
+
+    Cart.objects.update(
+        subtotal=Coalesce(
+            Subquery(items.annotate(
+                total=Sum(F('quantity') * F('product__price'), output_field=money)
+            ).values('total')),
+            Value(Decimal('0')),
+            output_field=money
+        ),
+        total_items=Coalesce(
+            Subquery(items.annotate(total=Count('id')).values('total')),
+            Value(0)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_remove_cart_delivery_remove_cart_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_items',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_cart_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='needs_flush',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, DecimalField, F, OuterRef, Prefetch, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 
 class Category(models.Model):
@@ -32,6 +36,16 @@ class Product(models.Model):
     
     def __str__(self):
         return self.name
+    
+    class Meta:
+        indexes = [
+            # Paginação por cursor das listagens (docecostura_common.pagination)
+            # Índices parciais: filter(is_active=True) vira WHERE "is_active", que
+            # não usa um índice que começa pela coluna booleana
+            models.Index(fields=('created_at', 'id'), condition=Q(is_active=True), name='product_active_created'),
+            models.Index(fields=('created_at', 'id'), condition=Q(is_active=True, is_featured=True),
+                         name='product_featured_created'),
+        ]
         
     # Métodos específicos do domínio de produto
     def is_in_stock(self):
@@ -40,12 +54,100 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('product-detail', kwargs={'pk': self.pk})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Preço lido do banco: permite saber no save se ele mudou (totais dos carrinhos)
+        if 'price' in field_names:
+            instance._loaded_price = instance.price
+        return instance
+
+    @property
+    def price_changed(self):
+        return hasattr(self, '_loaded_price') and self._loaded_price != self.price
+
+class SearchTerm(models.Model):
+    """
+    Índice invertido da busca (product.search): um termo normalizado de um
+    objeto indexado, com o peso dos campos em que aparece.
+    """
+    scope = models.CharField(max_length=20)  # índice: 'product', 'category'
+    object_id = models.BigIntegerField()
+    term = models.CharField(max_length=40)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('scope', 'object_id', 'term'), name='unique_search_term'),
+        ]
+        indexes = [
+            # Busca por faixa de termo (prefixo) sem ler a tabela de produtos
+            models.Index(fields=('scope', 'term', 'object_id'), name='search_term_lookup'),
+        ]
+
+def cart_items_totals(field, aggregate):
+    """Subconsulta com o agregado dos itens do carrinho externo (0 se vazio)."""
+    return Coalesce(
+        Subquery(
+            CartItem.objects
+            .filter(cart_id=OuterRef('pk'))
+            .order_by()
+            .values('cart_id')
+            .annotate(total=aggregate)
+            .values('total')
+        ),
+        Value(0),
+        output_field=field
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    @staticmethod
+    def _items_subtotal():
+        field = DecimalField(max_digits=10, decimal_places=2)
+        return cart_items_totals(field, Sum(F('quantity') * F('product__price'), output_field=field))
+
+    @staticmethod
+    def _items_count():
+        return cart_items_totals(models.IntegerField(), Count('id'))
+
+    def with_computed_totals(self):
+        """Anota os totais calculados a partir dos itens (computed_subtotal, computed_total_items)."""
+        return self.annotate(
+            computed_subtotal=self._items_subtotal(),
+            computed_total_items=self._items_count()
+        )
+
+    def recalculate_totals(self):
+        """Recalcula os totais armazenados dos carrinhos em um único UPDATE."""
+        return self.update(subtotal=self._items_subtotal(), total_items=self._items_count())
+
+    def with_items(self):
+        """Carrega itens e produtos do carrinho em duas consultas extras, fixas."""
+        return self.prefetch_related(
+            Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related('product').order_by('added_at', 'id')
+            )
+        )
+
+
 class Cart(models.Model):
     user_id = models.IntegerField(null=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    # Totais mantidos a cada alteração dos itens (product.carts) e dos preços
+    # (product.signals); manage.py check_cart_totals confere e corrige
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
+    total_items = models.PositiveIntegerField(default=0)
+    
+    # Alterações do carrinho ainda só no cache (product.cart_storage.CacheCartStorage)
+    needs_flush = models.BooleanField(default=False, db_index=True)
+
+    objects = CartQuerySet.as_manager()
+    
     def __str__(self):
         return f"Cart of user {self.user_id}" 
     
@@ -53,16 +155,6 @@ class Cart(models.Model):
         indexes = [
                 models.Index(fields=('user_id', 'is_active')), 
         ]
-        
-    @property
-    def subtotal(self):
-        """Calcula o valor total dos itens no carrinho"""
-        return sum(item.line_total for item in self.items.all())
-        
-    @property
-    def total_items(self):
-        """Retorna o número total de itens no carrinho"""
-        return self.items.count()
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
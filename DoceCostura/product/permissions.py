@@ -1,9 +1,12 @@
-import requests
 from rest_framework import permissions
 
+from .tokens import authorize_token
+
 class MicroservicePermission(permissions.BasePermission):
     """
     Permissão personalizada que verifica autorização via microserviço externo.
+
+    O recurso vem do atributo authorization_resource da view ('product' por padrão).
     """
     
     def has_permission(self, request, view):
@@ -17,26 +20,21 @@ class MicroservicePermission(permissions.BasePermission):
             return False
             
         token = auth_header.split(' ')[1]
-        
-        # Fazer requisição ao microserviço de autorização
-        try:
-            response = requests.post(
-                'http://auth-microservice-url/api/auth/verify',
-                json={
-                    'token': token,
-                    'resource': 'product',  # ou categoria, dependendo do viewset
-                    'action': self._get_action_name(request.method, view)
-                },
-                timeout=3  # timeout em segundos
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('authorized', False)
-            return False
-        except Exception:
-            # Em caso de erro de conexão, negar acesso por segurança
-            # Em produção, considere uma política de fallback
+
+        # O middleware já validou o token nesta requisição (resultado em cache):
+        # token inválido não precisa de consulta de autorização
+        user_data = getattr(request, 'user_data', None)
+        if user_data is not None and not user_data.get('id'):
             return False
+
+        # Conjunto de permissões do token obtido do microserviço de autorização
+        # em uma chamada e reaproveitado até o exp do token.
+        # Em caso de erro de conexão, o acesso é negado por segurança
+        return authorize_token(
+            token,
+            getattr(view, 'authorization_resource', 'product'),
+            self._get_action_name(request.method, view)
+        )
             
     def _get_action_name(self, method, view):
         """Converte o método HTTP para nome da ação correspondente"""
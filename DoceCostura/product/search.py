@@ -0,0 +1,8 @@
+# Normalização, índice e filtro da busca ficam em docecostura_common.search,
+# compartilhado com o recommendation_service; aqui só os índices do serviço
+from docecostura_common.search import SearchIndex, SearchIndexFilter  # noqa: F401
+
+from .models import SearchTerm
+
+product_index = SearchIndex(SearchTerm, 'product', {'name': 3, 'sku': 3, 'description': 1})
+category_index = SearchIndex(SearchTerm, 'category', {'name': 1})
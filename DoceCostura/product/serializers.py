@@ -82,4 +82,18 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'user_id', 'items', 'subtotal', 'total_items', 
                   'created_at', 'updated_at', 'is_active']
-        read_only_fields = ['user_id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['user_id', 'created_at', 'updated_at']
+# Ajuste de estoque em lote (sincronização com o estoque físico)
+class StockAdjustmentSerializer(serializers.Serializer):
+    sku = serializers.CharField(max_length=50)
+    quantity = serializers.IntegerField()
+
+class BulkStockAdjustmentSerializer(serializers.Serializer):
+    items = StockAdjustmentSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, value):
+        """Soma os ajustes repetidos do mesmo SKU: {sku: quantidade}"""
+        deltas = {}
+        for item in value:
+            deltas[item['sku']] = deltas.get(item['sku'], 0) + item['quantity']
+        return deltas
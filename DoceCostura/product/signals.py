@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .carts import CartService
+from .catalog import bump_catalog_version
+from .models import Cart, Category, Product
+from .search import category_index, product_index
+from .suggest import suggest_index
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, instance, **kwargs):
+    """Qualquer escrita em produtos ou categorias invalida os payloads do catálogo."""
+    bump_catalog_version()
+    # Dentro de uma transação, outro processo pode remontar o catálogo em
+    # memória (product.snapshot) com os dados antigos já na versão nova
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def recalculate_cart_totals(sender, instance, created, **kwargs):
+    """Preço alterado: recalcula os totais dos carrinhos ativos que têm o produto."""
+    if not created and instance.price_changed:
+        CartService.recalculate_for_product(instance.pk)
+        instance._loaded_price = instance.price
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance, **kwargs):
+    # Os itens são removidos em cascata; guarda os carrinhos afetados antes
+    instance._affected_cart_ids = list(
+        Cart.objects.filter(is_active=True, items__product=instance).values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def recalculate_carts_after_delete(sender, instance, **kwargs):
+    affected = getattr(instance, '_affected_cart_ids', None)
+    if affected:
+        Cart.objects.filter(id__in=affected).recalculate_totals()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Reindexa o objeto salvo, se algum campo indexado pode ter mudado."""
+    index = product_index if sender is Product else category_index
+    if update_fields is not None and not set(update_fields) & set(index.fields):
+        return
+    index.update([instance])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def remove_from_search_index(sender, instance, **kwargs):
+    index = product_index if sender is Product else category_index
+    index.remove([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def update_suggestions(sender, instance, **kwargs):
+    suggest_index.update_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_suggestions(sender, instance, **kwargs):
+    suggest_index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestions(sender, instance, **kwargs):
+    suggest_index.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_from_suggestions(sender, instance, **kwargs):
+    suggest_index.remove_category(instance.pk)
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from operator import attrgetter
+
+from rest_framework.renderers import JSONRenderer
+
+from .catalog import get_catalog_cache_settings, get_catalog_version
+from .models import Category, Product
+from .serializers import ProductListSerializer
+
+logger = logging.getLogger(__name__)
+
+# Campos de ProductListSerializer, mais os usados em filtros e ordenações
+CatalogProduct = namedtuple(
+    'CatalogProduct',
+    ['id', 'name', 'price', 'image', 'is_featured', 'category_id', 'category_name', 'created_at']
+)
+
+# Mesma formatação do preço da listagem ('12.50')
+PRICE_FIELD = ProductListSerializer().fields['price']
+
+# Valores aceitos pelo BooleanFilter do django-filter (BooleanWidget)
+BOOLEAN_VALUES = {'1': True, 'true': True, '0': False, 'false': False}
+
+
+class CatalogSnapshot:
+    """
+    Retrato imutável do catálogo ativo em uma versão (catalog.get_catalog_version).
+
+    Os produtos ativos ficam em tuplas compactas; cada combinação de filtros
+    (categoria, destaque) e ordenação vira, na primeira consulta, uma lista
+    ordenada reaproveitada pelas seguintes. O JSON de cada produto é
+    renderizado uma vez por origem (a URL da imagem é absoluta), e a
+    primeira página de cada combinação fica pronta em bytes.
+    """
+
+    def __init__(self, version, products, categories):
+        self.version = version
+        self.products = products
+        self.categories = categories
+        self.category_ids = {category['id'] for category in categories}
+        self._orders = {}  # (ordenação, categoria, destaque) -> lista ordenada
+        self._fragments = {}  # origem -> {id do produto: JSON}
+        self._pages = {}  # (origem, combinação, tamanho) -> JSON da primeira página
+        self._categories_payload = None
+
+    @classmethod
+    def build(cls, version):
+        storage = Product._meta.get_field('image').storage
+        products = [
+            CatalogProduct(
+                product_id, name, price, storage.url(image) if image else None,
+                is_featured, category_id, category_name, created_at
+            )
+            for product_id, name, price, image, is_featured, category_id, category_name, created_at in (
+                Product.objects
+                .filter(is_active=True)
+                .values_list('id', 'name', 'price', 'image', 'is_featured',
+                             'category_id', 'category__name', 'created_at')
+                .iterator(chunk_size=2000)
+            )
+        ]
+        categories = list(Category.objects.values('id', 'name', 'description'))
+        return cls(version, products, categories)
+
+    def ordered(self, ordering, category=None, is_featured=None):
+        """Produtos que passam pelos filtros, na ordenação dada (com o id como desempate)."""
+        key = (tuple(ordering), category, is_featured)
+        rows = self._orders.get(key)
+        if rows is None:
+            if category is None and is_featured is None:
+                rows = list(self.products)
+                # Sort estável: da última coluna para a primeira
+                for field in reversed(ordering):
+                    rows.sort(key=attrgetter(field.lstrip('-')), reverse=field.startswith('-'))
+            else:
+                rows = [
+                    row for row in self.ordered(ordering)
+                    if (category is None or row.category_id == category)
+                    and (is_featured is None or row.is_featured == is_featured)
+                ]
+            self._orders[key] = rows
+        return rows
+
+    def render_rows(self, rows, request):
+        """JSON (bytes) da lista de produtos, como ProductListSerializer(rows, many=True)."""
+        origin = request.build_absolute_uri('/')
+        fragments = self._fragments.setdefault(origin, {})
+        rendered = []
+        for row in rows:
+            fragment = fragments.get(row.id)
+            if fragment is None:
+                fragment = fragments[row.id] = JSONRenderer().render(self._product_data(row, request))
+            rendered.append(fragment)
+        return b'[' + b','.join(rendered) + b']'
+
+    def render_page(self, paginator, key, request):
+        """Corpo da resposta paginada ({next, previous, results}) da página atual do paginator."""
+        if request.query_params.get(paginator.cursor_query_param):
+            results = self.render_rows(paginator.page, request)
+        else:
+            page_key = (request.build_absolute_uri('/'), key, paginator.page_size)
+            results = self._pages.get(page_key)
+            if results is None:
+                results = self._pages[page_key] = self.render_rows(paginator.page, request)
+        links = JSONRenderer().render({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
+        return links[:-1] + b',"results":' + results + b'}'
+
+    def render_categories(self):
+        """JSON da listagem de categorias, como CategorySerializer(many=True)."""
+        if self._categories_payload is None:
+            self._categories_payload = JSONRenderer().render(self.categories)
+        return self._categories_payload
+
+    @staticmethod
+    def _product_data(row, request):
+        return {
+            'id': row.id,
+            'name': row.name,
+            'price': PRICE_FIELD.to_representation(row.price),
+            'image': request.build_absolute_uri(row.image) if row.image else None,
+            'is_featured': row.is_featured,
+            'category_name': row.category_name,
+        }
+
+
+class CatalogSnapshotStore:
+    """
+    Guarda o retrato do catálogo deste processo.
+
+    A versão do catálogo fica no cache padrão, compartilhado entre os
+    processos, e muda a cada escrita em produtos ou categorias (sinais,
+    ajustes de estoque, importação). Uma leitura que encontra outra versão
+    monta um retrato novo e o troca de uma vez; as consultas em andamento
+    continuam com o anterior, que é imutável.
+
+    Com um cache padrão local (LocMemCache, sem CACHE_LOCATION), a versão
+    não é compartilhada: ela expira em CATALOG_CACHE['LOCAL_VERSION_TTL']
+    segundos, e escritas de outros processos aparecem no máximo nesse prazo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def get(self):
+        version = get_catalog_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self.lock:
+            snapshot = self.snapshot
+            if snapshot is None or snapshot.version != version:
+                started = time.perf_counter()
+                snapshot = self.snapshot = CatalogSnapshot.build(version)
+                logger.info(
+                    f"Catálogo em memória (versão {version}): {len(snapshot.products)} produtos "
+                    f"em {(time.perf_counter() - started) * 1000:.0f}ms"
+                )
+        return snapshot
+
+    def reset(self):
+        self.snapshot = None
+
+
+catalog_snapshot = CatalogSnapshotStore()
+
+
+def snapshot_enabled(request):
+    """O catálogo em memória só responde JSON (a API navegável usa o caminho normal)."""
+    return (
+        get_catalog_cache_settings()['SNAPSHOT']
+        and getattr(request.accepted_renderer, 'format', None) == 'json'
+    )
+
+
+def parse_listing_params(params, snapshot, ordering_fields):
+    """
+    (categoria, destaque, ordenação) de uma listagem de produtos, ou None se
+    os parâmetros precisam do banco: busca, categoria inexistente (o
+    DjangoFilterBackend responde 400) ou mais de um campo em ?ordering=.
+    """
+    if params.get('search', '').strip():
+        return None
+
+    category = params.get('category') or None
+    if category is not None:
+        if not category.isdigit() or int(category) not in snapshot.category_ids:
+            return None
+        category = int(category)
+
+    is_featured = BOOLEAN_VALUES.get((params.get('is_featured') or '').lower())
+
+    ordering = None
+    terms = [term.strip() for term in params.get('ordering', '').split(',') if term.strip()]
+    terms = [term for term in terms if term.lstrip('-') in ordering_fields]
+    if len(terms) > 1:
+        return None
+    if terms:
+        ordering = terms
+    return category, is_featured, ordering
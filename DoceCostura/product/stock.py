@@ -0,0 +1,119 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# SKUs por UPDATE no ajuste em lote (cada SKU usa dois parâmetros no CASE)
+BULK_CHUNK_SIZE = 300
+
+
+class StockError(Exception):
+    """Ajuste de estoque recusado; status_code é o código HTTP sugerido."""
+
+    def __init__(self, message, status_code=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details or {}
+
+
+class StockService:
+    """
+    Ajustes de estoque com um UPDATE condicional:
+
+        UPDATE product SET stock = stock + q WHERE id = ? AND stock + q >= 0
+
+    O banco soma sobre o valor atual da linha, então ajustes e checkouts
+    simultâneos não se sobrescrevem, e um ajuste que deixaria o estoque
+    negativo não altera nada. Só stock e updated_at são gravados.
+    """
+
+    @staticmethod
+    def adjust(queryset, product_id, quantity):
+        """
+        Soma quantity (positiva ou negativa) ao estoque do produto.
+
+        Raises:
+            StockError 404 se o produto não estiver em queryset,
+            StockError 400 se o estoque ficaria negativo
+        """
+        try:
+            products = queryset.filter(pk=product_id)
+            updated = (
+                products
+                .filter(GreaterThanOrEqual(F('stock') + quantity, 0))
+                .update(stock=F('stock') + quantity, updated_at=timezone.now())
+            )
+        except (TypeError, ValueError):
+            raise StockError('Produto não encontrado', status_code=404)
+        if not updated:
+            if not products.exists():
+                raise StockError('Produto não encontrado', status_code=404)
+            raise StockError('Estoque insuficiente para esta operação')
+
+        # update() não dispara post_save
+        bump_catalog_version()
+
+    @staticmethod
+    def bulk_adjust(deltas):
+        """
+        Aplica {sku: quantidade} em UPDATEs de até BULK_CHUNK_SIZE SKUs.
+
+        Tudo ou nada: todos os lotes rodam na mesma transação; se algum SKU
+        não existir ou ficar com estoque negativo, nada é aplicado e
+        StockError (409) traz o motivo de cada SKU recusado, de todos os lotes.
+
+        Returns:
+            dict {sku: estoque final}
+        """
+        skus = list(deltas)
+        now = timezone.now()
+        stocks = {}
+        failed = []
+
+        with transaction.atomic():
+            for start in range(0, len(skus), BULK_CHUNK_SIZE):
+                chunk = skus[start:start + BULK_CHUNK_SIZE]
+                delta = Case(
+                    *[When(sku=sku, then=Value(deltas[sku])) for sku in chunk],
+                    output_field=IntegerField()
+                )
+                products = Product.objects.filter(sku__in=chunk)
+                updated = (
+                    products
+                    .filter(GreaterThanOrEqual(F('stock') + delta, 0))
+                    .update(stock=F('stock') + delta, updated_at=now)
+                )
+                if updated < len(chunk):
+                    # Segue para os próximos lotes para relatar todas as recusas
+                    failed.extend(chunk)
+                    continue
+                stocks.update(products.values_list('sku', 'stock'))
+            if failed:
+                transaction.set_rollback(True)
+
+        if failed:
+            # Lido depois do rollback: o estoque disponível de cada SKU
+            available = dict(Product.objects.filter(sku__in=failed).values_list('sku', 'stock'))
+            rejected = {}
+            for sku in failed:
+                if sku not in available:
+                    rejected[sku] = 'Produto não encontrado'
+                elif available[sku] + deltas[sku] < 0:
+                    rejected[sku] = f'Estoque insuficiente (disponível: {available[sku]})'
+            raise StockError(
+                'Alguns ajustes de estoque foram recusados; nenhum ajuste foi aplicado',
+                status_code=409,
+                details=rejected
+            )
+
+        bump_catalog_version()
+        logger.info(f"Estoque ajustado em lote para {len(stocks)} produtos")
+        return stocks
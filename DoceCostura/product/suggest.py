@@ -0,0 +1,245 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import DatabaseError
+from docecostura_common.search import STOPWORDS, TOKEN_RE, fold
+
+from .catalog import get_catalog_version
+from .models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Entradas examinadas por consulta: prefixos curtos ('a') não percorrem o índice todo
+MAX_SCAN = 400
+
+# Ordem dos resultados para a mesma qualidade de casamento
+KIND_PRODUCT = 0
+KIND_CATEGORY = 1
+
+# Qualidade do casamento (menor é melhor)
+MATCH_START = 0  # início do nome ou o SKU
+MATCH_WORD = 1  # início de outra palavra do nome
+
+
+def normalize_words(text):
+    """Palavras sem acentos e sem stopwords ('Linha de Costura' -> ['linha', 'costura'])."""
+    return [word for word in TOKEN_RE.findall(fold(text or '')) if word not in STOPWORDS]
+
+
+def suggestion_keys(name, sku=None):
+    """Chaves de prefixo de um nome: o nome inteiro, a partir de cada palavra, e o SKU."""
+    words = normalize_words(name)
+    keys = {(' '.join(words), MATCH_START)} if words else set()
+    for position in range(1, len(words)):
+        keys.add((' '.join(words[position:]), MATCH_WORD))
+    if sku:
+        keys.add((' '.join(TOKEN_RE.findall(fold(sku))), MATCH_START))
+    return keys
+
+
+class SuggestIndex:
+    """
+    Índice de prefixos em memória (um por processo) para o autocomplete.
+
+    Os nomes de produtos ativos, seus SKUs e os nomes das categorias
+    viram chaves normalizadas (sem acentos, minúsculas) em uma lista
+    ordenada; a consulta é uma busca binária pelo prefixo seguida da
+    leitura de no máximo MAX_SCAN entradas, sem acessar o banco.
+
+    As escritas deste processo chegam pelos sinais (product.signals) e são
+    aplicadas na hora. Escritas de outros processos aparecem como mudança
+    da versão do catálogo (catalog.get_catalog_version); nesse caso só os
+    produtos com updated_at posterior à última sincronização são relidos,
+    e o índice é reconstruído se algum produto sumiu.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.refresh_lock = threading.Lock()
+        self.entries = []  # (chave, qualidade, tipo, id), ordenada
+        self.labels = {}  # (tipo, id) -> dados do resultado
+        self.keys = {}  # (tipo, id) -> chaves indexadas
+        self.version = None
+        self.synced_at = None
+        self.product_count = 0
+
+    # Construção e atualização
+
+    def _add(self, kind, object_id, label, keys):
+        self.labels[(kind, object_id)] = label
+        self.keys[(kind, object_id)] = keys
+        for key, quality in keys:
+            insort(self.entries, (key, quality, kind, object_id))
+
+    def _remove(self, kind, object_id):
+        self.labels.pop((kind, object_id), None)
+        for key, quality in self.keys.pop((kind, object_id), ()):
+            entry = (key, quality, kind, object_id)
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def _advance_version(self):
+        """
+        Acompanha a versão do catálogo após uma escrita local, que já a
+        incrementou (catalog.bump_catalog_version). Se ela avançou mais de
+        um passo, houve escritas em outros processos: fica para refresh().
+        """
+        current = get_catalog_version()
+        if self.version == current - 1:
+            self.version = current
+
+    @staticmethod
+    def _product_label(product):
+        return {'type': 'product', 'id': product.id, 'name': product.name, 'sku': product.sku}
+
+    @staticmethod
+    def _category_label(category):
+        return {'type': 'category', 'id': category.id, 'name': category.name}
+
+    def rebuild(self):
+        """Relê produtos ativos e categorias e troca o índice inteiro."""
+        started = time.perf_counter()
+        version = get_catalog_version()
+        synced_at = Product.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+
+        entries, labels, keys = [], {}, {}
+        products = Product.objects.filter(is_active=True).only('id', 'name', 'sku')
+        for product in products.iterator(chunk_size=2000):
+            product_keys = suggestion_keys(product.name, product.sku)
+            labels[(KIND_PRODUCT, product.id)] = self._product_label(product)
+            keys[(KIND_PRODUCT, product.id)] = product_keys
+            entries.extend((key, quality, KIND_PRODUCT, product.id) for key, quality in product_keys)
+        product_count = len(labels)
+
+        for category in Category.objects.only('id', 'name'):
+            category_keys = suggestion_keys(category.name)
+            labels[(KIND_CATEGORY, category.id)] = self._category_label(category)
+            keys[(KIND_CATEGORY, category.id)] = category_keys
+            entries.extend((key, quality, KIND_CATEGORY, category.id) for key, quality in category_keys)
+        entries.sort()
+
+        with self.lock:
+            self.entries, self.labels, self.keys = entries, labels, keys
+            self.version, self.synced_at, self.product_count = version, synced_at, product_count
+
+        logger.info(
+            f"Índice de sugestões: {product_count} produtos, {len(entries)} chaves "
+            f"em {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    def update_product(self, product):
+        with self.lock:
+            if self.version is None:
+                return
+            known = (KIND_PRODUCT, product.id) in self.labels
+            self._remove(KIND_PRODUCT, product.id)
+            if product.is_active:
+                self._add(KIND_PRODUCT, product.id, self._product_label(product),
+                          suggestion_keys(product.name, product.sku))
+            self.product_count += int(product.is_active) - int(known)
+            self._advance_version()
+
+    def remove_product(self, product_id):
+        with self.lock:
+            if self.version is None:
+                return
+            if (KIND_PRODUCT, product_id) in self.labels:
+                self.product_count -= 1
+            self._remove(KIND_PRODUCT, product_id)
+            self._advance_version()
+
+    def update_category(self, category):
+        with self.lock:
+            if self.version is None:
+                return
+            self._remove(KIND_CATEGORY, category.id)
+            self._add(KIND_CATEGORY, category.id, self._category_label(category), suggestion_keys(category.name))
+            self._advance_version()
+
+    def remove_category(self, category_id):
+        with self.lock:
+            if self.version is None:
+                return
+            self._remove(KIND_CATEGORY, category_id)
+            self._advance_version()
+
+    def refresh(self):
+        """Aplica as escritas de outros processos desde a última sincronização."""
+        version = get_catalog_version()
+        if version == self.version:
+            return
+        # Uma thread sincroniza; as demais respondem com o índice atual
+        # (só esperam se ele ainda não foi montado)
+        if not self.refresh_lock.acquire(blocking=self.version is None):
+            return
+        try:
+            self._refresh(version)
+        finally:
+            self.refresh_lock.release()
+
+    def _refresh(self, version):
+        if self.version == version:
+            return
+        if self.version is None or self.synced_at is None:
+            self.rebuild()
+            return
+
+        changed = list(
+            Product.objects
+            .filter(updated_at__gte=self.synced_at)
+            .only('id', 'name', 'sku', 'is_active', 'updated_at')
+        )
+        with self.lock:
+            for product in changed:
+                self.update_product(product)
+            if changed:
+                self.synced_at = max(product.updated_at for product in changed)
+            categories = {category.id: category for category in Category.objects.only('id', 'name')}
+            for kind, object_id in list(self.labels):
+                if kind == KIND_CATEGORY and object_id not in categories:
+                    self.remove_category(object_id)
+            for category in categories.values():
+                self.update_category(category)
+            stale = self.product_count != Product.objects.filter(is_active=True).count()
+            self.version = version
+        if stale:
+            # Produtos excluídos em outro processo: não aparecem em updated_at
+            self.rebuild()
+
+    def ensure_ready(self):
+        """Monta ou sincroniza o índice; chamado na inicialização (wsgi) e a cada consulta."""
+        try:
+            self.refresh()
+        except DatabaseError as e:
+            logger.error(f"Não foi possível carregar o índice de sugestões: {e}")
+
+    # Consulta
+
+    def suggest(self, query, limit=None):
+        """Até limit (DEFAULT_LIMIT, no máximo MAX_LIMIT) resultados que começam pelas palavras de query."""
+        limit = min(limit, MAX_LIMIT) if limit and limit > 0 else DEFAULT_LIMIT
+        words = normalize_words(query)
+        if not words:
+            return []
+        prefix = ' '.join(words)
+
+        found = {}
+        with self.lock:
+            position = bisect_left(self.entries, (prefix,))
+            for key, quality, kind, object_id in self.entries[position:position + MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                rank = (quality, kind, len(key))
+                if rank < found.get((kind, object_id), (MATCH_WORD + 1,)):
+                    found[(kind, object_id)] = rank
+            best = heapq.nsmallest(limit, found.items(), key=lambda item: (item[1], item[0]))
+            return [self.labels[identifier] for identifier, _ in best]
+
+
+suggest_index = SuggestIndex()
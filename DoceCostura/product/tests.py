@@ -1,3 +1,1032 @@
-from django.test import TestCase
+import base64
+import json
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import requests
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.checks import run_checks
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .cart_storage import RELEASE_LOCK_SCRIPT, CacheLock
+from .catalog import bump_catalog_version, get_catalog_cache_settings
+from .imports import ProductImporter
+from .models import Cart, CartItem, Category, Product
+from .snapshot import catalog_snapshot
+from .suggest import suggest_index
+from .middleware import JWTUserMiddleware
+from .tokens import (
+    TokenValidationError, _authenticate_token, authenticate_token, authorize_token,
+    decode_access_token, token_cache
+)
+
+TEST_SIGNING_KEY = 'chave-de-teste-com-tamanho-suficiente'
+
+
+def make_access_token(user_id, **claims):
+    return jwt.encode(
+        {'user_id': user_id, 'token_type': 'access', 'exp': int(time.time()) + 300, **claims},
+        TEST_SIGNING_KEY,
+        algorithm='HS256'
+    )
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class CartQueryCountTests(TestCase):
+    """O carrinho deve ser lido em um número fixo de consultas, sem N+1."""
+
+    USER_ID = 42
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Tecidos')
+        cls.products = [
+            Product.objects.create(
+                name=f'Produto {i}',
+                description='Descrição',
+                price=Decimal('10.50'),
+                stock=100,
+                category=cls.category,
+                sku=f'SKU-{i}',
+            )
+            for i in range(30)
+        ]
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_access_token(self.USER_ID)}')
+        self.cart = Cart.objects.create(user_id=self.USER_ID)
+
+    def fill_cart(self, count):
+        CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=2)
+            for product in self.products[:count]
+        ])
+        Cart.objects.filter(pk=self.cart.pk).recalculate_totals()
+
+    def get_cart_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/cart/')
+        self.assertEqual(response.status_code, 200)
+        return response.data[0]
+
+    def test_cart_list_query_count_does_not_grow_with_items(self):
+        self.fill_cart(1)
+        self.get_cart_queries()
+
+        CartItem.objects.all().delete()
+        self.fill_cart(30)
+        data = self.get_cart_queries()
+
+        self.assertEqual(len(data['items']), 30)
+        self.assertEqual(data['total_items'], 30)
+        self.assertEqual(Decimal(data['subtotal']), Decimal('630.00'))
+
+    @mock.patch('product.permissions.authorize_token', return_value=True)
+    def test_add_item_query_count_does_not_grow_with_items(self, authorize_token):
+        self.fill_cart(29)
+
+        # Carrinho (1), produto (1), transação (2, savepoint nos testes),
+        # get_or_create do item (4, com savepoint), totais do carrinho (1)
+        # e leitura com itens e produtos (2)
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                '/api/products/cart/add_item/',
+                {'product_id': self.products[29].id, 'quantity': 1},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_items'], 30)
+        self.assertEqual(Decimal(response.data['subtotal']), Decimal('619.50'))
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+@mock.patch('product.permissions.authorize_token', return_value=True)
+class CartTotalsTests(TestCase):
+    """subtotal e total_items do carrinho são mantidos a cada escrita."""
+
+    USER_ID = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Linhas')
+        cls.first = Product.objects.create(
+            name='Linha', description='', price=Decimal('4.00'), stock=50, category=category, sku='LIN-1'
+        )
+        cls.second = Product.objects.create(
+            name='Agulha', description='', price=Decimal('2.50'), stock=50, category=category, sku='AGU-1'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_access_token(self.USER_ID)}')
+
+    def post(self, action, data=None):
+        response = self.client.post(f'/api/products/cart/{action}/', data or {}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def assert_totals(self, subtotal, total_items):
+        cart = Cart.objects.with_computed_totals().get(user_id=self.USER_ID, is_active=True)
+        self.assertEqual(cart.subtotal, Decimal(subtotal))
+        self.assertEqual(cart.total_items, total_items)
+        self.assertEqual(cart.computed_subtotal, cart.subtotal)
+        self.assertEqual(cart.computed_total_items, cart.total_items)
+
+    def test_mutations_keep_totals_in_sync(self, authorize_token):
+        self.post('add_item', {'product_id': self.first.id, 'quantity': 2})
+        data = self.post('add_item', {'product_id': self.first.id, 'quantity': 1})
+        self.assertEqual(Decimal(data['subtotal']), Decimal('12.00'))
+        self.assert_totals('12.00', 1)
+
+        self.post('add_item', {'product_id': self.second.id, 'quantity': 4})
+        self.assert_totals('22.00', 2)
+
+        self.post('update_item', {'product_id': self.first.id, 'quantity': 1})
+        self.assert_totals('14.00', 2)
+
+        self.post('remove_item', {'product_id': self.second.id})
+        self.assert_totals('4.00', 1)
+
+        self.post('clear')
+        self.assert_totals('0.00', 0)
+
+    def test_price_change_and_product_delete_recalculate_carts(self, authorize_token):
+        self.post('add_item', {'product_id': self.first.id, 'quantity': 3})
+        self.post('add_item', {'product_id': self.second.id, 'quantity': 2})
+
+        product = Product.objects.get(pk=self.first.pk)
+        product.price = Decimal('5.00')
+        product.save()
+        self.assert_totals('20.00', 2)
+
+        Product.objects.get(pk=self.second.pk).delete()
+        self.assert_totals('15.00', 1)
+
+    def test_check_cart_totals_detects_and_fixes_drift(self, authorize_token):
+        self.post('add_item', {'product_id': self.first.id, 'quantity': 3})
+        Cart.objects.update(subtotal=Decimal('1.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('check_cart_totals', stdout=StringIO())
+
+        call_command('check_cart_totals', fix=True, stdout=StringIO())
+        self.assert_totals('12.00', 1)
+
+
+@override_settings(
+    AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY},
+    CART_STORAGE={'BACKEND': 'product.cart_storage.CacheCartStorage', 'CACHE_ALIAS': 'carts'}
+)
+@mock.patch('product.permissions.authorize_token', return_value=True)
+class CacheCartStorageTests(TestCase):
+    """Com CacheCartStorage, navegar no carrinho não grava nas tabelas."""
+
+    USER_ID = 9
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tecidos')
+        cls.products = [
+            Product.objects.create(
+                name=f'Tecido {i}', description='', price=Decimal('8.00'),
+                stock=20, category=category, sku=f'TEC-{i}'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        caches['carts'].clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {make_access_token(self.USER_ID)}')
+
+    def add_item(self, product, quantity=1):
+        response = self.client.post(
+            '/api/products/cart/add_item/',
+            {'product_id': product.id, 'quantity': quantity},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_cart_changes_stay_in_cache_until_flush(self, authorize_token):
+        self.add_item(self.products[0], 2)
+
+        # Produto (1) e produtos do carrinho (1): nenhuma escrita no banco
+        with self.assertNumQueries(2):
+            data = self.add_item(self.products[1])
+
+        self.assertEqual(data['total_items'], 2)
+        self.assertEqual(Decimal(data['subtotal']), Decimal('24.00'))
+        self.assertFalse(CartItem.objects.exists())
+
+        cart = Cart.objects.get(user_id=self.USER_ID)
+        self.assertTrue(cart.needs_flush)
+
+        call_command('flush_carts', stdout=StringIO())
+
+        cart.refresh_from_db()
+        self.assertFalse(cart.needs_flush)
+        self.assertEqual(cart.subtotal, Decimal('24.00'))
+        self.assertEqual(
+            dict(cart.items.values_list('product_id', 'quantity')),
+            {self.products[0].id: 2, self.products[1].id: 1}
+        )
+
+    def test_lock_release_keeps_a_lock_taken_after_expiry(self, authorize_token):
+        cache = caches['carts']
+        lock = CacheLock(cache, 'cart:9:lock', timeout=5)
+        with lock:
+            # O lock expirou e outro worker o adquiriu antes da liberação
+            cache.set('cart:9:lock', lock.token + 1, 5)
+        self.assertEqual(cache.get('cart:9:lock'), lock.token + 1)
+
+        cache.delete('cart:9:lock')
+        with lock:
+            self.assertEqual(cache.get('cart:9:lock'), lock.token)
+        self.assertIsNone(cache.get('cart:9:lock'))
+
+    def test_redis_lock_is_released_with_compare_and_delete(self, authorize_token):
+        cache = mock.Mock(spec=RedisCache)
+        cache.add.return_value = True
+        cache.make_and_validate_key.return_value = ':1:cart:9:lock'
+        client = cache._cache.get_client.return_value
+
+        with CacheLock(cache, 'cart:9:lock', timeout=5) as lock:
+            pass
+
+        cache.delete.assert_not_called()
+        client.eval.assert_called_once_with(RELEASE_LOCK_SCRIPT, 1, ':1:cart:9:lock', lock.token)
+
+    def test_checkout_flushes_cart_and_discards_cached_state(self, authorize_token):
+        self.add_item(self.products[0], 3)
+        self.add_item(self.products[2], 1)
+
+        response = self.client.post('/api/payment/orders/checkout/', {
+            'address': 'Rua das Linhas, 10',
+            'city': 'São Paulo',
+            'state': 'SP',
+            'zipcode': '01000-000',
+            'payment_method': 'pix',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(Decimal(response.data['order']['subtotal']), Decimal('32.00'))
+        self.assertEqual(self.client.get('/api/products/cart/').data, [])
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class ProductsByCategoryTests(TestCase):
+    """by_category: uma consulta com window function e payload em cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Categoria {i}') for i in range(3)]
+        for category in cls.categories:
+            for i in range(12):
+                Product.objects.create(
+                    name=f'{category.name} - Produto {i}',
+                    description='Descrição',
+                    price=Decimal('5.00'),
+                    category=category,
+                    sku=f'SKU-{category.id}-{i}',
+                )
+        Category.objects.create(name='Vazia')
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def test_by_category_uses_one_query_then_cache(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/by_category/')
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual([group['category']['name'] for group in data],
+                         [category.name for category in self.categories])
+        self.assertTrue(all(len(group['products']) == 10 for group in data))
+        self.assertEqual(data[0]['products'][0]['category_name'], 'Categoria 0')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/by_category/')
+
+    def test_product_write_invalidates_cached_payload(self):
+        self.client.get('/api/products/by_category/')
+
+        Product.objects.filter(category=self.categories[0]).order_by('id').first().delete()
+
+        data = self.client.get('/api/products/by_category/').json()
+        self.assertEqual(data[0]['products'][0]['name'], 'Categoria 0 - Produto 1')
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class StockUpdateTests(TestCase):
+    """update_stock e bulk_update_stock: UPDATE condicional, sem estoque negativo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Aviamentos')
+        cls.products = [
+            Product.objects.create(
+                name=f'Botão {i}', description='', price=Decimal('1.00'),
+                stock=10, category=category, sku=f'BOT-{i}'
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def stocks(self):
+        return list(Product.objects.order_by('id').values_list('stock', flat=True))
+
+    def test_update_stock_writes_only_when_result_is_not_negative(self):
+        product = self.products[0]
+        url = f'/api/products/{product.id}/update_stock/'
+
+        # Alteração concorrente que um product.save() sobrescreveria
+        Product.objects.filter(pk=product.pk).update(stock=7)
+
+        response = self.client.post(url, {'quantity': -5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 2)
+
+        response = self.client.post(url, {'quantity': -3}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stocks()[0], 2)
+
+        response = self.client.post('/api/products/999/update_stock/', {'quantity': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_update_stock_is_all_or_nothing(self):
+        url = '/api/products/bulk_update_stock/'
+
+        response = self.client.post(url, {'items': [
+            {'sku': 'BOT-0', 'quantity': 5},
+            {'sku': 'BOT-1', 'quantity': -4},
+            {'sku': 'BOT-1', 'quantity': -1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], {'BOT-0': 15, 'BOT-1': 5})
+
+        response = self.client.post(url, {'items': [
+            {'sku': 'BOT-0', 'quantity': -1},
+            {'sku': 'BOT-2', 'quantity': -11},
+            {'sku': 'NAO-EXISTE', 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(set(response.data['products']), {'BOT-2', 'NAO-EXISTE'})
+        self.assertEqual(self.stocks(), [15, 5, 10])
+
+    def test_bulk_update_stock_reports_rejections_from_every_chunk(self):
+        # Um SKU por lote: as recusas ficam em lotes diferentes, com um lote válido entre elas
+        with mock.patch('product.stock.BULK_CHUNK_SIZE', 1):
+            response = self.client.post('/api/products/bulk_update_stock/', {'items': [
+                {'sku': 'NAO-EXISTE', 'quantity': 1},
+                {'sku': 'BOT-0', 'quantity': -1},
+                {'sku': 'BOT-1', 'quantity': -11},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['products'], {
+            'NAO-EXISTE': 'Produto não encontrado',
+            'BOT-1': 'Estoque insuficiente (disponível: 10)',
+        })
+        self.assertEqual(self.stocks(), [10, 10, 10])
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class ProductBulkUpsertTests(TestCase):
+    """bulk_upsert: INSERT ... ON CONFLICT (sku) por lote, com erros por linha."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Linhas')
+        cls.product = Product.objects.create(
+            name='Linha azul', description='Algodão', price=Decimal('4.00'),
+            stock=30, category=cls.category, sku='LIN-AZUL'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(3, roles=['is_superuser'])}"
+        )
+
+    def upsert(self, body, content_type):
+        return self.client.post('/api/products/bulk_upsert/', data=body, content_type=content_type)
+
+    def test_jsonl_upserts_by_sku_and_reports_invalid_lines(self):
+        lines = [
+            {'sku': 'LIN-AZUL', 'name': 'Linha azul royal', 'price': '4.50'},
+            {'sku': 'LIN-VERDE', 'name': 'Linha verde', 'price': '4.00', 'stock': 12,
+             'category': self.category.id},
+            {'sku': 'LIN-ROSA', 'name': 'Linha rosa', 'price': '-1'},
+            {'sku': 'LIN-PRETA', 'name': 'Linha preta', 'price': '4.00', 'category': 999},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n{quebrado\n'
+
+        with mock.patch('product.imports.get_product_import_settings',
+                        return_value={'BATCH_SIZE': 2, 'MAX_ERRORS': 10}):
+            response = self.upsert(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(
+            [(error['line'], error['sku']) for error in response.data['errors']],
+            [(3, 'LIN-ROSA'), (4, 'LIN-PRETA'), (5, None)]
+        )
+
+        self.product.refresh_from_db()
+        # Colunas ausentes na linha (stock, description) não são sobrescritas
+        self.assertEqual(
+            (self.product.name, self.product.price, self.product.stock, self.product.description),
+            ('Linha azul royal', Decimal('4.50'), 30, 'Algodão')
+        )
+        created = Product.objects.get(sku='LIN-VERDE')
+        self.assertEqual((created.stock, created.category_id, created.creator_id), (12, self.category.id, 3))
+
+    def test_csv_upsert_recalculates_carts_on_price_change(self):
+        cart = Cart.objects.create(user_id=8)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        Cart.objects.filter(pk=cart.pk).recalculate_totals()
+
+        body = 'sku,name,price,stock\nLIN-AZUL,Linha azul,5.00,40\nLIN-BRANCA,Linha branca,3.00,\n'
+        response = self.upsert(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['error_count'], 0)
+        self.assertEqual(Product.objects.get(sku='LIN-BRANCA').stock, 0)
+        cart.refresh_from_db()
+        self.assertEqual(cart.subtotal, Decimal('10.00'))
+
+    def test_lines_outside_utf8_are_row_errors(self):
+        body = (
+            '{"sku": "LIN-VERDE", "name": "Linha verde", "price": "4.00"}\n'.encode()
+            + b'{"sku": "LIN-ROSA", "name": "Linha \xe7", "price": "4.00"}\n'
+        )
+        response = self.upsert(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2])
+
+        # O registro LIN-LILAS ocupa as linhas 3 e 4; o erro está na 4
+        body = (
+            b'sku,name,price\nLIN-ROXA,Linha \xe7,3.00\n'
+            b'LIN-LILAS,"Linha\nlil\xe1s",3.00\nLIN-CINZA,Linha cinza,3.00\n'
+        )
+        response = self.upsert(body, 'text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [2, 4])
+        self.assertTrue(Product.objects.filter(sku='LIN-CINZA').exists())
+
+    def test_failed_import_still_invalidates_the_catalog_for_committed_batches(self):
+        rows = [(1, {'sku': 'LIN-VERDE', 'name': 'Linha verde', 'price': '4.00'}), (2, {'sku': 'LIN-ROSA'})]
+        importer = ProductImporter(batch_size=1)
+        original = importer._import_batch
+        calls = []
+
+        def fail_on_second_batch(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise DatabaseError('conexão perdida')
+            original(batch)
+
+        importer._import_batch = fail_on_second_batch
+        with mock.patch('product.imports.bump_catalog_version') as bump:
+            with self.assertRaises(DatabaseError):
+                importer.run(rows)
+
+        bump.assert_called_once()
+        self.assertTrue(Product.objects.filter(sku='LIN-VERDE').exists())
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class ProductSearchTests(TestCase):
+    """?search= no índice invertido: sem acentos, plural, prefixo e relevância."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Bordados')
+        cls.bastidor = Product.objects.create(
+            name='Bastidor para bordado', description='Madeira', price=Decimal('15.00'),
+            category=category, sku='BAS-01'
+        )
+        cls.linha = Product.objects.create(
+            name='Linha de costura', description='Ideal para bordados à mão', price=Decimal('4.00'),
+            category=category, sku='LIN-01'
+        )
+        cls.agulhas = Product.objects.create(
+            name='Agulhas de mão', description='Kit com 10 agulhas', price=Decimal('6.00'),
+            category=category, sku='AGU-01'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def search(self, query, path='/api/products/'):
+        response = self.client.get(path, {'search': query})
+        self.assertEqual(response.status_code, 200)
+        # Produtos vêm paginados; categorias, em lista
+        items = response.data['results'] if path == '/api/products/' else response.data
+        return [item['name'] for item in items]
+
+    def test_search_folds_accents_and_ranks_name_matches_first(self):
+        self.assertEqual(self.search('BORDADOS'), ['Bastidor para bordado', 'Linha de costura'])
+        self.assertEqual(self.search('mao'), ['Agulhas de mão', 'Linha de costura'])
+        self.assertEqual(self.search('agulha mão'), ['Agulhas de mão'])
+        self.assertEqual(self.search('lin-01'), ['Linha de costura'])
+        self.assertEqual(self.search('tesoura'), [])
+
+    def test_prefix_search_and_incremental_index(self):
+        self.assertEqual(self.search('cost'), ['Linha de costura'])
+
+        self.linha.name = 'Linha encerada'
+        self.linha.save()
+        self.assertEqual(self.search('cost'), [])
+        self.assertEqual(self.search('encer'), ['Linha encerada'])
+
+        self.agulhas.delete()
+        self.assertEqual(self.search('agu'), [])
+        self.assertEqual(self.search('bord', '/api/products/categories/'), ['Bordados'])
+
+    def test_search_query_count_does_not_depend_on_catalog_size(self):
+        Product.objects.bulk_create([
+            Product(name=f'Tecido {i}', description='Algodão', price=Decimal('9.00'), sku=f'TEC-{i}')
+            for i in range(50)
+        ])
+        with self.assertNumQueries(1):
+            self.search('bastidor')
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class ProductSuggestTests(TestCase):
+    """suggest: autocomplete pelo índice de prefixos em memória, sem consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Costura Criativa')
+        Product.objects.create(name='Linha de Costura', description='', price=Decimal('4.00'),
+                               category=cls.category, sku='LIN-01')
+        Product.objects.create(name='Máquina de Costura', description='', price=Decimal('900.00'),
+                               category=cls.category, sku='MAQ-01')
+        Product.objects.create(name='Tesoura', description='', price=Decimal('20.00'),
+                               category=cls.category, sku='TES-01', is_active=False)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        suggest_index.version = None
+        suggest_index.ensure_ready()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def suggest(self, query):
+        response = self.client.get('/api/products/suggest/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['name']) for item in response.data['results']]
+
+    def test_suggest_matches_name_start_then_inner_words_without_queries(self):
+        with self.assertNumQueries(0):
+            results = self.suggest('cos')
+        self.assertEqual(results, [
+            ('category', 'Costura Criativa'),
+            ('product', 'Linha de Costura'),
+            ('product', 'Máquina de Costura'),
+        ])
+        self.assertEqual(self.suggest('maquina de c'), [('product', 'Máquina de Costura')])
+        self.assertEqual(self.suggest('lin-0'), [('product', 'Linha de Costura')])
+        self.assertEqual(self.suggest('tes'), [])
+
+    def test_product_writes_update_the_index_incrementally(self):
+        Product.objects.create(name='Tesoura de picotar', description='', price=Decimal('35.00'),
+                               category=self.category, sku='TES-02')
+        linha = Product.objects.get(sku='LIN-01')
+        linha.name = 'Linha encerada'
+        linha.save()
+        Product.objects.get(sku='MAQ-01').delete()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest('tes'), [('product', 'Tesoura de picotar')])
+        self.assertEqual(self.suggest('costura'), [('category', 'Costura Criativa')])
+        self.assertEqual(self.suggest('encer'), [('product', 'Linha encerada')])
+
+    def test_changes_from_other_processes_are_picked_up_by_version(self):
+        # update() não dispara sinais, como uma escrita feita em outro processo
+        Product.objects.filter(sku='TES-01').update(is_active=True, updated_at=timezone.now())
+        bump_catalog_version()
+
+        self.assertEqual(self.suggest('tes'), [('product', 'Tesoura')])
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY}, CATALOG_CACHE={'SNAPSHOT': False})
+class ProductKeysetPaginationTests(TestCase):
+    """Listagem de produtos paginada por cursor (created_at, id), sem OFFSET."""
+    list_queries = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Tecidos')
+        Product.objects.bulk_create([
+            Product(name=f'Tecido {i:02d}', description='', price=Decimal(10 + i % 7),
+                    category=category, sku=f'TEC-{i:02d}')
+            for i in range(25)
+        ])
+        # Mesmo created_at para todos: o id desempata
+        Product.objects.update(created_at=timezone.now())
+
+    def setUp(self):
+        token_cache.clear()
+        catalog_snapshot.reset()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def walk(self, url, params=None):
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([item['name'] for item in data['results']])
+            if not data['next']:
+                return pages, data
+            response = self.client.get(data['next'])
+
+    def test_cursor_walks_every_product_once_in_order(self):
+        self.client.get('/api/products/')
+        with self.assertNumQueries(self.list_queries):
+            self.client.get('/api/products/', {'limit': 10})
+
+        pages, last = self.walk('/api/products/', {'limit': 10})
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), [f'Tecido {i:02d}' for i in reversed(range(25))])
+
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([item['name'] for item in previous['results']], pages[1])
+
+    def test_cursor_follows_requested_ordering(self):
+        pages, _ = self.walk('/api/products/', {'ordering': 'price', 'limit': 4})
+        products = list(Product.objects.order_by('price', 'id').values_list('name', flat=True))
+        self.assertEqual(sum(pages, []), products)
+
+    def test_page_size_is_capped_and_cursor_is_validated(self):
+        response = self.client.get('/api/products/', {'limit': 1000})
+        self.assertEqual(len(response.json()['results']), 25)
+
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'invalido'}).status_code, 404)
+        with mock.patch('docecostura_common.pagination.KeysetPagination.max_page_size', 5):
+            response = self.client.get('/api/products/', {'limit': 1000})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_tampered_cursor_is_rejected(self):
+        for values in (['abc', 1], [timezone.now().isoformat(), 'x'], [None, 1], [[1], 2], [1]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'o': ['-created_at', '-id'], 'v': values, 'r': 0}).encode()
+            ).decode()
+            with self.subTest(values=values):
+                self.assertEqual(self.client.get('/api/products/', {'cursor': cursor}).status_code, 404)
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY}, CATALOG_CACHE={'SNAPSHOT': True})
+class CatalogSnapshotTests(ProductKeysetPaginationTests):
+    """As mesmas listagens respondidas pelo catálogo em memória, sem consultas."""
+    list_queries = 0
+
+    def get_json(self, url, params=None, snapshot=True):
+        with self.settings(CATALOG_CACHE={'SNAPSHOT': snapshot}):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_snapshot_matches_database_for_filters_and_orderings(self):
+        Product.objects.filter(name__in=['Tecido 03', 'Tecido 10']).update(is_featured=True)
+        other = Category.objects.create(name='Linhas')
+        Product.objects.create(name='Linha', description='', price=Decimal('3.50'), category=other, sku='LIN-01')
+        Product.objects.create(name='Inativo', description='', price=Decimal('1.00'), sku='INA-01', is_active=False)
+        bump_catalog_version()
+
+        for params in [
+            {}, {'category': other.id}, {'is_featured': 'true'}, {'is_featured': 'false'},
+            {'ordering': '-price'}, {'ordering': 'name', 'category': other.id}, {'ordering': 'created_at'},
+            {'ordering': 'stock'}, {'limit': 7, 'ordering': 'price'},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get_json('/api/products/', params),
+                    self.get_json('/api/products/', params, snapshot=False)
+                )
+        self.assertEqual(
+            self.get_json('/api/products/featured/'),
+            self.get_json('/api/products/featured/', snapshot=False)
+        )
+        self.assertEqual(
+            self.get_json('/api/products/categories/'),
+            self.get_json('/api/products/categories/', snapshot=False)
+        )
+
+        # Os cursores valem nos dois caminhos
+        page = self.get_json('/api/products/', {'ordering': 'price', 'limit': 5}, snapshot=False)
+        self.assertEqual(
+            self.get_json(page['next']),
+            self.get_json(page['next'], snapshot=False)
+        )
+
+    def test_writes_rebuild_the_snapshot(self):
+        self.get_json('/api/products/')
+        with self.assertNumQueries(0):
+            self.get_json('/api/products/categories/')
+
+        product = Product.objects.get(name='Tecido 24')
+        product.name = 'Tecido renomeado'
+        product.save()
+        self.assertEqual(self.get_json('/api/products/')['results'][0]['name'], 'Tecido renomeado')
+
+        Category.objects.create(name='Aviamentos')
+        self.assertIn('Aviamentos', [category['name'] for category in self.get_json('/api/products/categories/')])
+
+        # Busca e filtros desconhecidos continuam no banco
+        self.assertEqual(self.get_json('/api/products/', {'search': 'renomeado'})['results'][0]['id'], product.id)
+        response = self.client.get('/api/products/', {'category': 999})
+        self.assertEqual(response.status_code, 400)
+
+    def test_local_cache_bounds_staleness_of_other_processes_writes(self):
+        self.get_json('/api/products/')
+        # Escrita de outro processo: não passa pelos sinais deste
+        Product.objects.filter(name='Tecido 24').update(name='Tecido de outro processo')
+        self.assertEqual(self.get_json('/api/products/')['results'][0]['name'], 'Tecido 24')
+
+        expired = time.time() + get_catalog_cache_settings()['LOCAL_VERSION_TTL'] + 1
+        with mock.patch('time.time', return_value=expired):
+            self.assertEqual(self.get_json('/api/products/')['results'][0]['name'], 'Tecido de outro processo')
+
+    def test_check_warns_about_snapshot_with_local_cache(self):
+        with self.settings(DEBUG=False):
+            self.assertIn('product.W001', [message.id for message in run_checks()])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://redis:6379/1'}}
+        with self.settings(DEBUG=False, CACHES=redis):
+            self.assertNotIn('product.W001', [message.id for message in run_checks()])
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY}, CATALOG_CACHE={'SNAPSHOT': False})
+class CatalogConditionalRequestTests(TestCase):
+    """ETag e Last-Modified do catálogo: 304 sem consultar o banco."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Linhas')
+        cls.product = Product.objects.create(
+            name='Linha de costura', description='', price=Decimal('4.00'), category=cls.category, sku='LIN-01'
+        )
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {make_access_token(1, roles=['is_superuser'])}"
+        )
+
+    def test_matching_etag_returns_304_before_querying(self):
+        # O detalhe do produto lê o updated_at da linha (test_writes_change_the_validators)
+        for url in ['/api/products/', '/api/products/featured/', '/api/products/categories/']:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('W/"catalog-'))
+                self.assertIn('Last-Modified', response)
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_writes_change_the_validators(self):
+        first = self.client.get('/api/products/')
+        self.assertEqual(
+            self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304
+        )
+
+        self.product.price = Decimal('5.00')
+        self.product.save()
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+        # Detalhe: o updated_at do produto entra no ETag, mesmo sem mudar a versão
+        url = f'/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+        Product.objects.filter(pk=self.product.pk).update(stock=9, updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock'], 9)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        # Ajustes de estoque (UPDATE sem sinais) também mudam a versão
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        self.client.post(f'/api/products/{self.product.id}/update_stock/', {'quantity': 1}, format='json')
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(
+    AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY},
+    AUTH_TOKEN_CACHE={'MAX_TTL': 300, 'NEGATIVE_TTL': 30, 'USER_REVOCATION_TTL': 3600},
+)
+class TokenCacheTests(TestCase):
+    """Cache de validação de tokens: validade das entradas e revogações compartilhadas."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.validate = mock.patch('product.tokens._authenticate_token', wraps=_authenticate_token)
+
+    def test_positive_entry_expires_with_the_token(self):
+        token = make_access_token(5, exp=int(time.time()) + 60)
+        with self.validate as validate:
+            self.assertEqual(authenticate_token(token)['id'], 5)
+            authenticate_token(token)
+            self.assertEqual(validate.call_count, 1)
+
+            with mock.patch('time.time', return_value=time.time() + 61):
+                authenticate_token(token)
+            self.assertEqual(validate.call_count, 2)
+
+    def test_negative_entry_expires_after_negative_ttl(self):
+        token = make_access_token(5, token_type='refresh')
+        with self.validate as validate:
+            self.assertIsNone(authenticate_token(token))
+            self.assertIsNone(authenticate_token(token))
+            self.assertEqual(validate.call_count, 1)
+
+            with mock.patch('time.time', return_value=time.time() + 31):
+                self.assertIsNone(authenticate_token(token))
+            self.assertEqual(validate.call_count, 2)
+
+    def test_invalidate_token_drops_validation_and_permissions(self):
+        token_cache.set(('validate', 'a'), {'id': 1})
+        token_cache.set(('permissions', 'a'), {'permissions': {}})
+        token_cache.set(('validate', 'b'), {'id': 2})
+        token_cache.invalidate_token('a')
+
+        self.assertEqual(token_cache.get(('validate', 'a')), (False, None))
+        self.assertEqual(token_cache.get(('permissions', 'a')), (False, None))
+        self.assertEqual(token_cache.get(('validate', 'b')), (True, {'id': 2}))
+
+    def test_revoked_token_is_refused_after_the_local_cache_is_gone(self):
+        token = make_access_token(5)
+        other = make_access_token(5, jti='outro')
+        self.assertIsNotNone(authenticate_token(token))
+
+        response = self.client.post('/api/products/token/revoke/', {'token': token}, format='json')
+        self.assertTrue(response.data['revoked'])
+
+        # Outro processo: nada no cache local, a revogação vem do cache compartilhado
+        token_cache.clear()
+        self.assertIsNone(authenticate_token(token))
+        self.assertIsNotNone(authenticate_token(other))
+
+    def test_user_revocation_refuses_tokens_issued_before_it(self):
+        now = int(time.time())
+        old_token = make_access_token(5, iat=now - 10)
+        new_token = make_access_token(5, iat=now)
+        # Emitido no mesmo segundo da revogação (novo login logo após a troca de senha)
+        same_second_token = make_access_token(5, iat=now - 5)
+        self.assertIsNotNone(authenticate_token(old_token))
+
+        revocation = jwt.encode(
+            {'user_id': 5, 'token_type': 'user_revocation', 'iat': now - 5, 'exp': now + 60},
+            TEST_SIGNING_KEY, algorithm='HS256'
+        )
+        response = self.client.post('/api/products/token/revoke/', {'user_revocation': revocation}, format='json')
+        self.assertTrue(response.data['revoked'])
+
+        self.assertIsNone(authenticate_token(old_token))
+        self.assertIsNotNone(authenticate_token(new_token))
+        self.assertIsNotNone(authenticate_token(same_second_token))
+        self.assertIsNotNone(authenticate_token(make_access_token(6, iat=now - 10)))
+
+    def test_user_revocation_must_be_signed_by_the_auth_service(self):
+        now = int(time.time())
+        forged = jwt.encode(
+            {'user_id': 5, 'token_type': 'user_revocation', 'iat': now, 'exp': now + 60},
+            'outra-chave-com-tamanho-suficiente!', algorithm='HS256'
+        )
+        response = self.client.post('/api/products/token/revoke/', {'user_revocation': forged}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Um access token também não serve como aviso de revogação
+        response = self.client.post(
+            '/api/products/token/revoke/', {'user_revocation': make_access_token(5)}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNotNone(authenticate_token(make_access_token(5, iat=now - 10)))
+
+
+@override_settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY})
+class AccessTokenVerificationTests(TestCase):
+    """Verificação local dos access tokens, middleware e consulta de permissões."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_signature_expiry_and_token_type(self):
+        self.assertEqual(decode_access_token(make_access_token(5))['user_id'], 5)
+
+        expired = make_access_token(5, exp=int(time.time()) - 10)
+        invalid = [
+            jwt.encode({'user_id': 5, 'token_type': 'access', 'exp': int(time.time()) + 300},
+                       'outra-chave-com-tamanho-suficiente!', algorithm='HS256'),
+            expired,
+            make_access_token(5, token_type='refresh'),
+            jwt.encode({'token_type': 'access', 'exp': int(time.time()) + 300},
+                       TEST_SIGNING_KEY, algorithm='HS256'),
+        ]
+        for token in invalid:
+            with self.subTest(token=token), self.assertRaises(TokenValidationError):
+                decode_access_token(token)
+
+        with self.settings(AUTH_JWT={'SIGNING_KEY': TEST_SIGNING_KEY, 'LEEWAY': 30}):
+            self.assertEqual(decode_access_token(expired)['user_id'], 5)
+
+    def test_middleware_sets_user_data_from_the_token(self):
+        middleware = JWTUserMiddleware(lambda request: request)
+        factory = RequestFactory()
+
+        token = make_access_token(5, email='a@b.com')
+        request = middleware(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        self.assertEqual(request.user_data, {'id': 5, 'email': 'a@b.com'})
+
+        for header in ('', 'Bearer invalido', f"Token {make_access_token(5)}"):
+            with self.subTest(header=header):
+                request = middleware(factory.get('/', HTTP_AUTHORIZATION=header))
+                self.assertEqual(request.user_data, {'id': None})
+
+    def test_remote_check_falls_back_to_local_verification_when_auth_service_is_down(self):
+        token = make_access_token(5)
+        remote_check = {'SIGNING_KEY': TEST_SIGNING_KEY, 'REMOTE_CHECK': True}
+
+        with self.settings(AUTH_JWT=remote_check):
+            with mock.patch('product.tokens.requests.post', side_effect=requests.ConnectionError) as post:
+                self.assertEqual(_authenticate_token(token), {'id': 5})
+            post.assert_called_once()
+
+            with mock.patch('product.tokens.requests.post', return_value=mock.Mock(status_code=401)):
+                self.assertIsNone(_authenticate_token(token))
+
+        # Sem chave local, só vale a resposta do auth_service
+        with self.settings(AUTH_JWT={}):
+            with mock.patch('product.tokens.requests.post', side_effect=requests.ConnectionError):
+                self.assertIsNone(_authenticate_token(token))
+
+    def test_permission_set_is_fetched_once_per_token(self):
+        token = make_access_token(5)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'user_id': '5', 'permissions': {'cart': ['add_item']}, 'expires_at': 0}
+
+        with mock.patch('product.tokens.requests.post', return_value=response) as post:
+            self.assertTrue(authorize_token(token, 'cart', 'add_item'))
+            self.assertFalse(authorize_token(token, 'cart', 'clear'))
+            self.assertFalse(authorize_token(token, 'product', 'create'))
+        post.assert_called_once()
+        self.assertEqual(post.call_args.kwargs['json'], {'token': token})
+
+    def test_permission_errors_are_not_cached(self):
+        token = make_access_token(5)
+        with mock.patch('product.tokens.requests.post', return_value=mock.Mock(status_code=503)) as post:
+            self.assertFalse(authorize_token(token, 'cart', 'add_item'))
+            self.assertFalse(authorize_token(token, 'cart', 'add_item'))
+        self.assertEqual(post.call_count, 2)
@@ -0,0 +1,378 @@
+import hashlib
+import logging
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.cache import cache, caches
+
+logger = logging.getLogger(__name__)
+
+
+class TokenValidationError(Exception):
+    """Token inválido, expirado ou que não é um access token."""
+
+
+def get_jwt_settings():
+    """Configuração de verificação dos tokens emitidos pelo auth_service."""
+    config = {
+        'ALGORITHM': 'HS256',
+        'SIGNING_KEY': '',
+        'VERIFYING_KEY': '',
+        'AUDIENCE': None,
+        'ISSUER': None,
+        'LEEWAY': 0,
+        'USER_ID_CLAIM': 'user_id',
+        'TOKEN_TYPE_CLAIM': 'token_type',
+        'REMOTE_CHECK': False,
+    }
+    config.update(getattr(settings, 'AUTH_JWT', {}))
+    return config
+
+
+def local_verification_enabled():
+    config = get_jwt_settings()
+    return bool(config['VERIFYING_KEY'] or config['SIGNING_KEY'])
+
+
+def decode_access_token(token):
+    """
+    Verifica localmente assinatura e expiração de um access token do SimpleJWT.
+
+    Para HS256 usa a chave compartilhada (SIGNING_KEY); para algoritmos
+    assimétricos (RS256, ES256...) usa a chave pública publicada (VERIFYING_KEY).
+
+    Returns:
+        Dicionário com os claims do token
+
+    Raises:
+        TokenValidationError se o token não for válido
+    """
+    return decode_token(token, 'access')
+
+
+def decode_token(token, token_type):
+    """Como decode_access_token, para um token do auth_service do tipo token_type."""
+    config = get_jwt_settings()
+    key = config['VERIFYING_KEY'] or config['SIGNING_KEY']
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[config['ALGORITHM']],
+            audience=config['AUDIENCE'],
+            issuer=config['ISSUER'],
+            leeway=config['LEEWAY'],
+            options={'require': ['exp', config['USER_ID_CLAIM']]},
+        )
+    except jwt.InvalidTokenError as e:
+        raise TokenValidationError(str(e))
+
+    if claims.get(config['TOKEN_TYPE_CLAIM']) != token_type:
+        raise TokenValidationError(f'Token não é do tipo {token_type}')
+
+    return claims
+
+
+def build_user_data(claims):
+    """Converte os claims do token no formato de request.user_data."""
+    config = get_jwt_settings()
+    user_data = {'id': claims.get(config['USER_ID_CLAIM'])}
+    for field in ('email', 'is_active', 'is_staff', 'is_superuser', 'roles'):
+        if field in claims:
+            user_data[field] = claims[field]
+    return user_data
+
+
+def validate_token_remotely(token):
+    """
+    Valida o token no auth_service (endpoint token/validate).
+
+    Returns:
+        user_data se o token for válido, None se o auth_service recusar
+
+    Raises:
+        requests.RequestException se o auth_service não responder
+    """
+    response = requests.post(
+        settings.AUTH_VALIDATE_TOKEN_ENDPOINT,
+        json={'token': token},
+        timeout=3
+    )
+    if response.status_code != 200:
+        return None
+
+    payload = response.json()
+    if 'user' in payload:
+        return payload['user']
+
+    user_data = {'id': payload.get('user_id')}
+    for field in ('email', 'is_active', 'is_staff'):
+        if field in payload:
+            user_data[field] = payload[field]
+    return user_data
+
+
+def _authenticate_token(token):
+    """
+    Retorna o user_data do token ou None se ele não for válido, sem cache.
+
+    Com uma chave configurada em AUTH_JWT a verificação é local, sem
+    chamada de rede. A consulta ao auth_service só acontece quando não há
+    chave configurada ou quando AUTH_JWT['REMOTE_CHECK'] está ativo para
+    detectar tokens revogados; nesse caso, se o auth_service estiver fora
+    do ar, vale o resultado da verificação local.
+    """
+    if not local_verification_enabled():
+        try:
+            return validate_token_remotely(token)
+        except Exception as e:
+            logger.warning(f"Falha ao validar token no auth_service: {str(e)}")
+            return None
+
+    try:
+        claims = decode_access_token(token)
+    except TokenValidationError:
+        return None
+
+    user_data = build_user_data(claims)
+
+    if get_jwt_settings()['REMOTE_CHECK']:
+        try:
+            remote_user_data = validate_token_remotely(token)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar revogação no auth_service: {str(e)}")
+            return user_data
+        if remote_user_data is None:
+            return None
+
+    return user_data
+
+
+def get_token_cache_settings():
+    """Configuração do cache de validação/autorização de tokens."""
+    config = {
+        'CACHE_ALIAS': 'tokens',
+        'MAX_TTL': 300,
+        'NEGATIVE_TTL': 30,
+        'USER_REVOCATION_TTL': 3600,
+    }
+    config.update(getattr(settings, 'AUTH_TOKEN_CACHE', {}))
+    return config
+
+
+def hash_token(token):
+    """O token nunca é guardado em claro no cache, apenas o hash."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_unverified_claims(token):
+    """
+    Claims do token sem verificar a assinatura ({} se ilegível). Servem
+    apenas para limitar a validade das entradas do cache e para consultar
+    revogações; a verificação é feita à parte.
+    """
+    try:
+        return jwt.decode(token, options={'verify_signature': False, 'verify_exp': False})
+    except jwt.InvalidTokenError:
+        return {}
+
+
+def get_token_expiry(token):
+    exp = get_unverified_claims(token).get('exp')
+    return exp if isinstance(exp, (int, float)) else None
+
+
+class TokenCache:
+    """
+    Resultados de validação e autorização de tokens, no cache CACHE_ALIAS
+    (CACHES['tokens']: LocMemCache do processo, que descarta as entradas
+    menos usadas ao passar de MAX_ENTRIES).
+
+    - Nenhuma entrada positiva vive além do exp do token (nem de MAX_TTL).
+    - Tokens inválidos ficam em cache negativo por NEGATIVE_TTL segundos.
+
+    As revogações não ficam aqui, e sim no cache padrão (is_token_revoked),
+    compartilhado entre os processos.
+    """
+
+    KINDS = ('validate', 'permissions')
+
+    _missing = object()
+
+    def __init__(self, config=None):
+        self._config = config
+
+    @property
+    def config(self):
+        if self._config is not None:
+            return self._config
+        return get_token_cache_settings()
+
+    @property
+    def cache(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    def get(self, key):
+        """Retorna (encontrado, valor) para a chave (tipo, hash do token)."""
+        value = self.cache.get(self._cache_key(key), self._missing)
+        if value is self._missing:
+            return False, None
+        return True, value
+
+    def set(self, key, value, token_expiry=None):
+        """
+        Guarda o valor. Valores vazios (None/False) usam o TTL negativo;
+        os demais expiram em min(exp do token, agora + MAX_TTL).
+        """
+        config = self.config
+        now = time.time()
+        if value:
+            expires_at = now + config['MAX_TTL']
+            if token_expiry is not None:
+                expires_at = min(expires_at, token_expiry)
+        else:
+            expires_at = now + config['NEGATIVE_TTL']
+        if expires_at <= now:
+            return
+        self.cache.set(self._cache_key(key), value, timeout=expires_at - now)
+
+    def invalidate_token(self, token_key):
+        """Remove as entradas do token (ex.: revogação, mudança de permissões)."""
+        self.cache.delete_many([self._cache_key((kind, token_key)) for kind in self.KINDS])
+
+    def clear(self):
+        self.cache.clear()
+
+    @staticmethod
+    def _cache_key(key):
+        return 'auth:{}:{}'.format(*key)
+
+
+token_cache = TokenCache()
+
+REVOKED_TOKEN_KEY = 'auth:revoked-token:{}'
+REVOKED_USER_KEY = 'auth:revoked-user:{}'
+
+
+def is_token_revoked(token, token_key):
+    """
+    Se o token foi revogado (logout) ou pertence a um usuário cujos tokens
+    foram revogados depois da emissão dele (desativação, troca de senha).
+
+    As revogações ficam no cache padrão: com CACHE_LOCATION (Redis) valem
+    para todos os processos, numa única consulta (get_many) por chamada;
+    sem ele, apenas para o processo que recebeu o aviso do auth_service.
+    """
+    claims = get_unverified_claims(token)
+    user_id = claims.get(get_jwt_settings()['USER_ID_CLAIM'])
+    keys = [REVOKED_TOKEN_KEY.format(token_key)]
+    if user_id is not None:
+        keys.append(REVOKED_USER_KEY.format(user_id))
+    revoked = cache.get_many(keys)
+    if keys[0] in revoked:
+        return True
+    revoked_at = revoked.get(REVOKED_USER_KEY.format(user_id))
+    if revoked_at is None:
+        return False
+    # Sem iat não há como saber se o token é anterior à revogação. Os iat
+    # têm resolução de segundos: um token emitido no mesmo segundo da
+    # revogação (novo login logo após a troca de senha) continua valendo
+    issued_at = claims.get('iat')
+    return not isinstance(issued_at, (int, float)) or issued_at < revoked_at
+
+
+def authenticate_token(token):
+    """
+    Versão com cache de _authenticate_token: o resultado (positivo ou
+    negativo) é reaproveitado entre requisições até o exp do token.
+    """
+    token_key = hash_token(token)
+    if is_token_revoked(token, token_key):
+        return None
+
+    key = ('validate', token_key)
+    found, user_data = token_cache.get(key)
+    if found:
+        return user_data
+
+    user_data = _authenticate_token(token)
+    token_cache.set(key, user_data, token_expiry=get_token_expiry(token))
+    return user_data
+
+
+def get_permission_set(token):
+    """
+    Conjunto de permissões do token, {recurso: [ações]}, obtido do auth_service
+    em uma única chamada e guardado em cache até o exp do token.
+
+    Returns:
+        O conjunto de permissões, ou None se o token for recusado ou o
+        auth_service não responder (nesse caso sem cache)
+    """
+    token_key = hash_token(token)
+    if is_token_revoked(token, token_key):
+        return None
+
+    key = ('permissions', token_key)
+    found, entry = token_cache.get(key)
+    if found:
+        return entry['permissions'] if entry else None
+
+    try:
+        response = requests.post(
+            settings.AUTH_AUTHORIZE_ENDPOINT,
+            json={'token': token},
+            timeout=3  # timeout em segundos
+        )
+    except Exception as e:
+        logger.warning(f"Falha ao consultar permissões no auth_service: {str(e)}")
+        return None
+
+    if response.status_code >= 500:
+        return None
+
+    permission_set = None
+    if response.status_code == 200:
+        permission_set = response.json().get('permissions', {})
+    # Um conjunto vazio também é um resultado válido (positivo) até o exp
+    token_cache.set(
+        key,
+        {'permissions': permission_set} if permission_set is not None else None,
+        token_expiry=get_token_expiry(token),
+    )
+    return permission_set
+
+
+def authorize_token(token, resource, action):
+    """Verifica se o token pode executar a ação no recurso."""
+    permission_set = get_permission_set(token)
+    if permission_set is None:
+        return False
+    actions = permission_set.get(resource, [])
+    return '*' in actions or action in actions
+
+
+def revoke_token(token):
+    """Hook de logout/blacklist: o token deixa de ser aceito até o exp."""
+    token_key = hash_token(token)
+    expiry = get_token_expiry(token)
+    timeout = expiry - time.time() if expiry else get_token_cache_settings()['MAX_TTL']
+    if timeout > 0:
+        cache.set(REVOKED_TOKEN_KEY.format(token_key), True, timeout=timeout)
+    token_cache.invalidate_token(token_key)
+
+
+def revoke_user_tokens(user_id, revoked_at):
+    """
+    Hook para usuário desativado ou senha alterada: recusa os tokens do
+    usuário emitidos antes de revoked_at. USER_REVOCATION_TTL precisa cobrir a
+    validade do access token no auth_service (ACCESS_TOKEN_LIFETIME).
+    """
+    cache.set(
+        REVOKED_USER_KEY.format(user_id),
+        revoked_at,
+        timeout=get_token_cache_settings()['USER_REVOCATION_TTL']
+    )
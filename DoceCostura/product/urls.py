@@ -3,14 +3,17 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CategoryViewSet,
     ProductViewSet,
-    CartViewSet
+    CartViewSet,
+    TokenRevokeView
 )
 
 router = DefaultRouter()
 router.register('categories', CategoryViewSet, basename='categories')
-router.register('', ProductViewSet, basename='product')
 router.register('cart', CartViewSet, basename='cart')
+# Registrado por último: o detalhe de produto (<pk>/) capturaria 'cart/' e 'categories/'
+router.register('', ProductViewSet, basename='product')
 
 urlpatterns = [
+    path('token/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
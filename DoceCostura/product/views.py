@@ -1,15 +1,34 @@
+import time
+
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, filters, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from docecostura_common.pagination import KeysetPagination
 from .models import Product, Category, Cart, CartItem
+from .cart_storage import get_cart_storage
+from .carts import CartError
+from .catalog import catalog_condition, get_by_category_payload, product_condition
+from .imports import CSV_CONTENT_TYPES, ProductImporter, iter_csv_rows, iter_jsonl_rows
 from .permissions import MicroservicePermission
+from .search import SearchIndexFilter, category_index, product_index
+from .snapshot import catalog_snapshot, parse_listing_params, snapshot_enabled
+from .suggest import suggest_index
+from .stock import StockError, StockService
+from .tokens import (
+    TokenValidationError, authenticate_token, decode_token, get_jwt_settings,
+    local_verification_enabled, revoke_token, revoke_user_tokens
+)
 from .serializers import (
     ProductSerializer,
     ProductListSerializer, 
     CategorySerializer,
-    CartSerializer
+    CartSerializer,
+    BulkStockAdjustmentSerializer
 )
 
 # Permissão personalizada para permitir apenas superusuários
@@ -24,6 +43,7 @@ class IsSuperUserOrMicroservice(permissions.BasePermission):
             return 'is_superuser' in roles
         return False
 
+@method_decorator(catalog_condition, name='retrieve')
 class CategoryViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gerenciar categorias de produtos.
@@ -32,21 +52,33 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [MicroservicePermission]
-    filter_backends = [filters.SearchFilter] # Adiciona filtro de pesquisa
-    search_fields = ['name']
+    authorization_resource = 'category'
+    filter_backends = [SearchIndexFilter] # Adiciona filtro de pesquisa
+    search_index = category_index
 
+    @method_decorator(catalog_condition)
+    def list(self, request, *args, **kwargs):
+        # Sem busca, a lista já renderizada do catálogo em memória (product.snapshot)
+        if snapshot_enabled(request) and not request.query_params.get('search', '').strip():
+            return HttpResponse(catalog_snapshot.get().render_categories(), content_type='application/json')
+        return super().list(request, *args, **kwargs)
 
+
+@method_decorator(product_condition, name='retrieve')
 class ProductViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gerenciar produtos.
     GET, POST, PUT, PATCH, DELETE para produtos.
     """
-    queryset = Product.objects.filter(is_active=True)
+    queryset = Product.objects.filter(is_active=True).select_related('category')
     serializer_class = ProductSerializer
     permission_classes = [IsSuperUserOrMicroservice]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchIndexFilter, filters.OrderingFilter]
+    # Paginação por cursor: mais recentes primeiro, ou pela relevância/?ordering=
+    pagination_class = KeysetPagination
     filterset_fields = ['category', 'is_featured']
-    search_fields = ['name', 'description', 'sku']
+    # ?search= usa o índice invertido (product.search), ordenado por relevância
+    search_index = product_index
     ordering_fields = ['price', 'name', 'created_at']
     
     def get_serializer_class(self):
@@ -59,6 +91,29 @@ class ProductViewSet(viewsets.ModelViewSet):
             return ProductListSerializer
         return ProductSerializer
     
+    @method_decorator(catalog_condition)
+    def list(self, request, *args, **kwargs):
+        """
+        Listagem de produtos ativos. Filtros (category, is_featured) e uma
+        ordenação de ordering_fields são respondidos pelo catálogo em memória
+        (product.snapshot), sem SQL; ?search= e o restante usam o banco.
+        """
+        if snapshot_enabled(request):
+            snapshot = catalog_snapshot.get()
+            params = parse_listing_params(request.query_params, snapshot, self.ordering_fields)
+            if params is not None:
+                category, is_featured, ordering = params
+                return self.snapshot_response(snapshot, ordering, category=category, is_featured=is_featured)
+        return super().list(request, *args, **kwargs)
+    
+    def snapshot_response(self, snapshot, ordering=None, category=None, is_featured=None):
+        """Página do catálogo em memória, com os mesmos cursores de KeysetPagination."""
+        ordering = self.paginator.complete_ordering(ordering or getattr(self, 'cursor_ordering', self.paginator.ordering))
+        rows = snapshot.ordered(ordering, category=category, is_featured=is_featured)
+        self.paginator.paginate_rows(rows, ordering, self.request)
+        key = (tuple(ordering), category, is_featured)
+        return HttpResponse(snapshot.render_page(self.paginator, key, self.request), content_type='application/json')
+    
     def perform_create(self, serializer):
         """
         Adiciona o ID do criador ao produto quando é criado.
@@ -103,11 +158,15 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data) 
     
     @action(detail=False, methods=['get'])
+    @method_decorator(catalog_condition)
     def featured(self, request):
         """
         Endpoint para listar apenas produtos em destaque.
         """
-        featured_products = Product.objects.filter(is_featured=True, is_active=True)
+        if snapshot_enabled(request):
+            return self.snapshot_response(catalog_snapshot.get(), is_featured=True)
+        
+        featured_products = Product.objects.filter(is_featured=True, is_active=True).select_related('category')
         page = self.paginate_queryset(featured_products)
         
         if page is not None:
@@ -118,28 +177,30 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @method_decorator(catalog_condition)
     def by_category(self, request):
         """
         Endpoint para listar produtos agrupados por categoria.
         """
-        categories = Category.objects.all()
-        result = []
-        
-        for category in categories:
-            products = Product.objects.filter(
-                category=category, 
-                is_active=True
-            )[:10]  # Limita a 10 produtos por categoria
-            
-            if products.exists():
-                category_data = CategorySerializer(category).data
-                products_data = ProductListSerializer(products, many=True).data
-                result.append({
-                    'category': category_data,
-                    'products': products_data
-                })
+        # Uma consulta com ROW_NUMBER() por categoria; o JSON renderizado fica
+        # em cache até a próxima escrita em produtos ou categorias
+        return HttpResponse(get_by_category_payload(), content_type='application/json')
+    
+    @action(detail=False, methods=['get'])
+    @method_decorator(catalog_condition)
+    def suggest(self, request):
+        """
+        Endpoint de autocomplete: ?q= com o início do nome, de uma palavra do
+        nome ou do SKU do produto, ou do nome da categoria. Respondido pelo
+        índice em memória (product.suggest), sem consultar o banco.
+        """
+        try:
+            limit = int(request.query_params.get('limit', 0))
+        except ValueError:
+            limit = 0
         
-        return Response(result)
+        suggest_index.ensure_ready()
+        return Response({'results': suggest_index.suggest(request.query_params.get('q', ''), limit)})
     
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
@@ -147,36 +208,82 @@ class ProductViewSet(viewsets.ModelViewSet):
         Endpoint para atualizar o estoque de um produto.
         Requer autenticação de superusuário.
         """
-        product = self.get_object()
         quantity = request.data.get('quantity', 0)
         
         # Verificação simplificada - já verificado pela permissão da classe
-        if not isinstance(quantity, int):
+        if not isinstance(quantity, int) or isinstance(quantity, bool):
             return Response(
                 {'error': 'A quantidade deve ser um número inteiro'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        product.stock += quantity
+        # UPDATE condicional: concorre com os checkouts sem perder atualizações
+        try:
+            StockService.adjust(self.get_queryset(), pk, quantity)
+        except StockError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
-        if product.stock < 0:
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_update_stock(self, request):
+        """
+        Endpoint para ajustar o estoque de vários produtos por SKU.
+        Corpo: {"items": [{"sku": "...", "quantity": 5}, ...]}; quantity
+        negativa baixa o estoque. Nenhum ajuste é aplicado se algum falhar.
+        """
+        serializer = BulkStockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            stocks = StockService.bulk_adjust(serializer.validated_data['items'])
+        except StockError as e:
+            return Response({'error': e.message, 'products': e.details}, status=e.status_code)
+        
+        return Response({'updated': len(stocks), 'stock': stocks})
+
+    
+    @action(detail=False, methods=['post'])
+    def bulk_upsert(self, request):
+        """
+        Endpoint para importar produtos em lote, com chave no sku.
+        Corpo em JSON lines (um produto por linha) ou CSV (Content-Type
+        text/csv, com cabeçalho). Produtos existentes são atualizados com as
+        colunas enviadas; linhas inválidas são relatadas com o número da linha.
+        """
+        if request.stream is None:
             return Response(
-                {'error': 'Estoque insuficiente para esta operação'},
+                {'error': 'Nenhum produto enviado'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        product.save()
-        serializer = self.get_serializer(product)
-        return Response(serializer.data)
-
+        if request.content_type.split(';')[0].strip() in CSV_CONTENT_TYPES:
+            rows = iter_csv_rows(request.stream)
+        else:
+            rows = iter_jsonl_rows(request.stream)
+        
+        # Mesmo ID de auditoria de perform_create/perform_update
+        if request.user and request.user.is_authenticated:
+            user_id = request.user.id
+        else:
+            user_id = getattr(request, 'user_data', {}).get('id', 1)
+        
+        report = ProductImporter(user_id=user_id).run(rows)
+        return Response(report)
 
 class CartViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gerenciar o carrinho de compras.
+
+    O carrinho ativo é lido e alterado pelo backend de CART_STORAGE
+    (product.cart_storage); as demais ações usam as tabelas, depois de
+    gravar as alterações pendentes do carrinho.
     """
     queryset = Cart.objects.all()
     serializer_class = CartSerializer
     permission_classes = [MicroservicePermission]
+    authorization_resource = 'cart'
 
     def get_queryset(self):
         """
@@ -184,9 +291,25 @@ class CartViewSet(viewsets.ModelViewSet):
         """
         user_id = self.request.user_data.get('id')
         if user_id:
-            return Cart.objects.filter(user_id=user_id, is_active=True)
+            get_cart_storage().flush(user_id)
+            return Cart.objects.filter(user_id=user_id, is_active=True).with_items()
         return Cart.objects.none()
 
+    def get_cart_response(self, user_id, status_code=status.HTTP_200_OK):
+        """
+        Serializa o carrinho ativo com itens e produtos carregados em um
+        número fixo de consultas, independente da quantidade de itens.
+        """
+        cart = get_cart_storage().get_cart(user_id)
+        serializer = self.get_serializer(cart)
+        return Response(serializer.data, status=status_code)
+
+    def list(self, request, *args, **kwargs):
+        user_id = request.user_data.get('id')
+        cart = get_cart_storage().get_cart(user_id) if user_id else None
+        serializer = self.get_serializer([cart] if cart else [], many=True)
+        return Response(serializer.data)
+
     def create(self, request, *args, **kwargs):
         """
         Cria um novo carrinho para o usuário se não existir.
@@ -199,15 +322,18 @@ class CartViewSet(viewsets.ModelViewSet):
             )
             
         # Verificar se o usuário já tem um carrinho ativo
-        existing_cart = Cart.objects.filter(user_id=user_id, is_active=True).first()
+        storage = get_cart_storage()
+        existing_cart = storage.get_cart(user_id)
         if existing_cart:
             serializer = self.get_serializer(existing_cart)
             return Response(serializer.data)
             
         # Criar um novo carrinho
-        cart = Cart.objects.create(user_id=user_id)
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        try:
+            storage.get_or_create_cart(user_id)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        return self.get_cart_response(user_id, status.HTTP_201_CREATED)
     
     @action(detail=False, methods=['post'])
     def add_item(self, request):
@@ -220,12 +346,6 @@ class CartViewSet(viewsets.ModelViewSet):
                 {"error": "Usuário não autenticado"}, 
                 status=status.HTTP_403_FORBIDDEN
             )
-            
-        # Obter ou criar o carrinho do usuário
-        cart, created = Cart.objects.get_or_create(
-            user_id=user_id, 
-            is_active=True
-        )
         
         # Validar produto
         product_id = request.data.get('product_id')
@@ -246,31 +366,13 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        # Adicionar ou atualizar item no carrinho
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            # Se o item já existir, atualiza a quantidade
-            cart_item.quantity += quantity
-            
-            # Verificar estoque novamente após aumentar quantidade
-            if product.stock < cart_item.quantity:
-                return Response(
-                    {"error": "Quantidade solicitada não disponível em estoque"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-            cart_item.save()
-            
-        # Atualizar timestamp do carrinho
-        cart.save()
+        # Adicionar ou atualizar item no carrinho (criado se não existir)
+        try:
+            get_cart_storage().add_item(user_id, product, quantity)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
         
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return self.get_cart_response(user_id)
     
     @action(detail=False, methods=['post'])
     def update_item(self, request):
@@ -294,14 +396,6 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        try:
-            cart = Cart.objects.get(user_id=user_id, is_active=True)
-        except Cart.DoesNotExist:
-            return Response(
-                {"error": "Carrinho não encontrado"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
         try:
             product = Product.objects.get(id=product_id, is_active=True)
         except Product.DoesNotExist:
@@ -310,29 +404,20 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
             
-        # Se quantidade for zero, remover item
-        if quantity == 0:
-            CartItem.objects.filter(cart=cart, product=product).delete()
-        else:
-            # Verificar estoque
-            if product.stock < quantity:
-                return Response(
-                    {"error": "Quantidade solicitada não disponível em estoque"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
-            # Atualizar ou criar item
-            cart_item, created = CartItem.objects.update_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
+        # Verificar estoque
+        if product.stock < quantity:
+            return Response(
+                {"error": "Quantidade solicitada não disponível em estoque"}, 
+                status=status.HTTP_400_BAD_REQUEST
             )
+            
+        # Atualizar, criar ou (quantidade zero) remover o item
+        try:
+            get_cart_storage().set_item(user_id, product, quantity)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
         
-        # Atualizar timestamp do carrinho
-        cart.save()
-        
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return self.get_cart_response(user_id)
     
     @action(detail=False, methods=['post'])
     def remove_item(self, request):
@@ -348,31 +433,13 @@ class CartViewSet(viewsets.ModelViewSet):
             
         product_id = request.data.get('product_id')
         
-        try:
-            cart = Cart.objects.get(user_id=user_id, is_active=True)
-        except Cart.DoesNotExist:
-            return Response(
-                {"error": "Carrinho não encontrado"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
         # Remover item
-        deleted, _ = CartItem.objects.filter(
-            cart=cart, 
-            product_id=product_id
-        ).delete()
-        
-        if deleted == 0:
-            return Response(
-                {"error": "Item não encontrado no carrinho"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-            
-        # Atualizar timestamp do carrinho
-        cart.save()
+        try:
+            get_cart_storage().remove_item(user_id, product_id)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
         
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return self.get_cart_response(user_id)
     
     @action(detail=False, methods=['post'])
     def clear(self, request):
@@ -386,20 +453,51 @@ class CartViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
+        # Remover todos os itens e zerar os totais
         try:
-            cart = Cart.objects.get(user_id=user_id, is_active=True)
-        except Cart.DoesNotExist:
+            get_cart_storage().clear(user_id)
+        except CartError as e:
+            return Response({"error": e.message}, status=e.status_code)
+        
+        return self.get_cart_response(user_id)
+
+
+class TokenRevokeView(APIView):
+    """
+    Hook chamado pelo auth_service no logout ({"token": access token}) e na
+    desativação ou troca de senha de um usuário ({"user_revocation": token
+    assinado pelo auth_service}): os tokens deixam de ser aceitos por este
+    serviço até expirar, mesmo com verificação local.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        if request.data.get('user_revocation'):
+            return self.revoke_user(request.data['user_revocation'])
+
+        token = request.data.get('token')
+        if not token:
             return Response(
-                {"error": "Carrinho não encontrado"}, 
-                status=status.HTTP_404_NOT_FOUND
+                {"error": "Token não fornecido"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Remover todos os itens
-        cart.items.all().delete()
-        
-        # Atualizar timestamp do carrinho
-        cart.save()
-        
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
 
+        # Só tokens autênticos entram na lista de revogados (evita encher a memória)
+        if authenticate_token(token) is None:
+            return Response({"revoked": False})
+
+        revoke_token(token)
+        return Response({"revoked": True})
+
+    def revoke_user(self, revocation):
+        # Só o auth_service assina o aviso; sem chave local ele não pode ser conferido
+        if not local_verification_enabled():
+            return Response({"revoked": False})
+        try:
+            claims = decode_token(revocation, 'user_revocation')
+        except TokenValidationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        revoke_user_tokens(claims[get_jwt_settings()['USER_ID_CLAIM']], claims.get('iat', int(time.time())))
+        return Response({"revoked": True})
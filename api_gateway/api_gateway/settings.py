@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -73,11 +74,94 @@ MICROSERVICE_URLS = {
     'AUTH': 'http://auth_service:8000/api/auth',
     'RECOMMENDATION': 'http://recommendation_service:8000/api/recommendations',
     'MAIN': 'http://main_service:8000/api/products',
+    'PAYMENT': 'http://main_service:8000/api/payment',
 }
 
 # Timeout para requisições aos microserviços (em segundos)
 SERVICE_TIMEOUT = 5
 
+# Pool de conexões HTTP (keep-alive) por microserviço.
+# 'DEFAULT' vale para todos os serviços; as demais chaves sobrescrevem
+# apenas os valores informados para o serviço correspondente.
+MICROSERVICE_HTTP = {
+    'DEFAULT': {
+        'POOL_CONNECTIONS': 4,        # Número de pools (hosts) mantidos por sessão
+        'POOL_MAXSIZE': 20,           # Conexões keep-alive mantidas por host
+        'POOL_BLOCK': False,          # Se True, espera uma conexão livre em vez de abrir outra
+        'CONNECT_TIMEOUT': 2,         # Timeout para abrir a conexão TCP (segundos)
+        'READ_TIMEOUT': SERVICE_TIMEOUT,  # Timeout aguardando a resposta (segundos)
+        'MAX_RETRIES': 0,             # Tentativas extras apenas em falha de conexão
+        'ASYNC_POOL_MAXSIZE': 1000,   # Conexões por host no modo assíncrono (GATEWAY_ASYNC)
+    },
+    'AUTH': {
+        'POOL_MAXSIZE': 50,
+        'READ_TIMEOUT': 3,
+    },
+    'MAIN': {
+        'POOL_MAXSIZE': 50,
+    },
+    'PAYMENT': {
+        'READ_TIMEOUT': 30,
+    },
+}
+
+# Modo de execução do gateway.
+# False: views síncronas (WSGI, um worker por requisição em andamento).
+# True: views assíncronas com aiohttp, para rodar em servidor ASGI, ex.:
+#   uvicorn api_gateway.asgi:application --host 0.0.0.0 --port 8000
+GATEWAY_ASYNC = os.environ.get('GATEWAY_ASYNC', 'False') == 'True'
+
+# Repasse direto (streaming) das respostas dos microserviços.
+# False (padrão): o corpo é decodificado e renderizado novamente pelo gateway,
+#   como antes (respostas não-JSON viram {"message": ...}).
+# True: status, cabeçalhos e corpo são enviados ao cliente sem decodificar o JSON.
+GATEWAY_STREAM_RESPONSES = os.environ.get('GATEWAY_STREAM_RESPONSES', 'False') == 'True'
+
+# Cache de respostas GET do gateway (catálogo e recomendações).
+# TTL: segundos em que a resposta é servida como nova.
+# STALE: segundos extras em que a resposta antiga ainda é servida enquanto
+#        uma única requisição a atualiza em segundo plano.
+# BACKEND: 'locmem' (LRU no processo, CACHES[LOCAL_CACHE_ALIAS]) ou
+#          'shared' (CACHES[CACHE_ALIAS], o Redis de CACHE_LOCATION);
+#          o padrão é 'shared' quando CACHE_LOCATION está definido.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+
+GATEWAY_CACHE = {
+    'ENABLED': os.environ.get('GATEWAY_CACHE_ENABLED', 'True') == 'True',
+    'BACKEND': os.environ.get('GATEWAY_CACHE_BACKEND', 'shared' if CACHE_LOCATION else 'locmem'),
+    'CACHE_ALIAS': 'default',
+    'LOCAL_CACHE_ALIAS': 'gateway_responses',
+    'ROUTES': [
+        {'PATTERN': r'^/api/products/categories/?$', 'TTL': 300, 'STALE': 600},
+        {'PATTERN': r'^/api/products/\d+/?$', 'TTL': 60, 'STALE': 300},
+        {'PATTERN': r'^/api/products/?$', 'TTL': 60, 'STALE': 300},
+        {'PATTERN': r'^/api/recommendations/trending/?$', 'TTL': 120, 'STALE': 600},
+        {'PATTERN': r'^/api/recommendations/new_arrivals/?$', 'TTL': 300, 'STALE': 600},
+        {'PATTERN': r'^/api/recommendations/', 'TTL': 30, 'STALE': 60},
+    ],
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_LOCATION,
+    } if CACHE_LOCATION else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Respostas do gateway com GATEWAY_CACHE['BACKEND'] = 'locmem'
+    'gateway_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gateway_responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Endereços com acesso às rotas internas do gateway (ex.: /api/gateway/cache-stats),
+# além dos usuários staff
+INTERNAL_IPS = [
+    ip for ip in os.environ.get('GATEWAY_INTERNAL_IPS', '127.0.0.1').split(',') if ip
+]
+
 ROOT_URLCONF = 'api_gateway.urls'
 
 APPEND_SLASH = True
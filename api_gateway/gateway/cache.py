@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Entradas do cache de respostas em um cache do Django (CACHES[alias]).
+
+    local=True para um LocMemCache do processo (descarte LRU ao passar de
+    MAX_ENTRIES); caso contrário é um cache compartilhado entre processos,
+    ex.: Redis ou Memcached em produção.
+    """
+
+    def __init__(self, alias='default', local=False):
+        self.alias = alias
+        self.local = local
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, timeout=self._timeout(entry))
+
+    def clear(self):
+        self.cache.clear()
+
+    async def aget(self, key):
+        # Memória do processo não bloqueia o event loop; para os demais, a
+        # API assíncrona do cache do Django
+        if self.local:
+            return self.get(key)
+        return await self.cache.aget(key)
+
+    async def aset(self, key, entry):
+        if self.local:
+            self.set(key, entry)
+        else:
+            await self.cache.aset(key, entry, timeout=self._timeout(entry))
+
+    @staticmethod
+    def _timeout(entry):
+        return max(1, int(entry['stale_until'] - time.time()))
+
+
+class ResponseCache:
+    """
+    Cache de respostas GET do gateway.
+
+    - Chave: caminho, parâmetros de consulta normalizados e escopo de autenticação.
+    - TTL por rota (GATEWAY_CACHE['ROUTES']).
+    - Stale-while-revalidate: após o TTL a resposta antiga continua sendo
+      servida por STALE segundos enquanto uma única atualização roda em segundo plano.
+    - Coalescência: em um miss, só uma requisição vai ao microserviço; as
+      demais com a mesma chave aguardam o resultado dela.
+    """
+
+    STATE_HIT = 'HIT'
+    STATE_MISS = 'MISS'
+    STATE_STALE = 'STALE'
+
+    def __init__(self, config=None):
+        self._config = config
+        self._backend = None
+        self._routes = None
+        self._routes_source = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._async_inflight = {}
+        self._background_tasks = set()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'refreshes': 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def config(self):
+        if self._config is not None:
+            return self._config
+        return getattr(settings, 'GATEWAY_CACHE', {})
+
+    @property
+    def enabled(self):
+        return self.config.get('ENABLED', False)
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if self.config.get('BACKEND', 'locmem') == 'shared':
+                self._backend = CacheBackend(self.config.get('CACHE_ALIAS', 'default'))
+            else:
+                self._backend = CacheBackend(
+                    self.config.get('LOCAL_CACHE_ALIAS', 'gateway_responses'), local=True
+                )
+        return self._backend
+
+    def get_policy(self, path):
+        """Retorna (ttl, stale) da primeira rota que casar com o caminho, ou None."""
+        if not self.enabled:
+            return None
+        routes = self.config.get('ROUTES', [])
+        if self._routes_source is not routes:
+            self._routes = [
+                (re.compile(route['PATTERN']), route['TTL'], route.get('STALE', 0))
+                for route in routes
+            ]
+            self._routes_source = routes
+        for pattern, ttl, stale in self._routes:
+            if pattern.match(path):
+                return ttl, stale
+        return None
+
+    def build_key(self, path, query_params, authorization=None):
+        """
+        Monta a chave do cache. Os parâmetros são ordenados para que
+        ?a=1&b=2 e ?b=2&a=1 compartilhem a mesma entrada, e o token
+        entra apenas como hash.
+        """
+        params = sorted(
+            (key, value)
+            for key, values in query_params.lists()
+            for value in values
+        )
+        scope = hashlib.sha256(authorization.encode()).hexdigest() if authorization else 'anon'
+        raw_key = f"{path}?{params}|{scope}"
+        return 'gateway:response:' + hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _build_entry(self, result, policy):
+        """Entrada do cache para o resultado, ou None se não for cacheável (apenas respostas 200)."""
+        if result['status'] != 200:
+            return None
+        ttl, stale = policy
+        now = time.time()
+        entry = dict(result)
+        entry['fresh_until'] = now + ttl
+        entry['stale_until'] = now + ttl + stale
+        return entry
+
+    def _store(self, key, result, policy):
+        entry = self._build_entry(result, policy)
+        if entry is not None:
+            self.backend.set(key, entry)
+
+    async def _astore(self, key, result, policy):
+        entry = self._build_entry(result, policy)
+        if entry is not None:
+            await self.backend.aset(key, entry)
+
+    # -- modo síncrono ---------------------------------------------------
+
+    def get_or_fetch(self, key, policy, loader):
+        """
+        Retorna (resultado, estado) para a chave, chamando loader() no
+        microserviço apenas quando necessário.
+        """
+        entry = self.backend.get(key)
+        if entry is not None:
+            if entry['fresh_until'] > time.time():
+                self._count('hits')
+                return entry, self.STATE_HIT
+            self._count('stale')
+            self._refresh_in_background(key, policy, loader)
+            return entry, self.STATE_STALE
+
+        self._count('misses')
+        return self._fetch_coalesced(key, policy, loader), self.STATE_MISS
+
+    def _join_inflight(self, key):
+        """Registra ou encontra a busca em andamento; retorna (registro, é_líder)."""
+        with self._inflight_lock:
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                return inflight, False
+            inflight = {'event': threading.Event(), 'result': None}
+            self._inflight[key] = inflight
+            return inflight, True
+
+    def _lead_fetch(self, key, inflight, policy, loader):
+        try:
+            result = loader()
+            self._store(key, result, policy)
+            inflight['result'] = result
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            inflight['event'].set()
+
+    def _fetch_coalesced(self, key, policy, loader):
+        inflight, leader = self._join_inflight(key)
+        if leader:
+            return self._lead_fetch(key, inflight, policy, loader)
+
+        self._count('coalesced')
+        inflight['event'].wait()
+        if inflight['result'] is not None:
+            return inflight['result']
+        # A busca líder falhou com exceção: tenta diretamente
+        return loader()
+
+    def _refresh_in_background(self, key, policy, loader):
+        inflight, leader = self._join_inflight(key)
+        if not leader:
+            return
+
+        def refresh():
+            self._count('refreshes')
+            try:
+                self._lead_fetch(key, inflight, policy, loader)
+            except Exception as e:
+                logger.error(f"Erro ao atualizar cache do gateway: {str(e)}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    # -- modo assíncrono -------------------------------------------------
+
+    async def aget_or_fetch(self, key, policy, loader):
+        """Versão assíncrona de get_or_fetch; loader é uma função async."""
+        entry = await self.backend.aget(key)
+        if entry is not None:
+            if entry['fresh_until'] > time.time():
+                self._count('hits')
+                return entry, self.STATE_HIT
+            self._count('stale')
+            if key not in self._async_inflight:
+                task = asyncio.ensure_future(self._arefresh(key, policy, loader))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+            return entry, self.STATE_STALE
+
+        self._count('misses')
+        return await self._afetch_coalesced(key, policy, loader), self.STATE_MISS
+
+    async def _arefresh(self, key, policy, loader):
+        self._count('refreshes')
+        try:
+            await self._afetch_coalesced(key, policy, loader)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar cache do gateway: {str(e)}")
+
+    async def _afetch_coalesced(self, key, policy, loader):
+        future = self._async_inflight.get(key)
+        if future is not None:
+            self._count('coalesced')
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_inflight[key] = future
+        try:
+            result = await loader()
+            await self._astore(key, result, policy)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita o aviso de exceção não recuperada quando ninguém aguardava
+            future.exception()
+            raise
+        finally:
+            self._async_inflight.pop(key, None)
+
+
+response_cache = ResponseCache()
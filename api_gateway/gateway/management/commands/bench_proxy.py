@@ -0,0 +1,163 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+
+from gateway.services import AsyncServiceSessionPool, ServiceSessionPool
+from gateway.urls import async_urlpatterns, sync_urlpatterns
+
+
+class StubServiceHandler(BaseHTTPRequestHandler):
+    """Microserviço falso: responde JSON após um atraso fixo."""
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    body = b'{}'
+
+    def setup(self):
+        super().setup()
+        # Sem isso o Nagle atrasa a resposta (cabeçalhos e corpo vão em writes separados)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, True)
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Conexões keep-alive encerradas pelo gateway no fim do benchmark
+        pass
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara requisições/s e latência p99 do gateway nos modos síncrono '
+        '(WSGI) e assíncrono (ASGI) contra um microserviço falso local.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Total de requisições por modo')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='Workers simultâneos no modo síncrono (threads WSGI)')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Requisições em andamento no modo assíncrono')
+        parser.add_argument('--delay', type=float, default=50,
+                            help='Latência simulada do microserviço (ms)')
+        parser.add_argument('--items', type=int, default=20,
+                            help='Quantidade de produtos na resposta falsa')
+        parser.add_argument('--mode', choices=['both', 'sync', 'async'], default='both')
+
+    def handle(self, *args, **options):
+        StubServiceHandler.delay = options['delay'] / 1000
+        StubServiceHandler.body = json.dumps([
+            {'id': i, 'name': f'Produto {i}', 'price': '19.90'}
+            for i in range(options['items'])
+        ]).encode()
+
+        server = StubServiceServer(('127.0.0.1', 0), StubServiceHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        upstream = f'http://127.0.0.1:{server.server_port}/api/products'
+
+        self.stdout.write(
+            f"Microserviço falso em {upstream} (atraso {options['delay']:.0f} ms), "
+            f"{options['requests']} requisições por modo"
+        )
+
+        try:
+            if options['mode'] in ('both', 'sync'):
+                with self._gateway(sync_urlpatterns, upstream):
+                    latencies, elapsed = self._run_sync(options['requests'], options['workers'])
+                self._report(f"sync  ({options['workers']} workers)", latencies, elapsed)
+
+            if options['mode'] in ('both', 'async'):
+                with self._gateway(async_urlpatterns, upstream):
+                    latencies, elapsed = asyncio.run(
+                        self._run_async(options['requests'], options['concurrency'])
+                    )
+                self._report(f"async ({options['concurrency']} em andamento)", latencies, elapsed)
+        finally:
+            ServiceSessionPool.close_all()
+            server.shutdown()
+
+    def _gateway(self, patterns, upstream):
+        urlconf = types.ModuleType('bench_urls')
+        urlconf.urlpatterns = [path('api/', include(patterns))]
+        return override_settings(
+            ROOT_URLCONF=urlconf,
+            ALLOWED_HOSTS=['*'],
+            MICROSERVICE_URLS={'MAIN': upstream},
+            # Mede apenas o proxy; com o cache quase tudo seria HIT
+            GATEWAY_CACHE={'ENABLED': False},
+        )
+
+    def _run_sync(self, total, workers):
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            start = time.perf_counter()
+            response = local.client.get('/api/products/')
+            assert response.status_code == 200, response.status_code
+            if response.streaming:
+                b''.join(response.streaming_content)
+            response.close()
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            latencies = list(executor.map(call, range(total)))
+        return latencies, time.perf_counter() - started
+
+    async def _run_async(self, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get('/api/products/')
+                assert response.status_code == 200, response.status_code
+                if response.streaming:
+                    async for _ in response.streaming_content:
+                        pass
+                return time.perf_counter() - start
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(call() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        await AsyncServiceSessionPool.close_all()
+        return latencies, elapsed
+
+    def _report(self, label, latencies, elapsed):
+        self.stdout.write(
+            f"{label}: {len(latencies) / elapsed:8.1f} req/s | "
+            f"p50 {percentile(latencies, 50) * 1000:7.1f} ms | "
+            f"p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+        )
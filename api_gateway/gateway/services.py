@@ -1,12 +1,202 @@
+import asyncio
+import json
+import threading
+import weakref
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Cabeçalhos da resposta do microserviço repassados ao cliente no modo streaming.
+# Content-Length e Content-Encoding ficam de fora: o corpo é repassado já
+# descomprimido e em pedaços.
+PASSTHROUGH_HEADERS = (
+    'Content-Type',
+    'Cache-Control',
+    'ETag',
+    'Last-Modified',
+    'Expires',
+    'Vary',
+    'Location',
+    'Content-Disposition',
+    'Allow',
+)
+
+# Cabeçalhos condicionais do cliente repassados ao microserviço nos GETs sem
+# cache do gateway; um 304 do microserviço volta ao cliente com os validadores
+CONDITIONAL_HEADERS = (
+    'If-None-Match',
+    'If-Modified-Since',
+)
+
+# Validadores copiados da resposta do microserviço quando o corpo é
+# decodificado (forward_request), para o cliente poder revalidar
+VALIDATOR_HEADERS = (
+    'ETag',
+    'Last-Modified',
+)
+
+# Tamanho dos pedaços lidos do microserviço no modo streaming (bytes)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_service_http_config(service_name):
+    """
+    Retorna a configuração HTTP de um serviço, combinando os valores
+    de 'DEFAULT' com os específicos do serviço em MICROSERVICE_HTTP.
+    """
+    http_settings = settings.MICROSERVICE_HTTP
+    config = dict(http_settings['DEFAULT'])
+    config.update(http_settings.get(service_name, {}))
+    return config
+
+
+class ServiceSessionPool:
+    """
+    Mantém uma sessão HTTP por microserviço, com pool de conexões keep-alive.
+
+    As sessões são criadas sob demanda e compartilhadas por todas as views
+    do gateway, evitando abrir uma conexão TCP nova a cada requisição.
+    """
+
+    _sessions = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls, service_name):
+        session = cls._sessions.get(service_name)
+        if session is not None:
+            return session
+
+        with cls._lock:
+            session = cls._sessions.get(service_name)
+            if session is None:
+                session = cls._build_session(service_name)
+                cls._sessions[service_name] = session
+        return session
+
+    @staticmethod
+    def _build_session(service_name):
+        config = get_service_http_config(service_name)
+        adapter = HTTPAdapter(
+            pool_connections=config['POOL_CONNECTIONS'],
+            pool_maxsize=config['POOL_MAXSIZE'],
+            pool_block=config['POOL_BLOCK'],
+            max_retries=config['MAX_RETRIES'],
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        logger.info(
+            f"Pool HTTP criado para {service_name}: "
+            f"maxsize={config['POOL_MAXSIZE']}, connect={config['CONNECT_TIMEOUT']}s, "
+            f"read={config['READ_TIMEOUT']}s"
+        )
+        return session
+
+    @classmethod
+    def get_timeout(cls, service_name):
+        """Retorna a tupla (connect, read) usada pelo requests."""
+        config = get_service_http_config(service_name)
+        return (config['CONNECT_TIMEOUT'], config['READ_TIMEOUT'])
+
+    @classmethod
+    def close_all(cls):
+        """Fecha todas as sessões abertas (útil em testes e no desligamento)."""
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+
+
+class AsyncServiceSessionPool:
+    """
+    Equivalente assíncrono de ServiceSessionPool, usado no modo ASGI.
+
+    Mantém uma aiohttp.ClientSession por microserviço e por event loop, já
+    que as sessões assíncronas não podem ser compartilhadas entre loops.
+    """
+
+    _sessions = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get_session(cls, service_name):
+        loop = asyncio.get_running_loop()
+        loop_sessions = cls._sessions.setdefault(loop, {})
+        session = loop_sessions.get(service_name)
+        if session is None or session.closed:
+            session = cls._build_session(service_name)
+            loop_sessions[service_name] = session
+        return session
+
+    @staticmethod
+    def _build_session(service_name):
+        config = get_service_http_config(service_name)
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=config['ASYNC_POOL_MAXSIZE'],
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=config['CONNECT_TIMEOUT'],
+            sock_read=config['READ_TIMEOUT'],
+        )
+        logger.info(
+            f"Pool HTTP assíncrono criado para {service_name}: "
+            f"maxsize={config['ASYNC_POOL_MAXSIZE']}, connect={config['CONNECT_TIMEOUT']}s, "
+            f"read={config['READ_TIMEOUT']}s"
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    @classmethod
+    async def close_all(cls):
+        """Fecha as sessões do event loop atual."""
+        loop = asyncio.get_running_loop()
+        for session in cls._sessions.pop(loop, {}).values():
+            await session.close()
+
+
 class ServiceClient:
     """Cliente para comunicação com microserviços."""
     
+    @staticmethod
+    def _get_service_url(service_name, path):
+        service_url = settings.MICROSERVICE_URLS.get(service_name)
+        if not service_url:
+            logger.error(f"Serviço não configurado: {service_name}")
+            return None
+
+        url = f"{service_url}{path}"
+        logger.info(f"Enviando requisição para: {url}")
+        return url
+
+    @staticmethod
+    def _build_result(status_code, text, upstream_headers=None):
+        """Converte a resposta do microserviço na tupla (dados, status, validadores)."""
+        validators = {
+            header: upstream_headers[header]
+            for header in VALIDATOR_HEADERS
+            if upstream_headers and header in upstream_headers
+        }
+        # 304 não tem corpo: o cliente reaproveita a resposta que já tem
+        if status_code == 304:
+            return None, status_code, validators
+        # Tentar obter a resposta JSON
+        try:
+            return json.loads(text), status_code, validators
+        except ValueError:
+            # Se não for JSON, verificar se é um erro
+            if status_code >= 400:
+                return {
+                    "error": "Resposta inválida do serviço",
+                    "message": text
+                }, status_code, validators
+            else:
+                return {"message": text}, status_code, validators
+
     @staticmethod
     def forward_request(service_name, path, method='GET', data=None, headers=None, params=None):
         """
@@ -21,44 +211,246 @@ class ServiceClient:
             params: Parâmetros de consulta
             
         Returns:
-            Resposta do microserviço
+            Tupla (dados, status, validadores), com ETag/Last-Modified da
+            resposta do microserviço em validadores e dados None em um 304
         """
         if headers is None:
             headers = {}
             
-        service_url = settings.MICROSERVICE_URLS.get(service_name)
-        if not service_url:
-            logger.error(f"Serviço não configurado: {service_name}")
-            return {"error": "Service not configured"}, 500
-            
-        url = f"{service_url}{path}"
-        logger.info(f"Enviando requisição para: {url}")
-        
-        print(f"DEBUG: ENviando requisição para {url}")
-        print(f"DEBUG: urls do serviço {service_url}")
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return {"error": "Service not configured"}, 500, {}
+
+        session = ServiceSessionPool.get_session(service_name)
+
+        try:
+            response = session.request(
+                method=method,
+                url=url,
+                json=data if method in ['POST', 'PUT', 'PATCH'] else None,
+                headers=headers,
+                params=params,
+                timeout=ServiceSessionPool.get_timeout(service_name)
+            )
+            return ServiceClient._build_result(response.status_code, response.text, response.headers)
+
+        except requests.Timeout as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return {"error": f"Service timeout: {str(e)}"}, 504, {}
+
+        except requests.RequestException as e:
+            logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
+            return {"error": f"Service communication error: {str(e)}"}, 500, {}
+
+    @staticmethod
+    async def aforward_request(service_name, path, method='GET', data=None, headers=None, params=None):
+        """
+        Versão assíncrona de forward_request, usada pelas views do modo ASGI.
+
+        Recebe os mesmos argumentos e retorna a mesma tupla (dados, status, validadores).
+        """
+        if headers is None:
+            headers = {}
+
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return {"error": "Service not configured"}, 500, {}
+
+        session = AsyncServiceSessionPool.get_session(service_name)
 
         try:
-            response = requests.request(
+            async with session.request(
                 method=method,
                 url=url,
                 json=data if method in ['POST', 'PUT', 'PATCH'] else None,
                 headers=headers,
                 params=params
+            ) as response:
+                text = await response.text()
+            return ServiceClient._build_result(response.status, text, response.headers)
+
+        except asyncio.TimeoutError as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return {"error": f"Service timeout: {str(e)}"}, 504, {}
+
+        except aiohttp.ClientError as e:
+            logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
+            return {"error": f"Service communication error: {str(e)}"}, 500, {}
+
+    @staticmethod
+    def _build_streaming_response(status_code, upstream_headers, content):
+        response = StreamingHttpResponse(
+            content,
+            status=status_code,
+            content_type=upstream_headers.get('Content-Type', 'application/json')
+        )
+        for header in PASSTHROUGH_HEADERS:
+            if header != 'Content-Type' and header in upstream_headers:
+                response[header] = upstream_headers[header]
+        return response
+
+    @staticmethod
+    def stream_request(service_name, path, method='GET', data=None, headers=None, params=None):
+        """
+        Encaminha a solicitação e repassa a resposta sem decodificá-la.
+
+        Diferente de forward_request, o corpo não é convertido de/para JSON:
+        status, cabeçalhos relevantes e corpo do microserviço são enviados ao
+        cliente em pedaços por um StreamingHttpResponse, com memória constante
+        no gateway independentemente do tamanho da resposta.
+
+        Returns:
+            StreamingHttpResponse, ou JsonResponse em caso de falha de comunicação
+        """
+        if headers is None:
+            headers = {}
+
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return JsonResponse({"error": "Service not configured"}, status=500)
+
+        session = ServiceSessionPool.get_session(service_name)
+
+        try:
+            upstream = session.request(
+                method=method,
+                url=url,
+                json=data if method in ['POST', 'PUT', 'PATCH'] else None,
+                headers=headers,
+                params=params,
+                timeout=ServiceSessionPool.get_timeout(service_name),
+                stream=True
             )
-            
-            # Tentar obter a resposta JSON
+
+        except requests.Timeout as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return JsonResponse({"error": f"Service timeout: {str(e)}"}, status=504)
+
+        except requests.RequestException as e:
+            logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
+            return JsonResponse({"error": f"Service communication error: {str(e)}"}, status=500)
+
+        def content():
+            # Fechar a resposta devolve a conexão ao pool, mesmo se o cliente desconectar
             try:
-                return response.json(), response.status_code
-            except ValueError:
-                # Se não for JSON, verificar se é um erro
-                if response.status_code >= 400:
-                    return {
-                        "error": "Resposta inválida do serviço",
-                        "message": response.text
-                    }, response.status_code
-                else:
-                    return {"message": response.text}, response.status_code
-            
+                for chunk in upstream.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    yield chunk
+            except requests.RequestException as e:
+                logger.error(f"Erro ao repassar resposta do serviço {service_name}: {str(e)}")
+            finally:
+                upstream.close()
+
+        return ServiceClient._build_streaming_response(
+            upstream.status_code, upstream.headers, content()
+        )
+
+    @staticmethod
+    async def astream_request(service_name, path, method='GET', data=None, headers=None, params=None):
+        """
+        Versão assíncrona de stream_request, usada pelas views do modo ASGI.
+        """
+        if headers is None:
+            headers = {}
+
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return JsonResponse({"error": "Service not configured"}, status=500)
+
+        session = AsyncServiceSessionPool.get_session(service_name)
+
+        try:
+            upstream = await session.request(
+                method=method,
+                url=url,
+                json=data if method in ['POST', 'PUT', 'PATCH'] else None,
+                headers=headers,
+                params=params
+            )
+
+        except asyncio.TimeoutError as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return JsonResponse({"error": f"Service timeout: {str(e)}"}, status=504)
+
+        except aiohttp.ClientError as e:
+            logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
+            return JsonResponse({"error": f"Service communication error: {str(e)}"}, status=500)
+
+        async def content():
+            try:
+                async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    yield chunk
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                logger.error(f"Erro ao repassar resposta do serviço {service_name}: {str(e)}")
+            finally:
+                upstream.release()
+
+        return ServiceClient._build_streaming_response(
+            upstream.status, upstream.headers, content()
+        )
+
+    @staticmethod
+    def _error_result(message, status_code):
+        return {
+            'status': status_code,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({"error": message}).encode(),
+        }
+
+    @staticmethod
+    def fetch_response(service_name, path, headers=None, params=None):
+        """
+        Busca uma resposta GET completa, sem decodificar o corpo.
+
+        Usado pelo cache de respostas: retorna um dicionário com status,
+        cabeçalhos repassáveis e corpo em bytes, pronto para ser guardado.
+        """
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return ServiceClient._error_result("Service not configured", 500)
+
+        session = ServiceSessionPool.get_session(service_name)
+
+        try:
+            response = session.get(
+                url,
+                headers=headers or {},
+                params=params,
+                timeout=ServiceSessionPool.get_timeout(service_name)
+            )
+        except requests.Timeout as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return ServiceClient._error_result(f"Service timeout: {str(e)}", 504)
         except requests.RequestException as e:
             logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
-            return {"error": f"Service communication error: {str(e)}"}, 500
\ No newline at end of file
+            return ServiceClient._error_result(f"Service communication error: {str(e)}", 500)
+
+        return {
+            'status': response.status_code,
+            'headers': {h: response.headers[h] for h in PASSTHROUGH_HEADERS if h in response.headers},
+            'body': response.content,
+        }
+
+    @staticmethod
+    async def afetch_response(service_name, path, headers=None, params=None):
+        """Versão assíncrona de fetch_response."""
+        url = ServiceClient._get_service_url(service_name, path)
+        if url is None:
+            return ServiceClient._error_result("Service not configured", 500)
+
+        session = AsyncServiceSessionPool.get_session(service_name)
+
+        try:
+            async with session.get(url, headers=headers or {}, params=params) as response:
+                body = await response.read()
+        except asyncio.TimeoutError as e:
+            logger.error(f"Timeout ao comunicar com o serviço {service_name}: {str(e)}")
+            return ServiceClient._error_result(f"Service timeout: {str(e)}", 504)
+        except aiohttp.ClientError as e:
+            logger.error(f"Erro ao comunicar com o serviço {service_name}: {str(e)}")
+            return ServiceClient._error_result(f"Service communication error: {str(e)}", 500)
+
+        return {
+            'status': response.status,
+            'headers': {h: response.headers[h] for h in PASSTHROUGH_HEADERS if h in response.headers},
+            'body': body,
+        }
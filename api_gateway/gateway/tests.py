@@ -1,3 +1,439 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.http import QueryDict
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+from requests import Response as UpstreamResponse
+from requests.structures import CaseInsensitiveDict
+
+from .cache import CacheBackend, ResponseCache, response_cache
+from .services import AsyncServiceSessionPool, ServiceClient, ServiceSessionPool
+from .views import AsyncAuthProxyView, AsyncProductsView
+
+NO_CACHE = {'ENABLED': False}
+
+CATALOG_CACHE = {
+    'ENABLED': True,
+    'BACKEND': 'locmem',
+    'ROUTES': [{'PATTERN': r'^/api/products/?$', 'TTL': 60, 'STALE': 300}],
+}
+
+
+def make_upstream_response(status_code=200, body=b'', headers=None):
+    """requests.Response montada à mão, como a devolvida pelo microserviço."""
+    response = UpstreamResponse()
+    response.status_code = status_code
+    response._content = body
+    response.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **(headers or {})})
+    return response
+
+
+def mock_session(*responses):
+    """Sessão do pool que devolve as respostas na ordem e registra as chamadas."""
+    session = mock.Mock()
+    session.request.side_effect = list(responses)
+    session.get.side_effect = list(responses)
+    return mock.patch.object(ServiceSessionPool, 'get_session', return_value=session), session
+
+
+@override_settings(MICROSERVICE_HTTP={
+    'DEFAULT': {
+        'POOL_CONNECTIONS': 4, 'POOL_MAXSIZE': 20, 'POOL_BLOCK': False,
+        'CONNECT_TIMEOUT': 2, 'READ_TIMEOUT': 5, 'MAX_RETRIES': 0, 'ASYNC_POOL_MAXSIZE': 1000,
+    },
+    'AUTH': {'POOL_MAXSIZE': 50, 'READ_TIMEOUT': 3},
+})
+class ServiceSessionPoolTests(SimpleTestCase):
+    """Uma sessão keep-alive por microserviço, configurada por MICROSERVICE_HTTP."""
+
+    def setUp(self):
+        ServiceSessionPool.close_all()
+        self.addCleanup(ServiceSessionPool.close_all)
+
+    def test_service_overrides_are_applied_over_default(self):
+        self.assertEqual(ServiceSessionPool.get_timeout('AUTH'), (2, 3))
+        self.assertEqual(ServiceSessionPool.get_timeout('MAIN'), (2, 5))
+
+    def test_session_is_reused_per_service(self):
+        auth = ServiceSessionPool.get_session('AUTH')
+
+        self.assertIs(ServiceSessionPool.get_session('AUTH'), auth)
+        self.assertIsNot(ServiceSessionPool.get_session('MAIN'), auth)
+        adapter = auth.get_adapter('http://auth_service:8000/')
+        self.assertEqual(adapter._pool_maxsize, 50)
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter.max_retries.total, 0)
+
+    def test_requests_go_through_the_pooled_session_with_its_timeout(self):
+        session = ServiceSessionPool.get_session('AUTH')
+        with mock.patch.object(session, 'request', return_value=make_upstream_response(200, b'{}')) as request:
+            ServiceClient.forward_request('AUTH', '/profile/')
+            ServiceClient.forward_request('AUTH', '/profile/')
+
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args.kwargs['timeout'], (2, 3))
+
+    async def test_async_sessions_are_kept_per_event_loop(self):
+        session = AsyncServiceSessionPool.get_session('AUTH')
+        try:
+            self.assertIs(AsyncServiceSessionPool.get_session('AUTH'), session)
+            self.assertEqual(session.connector.limit_per_host, 1000)
+            self.assertEqual(session.timeout.connect, 2)
+            self.assertEqual(session.timeout.sock_read, 3)
+        finally:
+            await AsyncServiceSessionPool.close_all()
+        self.assertTrue(session.closed)
+
+
+class FakeAiohttpResponse:
+    """Resposta do aiohttp: usada com async with (corpo lido) ou await (streaming)."""
+
+    def __init__(self, status=200, body=b'', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = CaseInsensitiveDict({'Content-Type': 'application/json', **(headers or {})})
+        self.content = mock.Mock()
+        self.content.iter_chunked = self.iter_chunked
+        self.released = False
+
+    async def text(self):
+        return self.body.decode()
+
+    async def read(self):
+        return self.body
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+    def release(self):
+        self.released = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def __await__(self):
+        yield from asyncio.sleep(0).__await__()
+        return self
+
+
+def mock_async_session(*responses):
+    """Sessão aiohttp do pool assíncrono que devolve as respostas na ordem."""
+    session = mock.Mock()
+    session.request.side_effect = list(responses)
+    session.get.side_effect = list(responses)
+    return mock.patch.object(AsyncServiceSessionPool, 'get_session', return_value=session), session
+
+
+@override_settings(GATEWAY_STREAM_RESPONSES=False, GATEWAY_CACHE=NO_CACHE)
+class AsyncProxyViewTests(SimpleTestCase):
+    """Views assíncronas (GATEWAY_ASYNC): corpo da requisição e erros do microserviço."""
+
+    async def post(self, data, content_type, upstream=None):
+        patcher, session = mock_async_session(upstream or FakeAiohttpResponse(200, b'{"access": "token"}'))
+        request = AsyncRequestFactory().post('/api/auth/login/', data, content_type=content_type)
+        with patcher:
+            response = await AsyncAuthProxyView.as_view()(request)
+        return response, session
+
+    async def test_json_body_is_forwarded(self):
+        response, session = await self.post({'email': 'a@b.com', 'password': 'x'}, 'application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'access': 'token'})
+        self.assertEqual(session.request.call_args.kwargs['json'], {'email': 'a@b.com', 'password': 'x'})
+        self.assertEqual(session.request.call_args.kwargs['url'], 'http://auth_service:8000/api/auth/login/')
+
+    async def test_form_body_is_forwarded_as_json_fields(self):
+        response, session = await self.post(
+            'email=a%40b.com&password=x', 'application/x-www-form-urlencoded'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.request.call_args.kwargs['json'], {'email': 'a@b.com', 'password': 'x'})
+
+    async def test_invalid_json_is_rejected_without_calling_the_service(self):
+        response, session = await self.post('{"email": ', 'application/json')
+
+        self.assertEqual(response.status_code, 400)
+        session.request.assert_not_called()
+
+    async def test_upstream_errors_keep_their_status_and_timeouts_become_504(self):
+        response, _ = await self.post(
+            {'email': 'a@b.com'}, 'application/json', FakeAiohttpResponse(400, b'{"password": ["required"]}')
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {'password': ['required']})
+
+        response, _ = await self.post({'email': 'a@b.com'}, 'application/json', asyncio.TimeoutError())
+        self.assertEqual(response.status_code, 504)
+
+
+@override_settings(GATEWAY_STREAM_RESPONSES=False, GATEWAY_CACHE=NO_CACHE)
+class ConditionalProxyTests(SimpleTestCase):
+    """Validadores repassados no caminho decodificado (GATEWAY_STREAM_RESPONSES=False)."""
+
+    ETAG = 'W/"catalog-7-json"'
+    LAST_MODIFIED = 'Sun, 18 Oct 2026 10:00:00 GMT'
+
+    def test_validators_are_forwarded_and_copied_to_the_response(self):
+        patcher, session = mock_session(make_upstream_response(
+            200, json.dumps({'results': []}).encode(),
+            {'ETag': self.ETAG, 'Last-Modified': self.LAST_MODIFIED}
+        ))
+        with patcher:
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH='W/"catalog-6-json"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.ETAG)
+        self.assertEqual(response['Last-Modified'], self.LAST_MODIFIED)
+        self.assertEqual(session.request.call_args.kwargs['headers']['If-None-Match'], 'W/"catalog-6-json"')
+
+    def test_upstream_304_is_passed_through(self):
+        patcher, _ = mock_session(make_upstream_response(304, b'', {'ETag': self.ETAG}))
+        with patcher:
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=self.ETAG)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.ETAG)
+
+    async def test_async_view_forwards_validators_and_passes_304(self):
+        forward = mock.AsyncMock(return_value=(None, 304, {'ETag': self.ETAG}))
+        request = AsyncRequestFactory().get('/api/products/', headers={'If-Modified-Since': self.LAST_MODIFIED})
+        with mock.patch.object(ServiceClient, 'aforward_request', forward):
+            response = await AsyncProductsView.as_view()(request)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.ETAG)
+        self.assertEqual(forward.call_args.kwargs['headers']['If-Modified-Since'], self.LAST_MODIFIED)
+
+
+@override_settings(GATEWAY_CACHE=NO_CACHE)
+class StreamingProxyTests(SimpleTestCase):
+    """Os dois caminhos de GATEWAY_STREAM_RESPONSES: repasse direto e corpo decodificado."""
+
+    def upstream(self):
+        response = make_upstream_response(
+            200, b'id;nome\n1;Linha', {'Content-Type': 'text/csv', 'ETag': '"v1"', 'Set-Cookie': 'x=1'}
+        )
+        # Corpo já em memória: iter_content lê dele em vez do socket
+        response._content_consumed = True
+        response.close = mock.Mock()
+        return response
+
+    def test_setting_defaults_to_the_decoded_path(self):
+        self.assertFalse(settings.GATEWAY_STREAM_RESPONSES)
+
+    @override_settings(GATEWAY_STREAM_RESPONSES=True)
+    def test_streaming_passes_body_and_headers_through(self):
+        upstream = self.upstream()
+        patcher, session = mock_session(upstream)
+        with patcher:
+            response = self.client.get('/api/products/')
+            body = b''.join(response.streaming_content)
+
+        self.assertTrue(response.streaming)
+        self.assertTrue(session.request.call_args.kwargs['stream'])
+        self.assertEqual(body, b'id;nome\n1;Linha')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertNotIn('Set-Cookie', response)
+        upstream.close.assert_called_once()
+
+    @override_settings(GATEWAY_STREAM_RESPONSES=False)
+    def test_decoded_path_renders_the_body_again(self):
+        patcher, session = mock_session(self.upstream())
+        with patcher:
+            response = self.client.get('/api/products/', HTTP_ACCEPT='application/json')
+
+        self.assertFalse(response.streaming)
+        self.assertNotIn('stream', session.request.call_args.kwargs)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), {'message': 'id;nome\n1;Linha'})
+
+    @override_settings(GATEWAY_STREAM_RESPONSES=True)
+    async def test_async_streaming_releases_the_connection(self):
+        upstream = FakeAiohttpResponse(200, b'x' * 100_000, {'ETag': '"v1"'})
+        patcher, _ = mock_async_session(upstream)
+        with patcher:
+            response = await AsyncProductsView.as_view()(AsyncRequestFactory().get('/api/products/'))
+            body = b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(body, b'x' * 100_000)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertTrue(upstream.released)
+
+
+def run_threads_inline():
+    """Atualizações em segundo plano do cache rodam na hora, na thread do teste."""
+    return mock.patch(
+        'gateway.cache.threading.Thread',
+        side_effect=lambda target, daemon: mock.Mock(start=target)
+    )
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """TTL, stale-while-revalidate, LRU e chave por Authorization."""
+
+    def setUp(self):
+        self.cache = ResponseCache(CATALOG_CACHE)
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.policy = self.cache.get_policy('/api/products/')
+        self.loader = mock.Mock(side_effect=lambda: {'status': 200, 'headers': {}, 'body': b'[]'})
+
+    def test_entry_is_fresh_then_stale_then_expired(self):
+        now = time.time()
+        key = self.cache.build_key('/api/products/', QueryDict())
+
+        self.assertEqual(self.cache.get_or_fetch(key, self.policy, self.loader)[1], 'MISS')
+        self.assertEqual(self.cache.get_or_fetch(key, self.policy, self.loader)[1], 'HIT')
+        self.assertEqual(self.loader.call_count, 1)
+
+        with mock.patch('time.time', return_value=now + 61), run_threads_inline():
+            self.assertEqual(self.cache.get_or_fetch(key, self.policy, self.loader)[1], 'STALE')
+        # A atualização em segundo plano já buscou de novo
+        self.assertEqual(self.loader.call_count, 2)
+
+        with mock.patch('time.time', return_value=now + 61 + 361):
+            self.assertEqual(self.cache.get_or_fetch(key, self.policy, self.loader)[1], 'MISS')
+        self.assertEqual(self.loader.call_count, 3)
+
+    def test_concurrent_misses_make_one_upstream_call(self):
+        key = self.cache.build_key('/api/products/', QueryDict())
+        release = threading.Event()
+
+        def slow_loader():
+            release.wait(5)
+            return {'status': 200, 'headers': {}, 'body': b'[]'}
+
+        loader = mock.Mock(side_effect=slow_loader)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_fetch(key, self.policy, loader)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        # Libera o microserviço só quando as outras 7 já aguardam a mesma busca
+        deadline = time.monotonic() + 5
+        while self.cache.stats()['coalesced'] < 7 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(loader.call_count, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result['body'] == b'[]' for result, _ in results))
+        self.assertEqual(self.cache.stats()['coalesced'], 7)
+
+    async def test_concurrent_async_misses_make_one_upstream_call(self):
+        key = self.cache.build_key('/api/products/', QueryDict())
+        release = asyncio.Event()
+
+        async def slow_loader():
+            await release.wait()
+            return {'status': 200, 'headers': {}, 'body': b'[]'}
+
+        loader = mock.AsyncMock(side_effect=slow_loader)
+        pending = asyncio.gather(*(self.cache.aget_or_fetch(key, self.policy, loader) for _ in range(8)))
+        await asyncio.sleep(0)
+        release.set()
+        results = await pending
+
+        loader.assert_awaited_once()
+        self.assertEqual([state for _, state in results], ['MISS'] * 8)
+        self.assertEqual(self.cache.stats()['coalesced'], 7)
+
+    def test_errors_are_not_cached(self):
+        key = self.cache.build_key('/api/products/', QueryDict())
+        loader = mock.Mock(return_value={'status': 503, 'headers': {}, 'body': b''})
+
+        self.cache.get_or_fetch(key, self.policy, loader)
+        self.cache.get_or_fetch(key, self.policy, loader)
+        self.assertEqual(loader.call_count, 2)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'gateway_responses': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'lru-test',
+            'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3},
+        },
+    })
+    def test_local_backend_discards_least_recently_used_entries(self):
+        backend = CacheBackend('gateway_responses', local=True)
+        entry = {'stale_until': time.time() + 60}
+        for key in 'abc':
+            backend.set(key, entry)
+        backend.get('a')
+        backend.set('d', entry)
+
+        self.assertIsNotNone(backend.get('a'))
+        self.assertIsNone(backend.get('b'))
+        self.assertIsNotNone(backend.get('d'))
+
+    def test_key_depends_on_authorization_but_not_on_parameter_order(self):
+        build_key = self.cache.build_key
+        self.assertEqual(
+            build_key('/api/products/', QueryDict('a=1&b=2')),
+            build_key('/api/products/', QueryDict('b=2&a=1'))
+        )
+        self.assertNotEqual(
+            build_key('/api/products/', QueryDict(), 'Bearer um'),
+            build_key('/api/products/', QueryDict(), 'Bearer outro')
+        )
+        self.assertNotEqual(
+            build_key('/api/products/', QueryDict(), 'Bearer um'),
+            build_key('/api/products/', QueryDict())
+        )
+
+    async def test_shared_backend_uses_the_async_cache_api_in_async_views(self):
+        cache = ResponseCache({**CATALOG_CACHE, 'BACKEND': 'shared'})
+        key = cache.build_key('/api/products/', QueryDict())
+        loader = mock.AsyncMock(return_value={'status': 200, 'headers': {}, 'body': b'[]'})
+
+        blocking = mock.Mock(side_effect=AssertionError('chamada síncrona no event loop'))
+        with mock.patch.object(CacheBackend, 'get', blocking), mock.patch.object(CacheBackend, 'set', blocking):
+            self.assertEqual((await cache.aget_or_fetch(key, self.policy, loader))[1], 'MISS')
+            self.assertEqual((await cache.aget_or_fetch(key, self.policy, loader))[1], 'HIT')
+        loader.assert_awaited_once()
+        await cache.backend.cache.aclear()
+
+
+@override_settings(GATEWAY_CACHE=CATALOG_CACHE)
+class CachedProxyTests(SimpleTestCase):
+    """Respostas em cache no gateway, separadas por Authorization."""
+
+    def setUp(self):
+        response_cache._backend = None
+        response_cache.clear()
+
+    def test_each_authorization_has_its_own_entry(self):
+        patcher, session = mock_session(
+            make_upstream_response(200, b'[1]'),
+            make_upstream_response(200, b'[2]'),
+        )
+        with patcher:
+            first = self.client.get('/api/products/', HTTP_AUTHORIZATION='Bearer um')
+            again = self.client.get('/api/products/', HTTP_AUTHORIZATION='Bearer um')
+            other = self.client.get('/api/products/', HTTP_AUTHORIZATION='Bearer outro')
+
+        self.assertEqual((first['X-Cache'], again['X-Cache'], other['X-Cache']), ('MISS', 'HIT', 'MISS'))
+        self.assertEqual(again.content, b'[1]')
+        self.assertEqual(other.content, b'[2]')
+        self.assertEqual(session.get.call_count, 2)
+
+    def test_cache_stats_is_restricted_to_internal_callers(self):
+        self.assertEqual(self.client.get('/api/gateway/cache-stats/').status_code, 200)
+        response = self.client.get('/api/gateway/cache-stats/', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 403)
@@ -1,25 +1,47 @@
 # api_gateway/gateway/urls.py
+from django.conf import settings
 from django.urls import path, re_path
-from .views import AuthProxyView, RecommendationView, ProductsView, PaymentProxyView
+from .views import (
+    cache_stats,
+    AuthProxyView, RecommendationView, ProductsView, PaymentProxyView,
+    AsyncAuthProxyView, AsyncRecommendationView, AsyncProductsView, AsyncPaymentProxyView,
+)
 
-urlpatterns = [
-    # Rotas de autenticação
-    re_path(r'^auth/login/?$', AuthProxyView.as_view()),
-    re_path(r'^auth/register/?$', AuthProxyView.as_view()),
-    re_path(r'^auth/profile/?$', AuthProxyView.as_view()),
-    re_path(r'^auth/refresh/?$', AuthProxyView.as_view()),
-    re_path(r'^auth/verify/?$', AuthProxyView.as_view()),  # Verifica o token de autenticação
 
-    # Rotas de recomendação
-    re_path(r'^recommendations/(?P<path>.*)$', RecommendationView.as_view()),
-    re_path(r'^recommendations/(?P<user_id>\d+)/?$', RecommendationView.as_view()),
+def build_urlpatterns(auth_view, recommendation_view, products_view, payment_view):
+    """Monta as rotas do gateway para o conjunto de views informado."""
+    return [
+        # Rotas de autenticação
+        re_path(r'^auth/login/?$', auth_view.as_view()),
+        re_path(r'^auth/register/?$', auth_view.as_view()),
+        re_path(r'^auth/profile/?$', auth_view.as_view()),
+        re_path(r'^auth/refresh/?$', auth_view.as_view()),
+        re_path(r'^auth/verify/?$', auth_view.as_view()),  # Verifica o token de autenticação
 
-    # Rotas de produtos
-    re_path(r'^products/?$', ProductsView.as_view()),
-    re_path(r'^products/(?P<product_id>\d+)/?$', ProductsView.as_view()),
-    re_path(r'^products/categories/?$', ProductsView.as_view()),
-    re_path(r'^products/product/?$', ProductsView.as_view()),
+        # Rotas de recomendação
+        re_path(r'^recommendations/(?P<path>.*)$', recommendation_view.as_view()),
+        re_path(r'^recommendations/(?P<user_id>\d+)/?$', recommendation_view.as_view()),
 
-    re_path(r'payment/(?P<path>.*)$', PaymentProxyView.as_view()),
+        # Rotas de produtos
+        re_path(r'^products/?$', products_view.as_view()),
+        re_path(r'^products/(?P<product_id>\d+)/?$', products_view.as_view()),
+        re_path(r'^products/categories/?$', products_view.as_view()),
+        re_path(r'^products/product/?$', products_view.as_view()),
 
-]
\ No newline at end of file
+        re_path(r'payment/(?P<path>.*)$', payment_view.as_view()),
+
+        # Contadores do cache de respostas do gateway
+        re_path(r'^gateway/cache-stats/?$', cache_stats),
+    ]
+
+
+sync_urlpatterns = build_urlpatterns(
+    AuthProxyView, RecommendationView, ProductsView, PaymentProxyView
+)
+
+# Rotas usadas no modo ASGI (GATEWAY_ASYNC=True)
+async_urlpatterns = build_urlpatterns(
+    AsyncAuthProxyView, AsyncRecommendationView, AsyncProductsView, AsyncPaymentProxyView
+)
+
+urlpatterns = async_urlpatterns if settings.GATEWAY_ASYNC else sync_urlpatterns
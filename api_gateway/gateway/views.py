@@ -1,13 +1,133 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .services import ServiceClient
+from .cache import response_cache
+from .services import CONDITIONAL_HEADERS, ServiceClient
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.views import View
 import requests
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Corpos de formulário aceitos pelas views assíncronas, além de JSON; como
+# nas views síncronas, os campos são repassados ao microserviço em JSON
+FORM_CONTENT_TYPES = (
+    'application/x-www-form-urlencoded',
+    'multipart/form-data',
+)
+
+
+def proxy_response(service_name, path, method='GET', data=None, headers=None, params=None):
+    """
+    Encaminha a requisição e monta a resposta ao cliente.
+
+    Com GATEWAY_STREAM_RESPONSES o corpo do microserviço é repassado como
+    está (streaming); caso contrário é decodificado e renderizado pelo DRF.
+    O status original é sempre mantido para que o cliente receba os erros
+    de validação corretamente.
+    """
+    if settings.GATEWAY_STREAM_RESPONSES:
+        return ServiceClient.stream_request(
+            service_name, path, method=method, data=data, headers=headers, params=params
+        )
+
+    data, status_code, validators = ServiceClient.forward_request(
+        service_name, path, method=method, data=data, headers=headers, params=params
+    )
+    if status_code == 304:
+        response = HttpResponseNotModified()
+    else:
+        response = Response(data=data, status=status_code)
+    return with_validators(response, validators)
+
+
+def with_validators(response, validators):
+    """Copia o ETag/Last-Modified do microserviço para a resposta decodificada."""
+    for header, value in validators.items():
+        response[header] = value
+    return response
+
+
+def conditional_headers(request, headers=None):
+    """
+    headers mais If-None-Match/If-Modified-Since do cliente, para GETs
+    repassados sem cache (o 304 do microserviço chega ao cliente com os validadores).
+    """
+    headers = dict(headers or {})
+    for header in CONDITIONAL_HEADERS:
+        if header in request.headers:
+            headers[header] = request.headers[header]
+    return headers
+
+
+def build_cached_response(request, result, cache_state):
+    """
+    Monta a resposta HTTP a partir de um resultado do cache do gateway.
+    Se os validadores do cliente casam com o ETag/Last-Modified guardados,
+    responde 304 sem corpo.
+    """
+    response = HttpResponse(
+        result['body'],
+        status=result['status'],
+        content_type=result['headers'].get('Content-Type', 'application/json')
+    )
+    for header, value in result['headers'].items():
+        if header != 'Content-Type':
+            response[header] = value
+    response['X-Cache'] = cache_state
+
+    last_modified = response.get('Last-Modified')
+    conditional = get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        response=response
+    )
+    if conditional is not response:
+        conditional['X-Cache'] = cache_state
+    return conditional
+
+
+def cached_proxy_response(request, service_name, path, headers=None, params=None):
+    """
+    Encaminha um GET passando pelo cache de respostas do gateway.
+    Rotas sem política em GATEWAY_CACHE['ROUTES'] seguem direto ao microserviço.
+    """
+    policy = response_cache.get_policy(request.path)
+    if policy is None:
+        return proxy_response(
+            service_name, path, method='GET', headers=conditional_headers(request, headers), params=params
+        )
+
+    key = response_cache.build_key(request.path, request.GET, (headers or {}).get('Authorization'))
+    result, cache_state = response_cache.get_or_fetch(
+        key,
+        policy,
+        lambda: ServiceClient.fetch_response(service_name, path, headers=headers, params=params)
+    )
+    return build_cached_response(request, result, cache_state)
+
+
+def is_internal_request(request):
+    """Staff autenticado no gateway (sessão do admin) ou chamada vinda de INTERNAL_IPS."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+def cache_stats(request):
+    """Contadores de acerto/falha do cache de respostas deste processo (uso interno)."""
+    if not is_internal_request(request):
+        return JsonResponse({'error': 'Acesso restrito'}, status=403)
+    return JsonResponse(response_cache.stats())
+
+
 class AuthProxyView(APIView):
     """View para encaminhar requisições ao serviço de autenticação."""
     
@@ -22,7 +142,7 @@ class AuthProxyView(APIView):
 
         try:
             # Encaminha a requisição ao serviço de autenticação
-            data, status_code = ServiceClient.forward_request(
+            return proxy_response(
                 service_name='AUTH',
                 path=path,
                 method='POST',
@@ -30,10 +150,6 @@ class AuthProxyView(APIView):
                 headers=self._get_headers(request)
             )
             
-            # Muito importante: Manter o código de status original para que o cliente
-            # receba os erros de validação corretamente
-            return Response(data=data, status=status_code)
-            
         except Exception as e:
             logger.error(f"Erro ao encaminhar requisição para AUTH: {str(e)}")
             return Response(
@@ -56,16 +172,14 @@ class RecommendationView(APIView):
     def get(self, request, *args, **kwargs):
         path = request.path.replace('/api/recommendations', '')
         
-        data, status_code = ServiceClient.forward_request(
+        return cached_proxy_response(
+            request,
             service_name='RECOMMENDATION',
             path=path,
-            method='GET',
             headers=self._get_headers(request),
             params=request.query_params
         )
         
-        return Response(data=data, status=status_code)
-        
     def _get_headers(self, request):
         """Extrair cabeçalhos relevantes da requisição original."""
         headers = {}
@@ -84,28 +198,24 @@ class ProductsView(APIView):
          
         
         # Passar os parâmetros de consulta
-        data, status_code = ServiceClient.forward_request(
+        return cached_proxy_response(
+            request,
             service_name='MAIN',
             path=path,  # Usar o caminho correto para o serviço principal
-            method='GET',
             headers=self._get_headers(request),
             params=request.query_params
         )
-        
-        return Response(data=data, status=status_code)
     
     def post(self, request, *args, **kwargs):
         path = request.path.replace('/api/products', '')
         
-        data, status_code = ServiceClient.forward_request(
+        return proxy_response(
             service_name='MAIN',
             path=path,
             method='POST',
             data=request.data,
             headers=self._get_headers(request)
         )
-        
-        return Response(data=data, status=status_code)
     
     def _get_headers(self, request):
         headers = {}
@@ -121,32 +231,171 @@ class PaymentProxyView(APIView):
         # Extrair o endpoint específico do path
         path = request.path.replace('/api/payments', '')
         
-        data, status_code = ServiceClient.forward_request(
+        return proxy_response(
             service_name='PAYMENT',
             path=path,
             method='POST',
             data=request.data,
             headers=self._get_headers(request)
         )
-        
-        return Response(data=data, status=status_code)
     
     def get(self, request, *args, **kwargs):
         # Lógica similar para GET requests
         path = request.path.replace('/api/payments', '')
         
-        data, status_code = ServiceClient.forward_request(
+        return proxy_response(
             service_name='PAYMENT',
             path=path,
             method='GET',
-            headers=self._get_headers(request)
+            headers=conditional_headers(request, self._get_headers(request))
         )
         
-        return Response(data=data, status=status_code)
-        
     def _get_headers(self, request):
         """Extrair cabeçalhos relevantes da requisição original."""
         headers = {}
         if 'Authorization' in request.headers:
             headers['Authorization'] = request.headers['Authorization']
         return headers
+
+
+# ---------------------------------------------------------------------------
+# Views assíncronas (modo ASGI, GATEWAY_ASYNC=True)
+#
+# Mesmas rotas e comportamento das views acima, mas sem prender um worker
+# durante a chamada ao microserviço: cada requisição é uma corrotina que
+# aguarda o ServiceClient (aforward_request ou astream_request).
+# ---------------------------------------------------------------------------
+
+class AsyncProxyView(View):
+    """Base para as views de proxy assíncronas."""
+
+    service_name = None
+    path_prefix = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Assim como o APIView do DRF, o proxy não aplica CSRF
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def forward(self, request, method, forward_params=False, cached=False):
+        path = request.path.replace(self.path_prefix, '')
+
+        data = None
+        if method in ['POST', 'PUT', 'PATCH'] and request.body:
+            # Mesmos formatos aceitos pelo request.data das views síncronas
+            if request.content_type in FORM_CONTENT_TYPES:
+                data = request.POST.dict()
+            else:
+                try:
+                    data = json.loads(request.body)
+                except ValueError:
+                    return JsonResponse({"error": "JSON inválido"}, status=400)
+
+        params = None
+        if forward_params:
+            params = [(key, value) for key, values in request.GET.lists() for value in values]
+
+        policy = response_cache.get_policy(request.path) if cached else None
+        if policy is not None:
+            headers = self._get_headers(request)
+            key = response_cache.build_key(request.path, request.GET, headers.get('Authorization'))
+            result, cache_state = await response_cache.aget_or_fetch(
+                key,
+                policy,
+                lambda: ServiceClient.afetch_response(
+                    self.service_name, path, headers=headers, params=params
+                )
+            )
+            return build_cached_response(request, result, cache_state)
+
+        headers = self._get_headers(request)
+        if method == 'GET':
+            headers = conditional_headers(request, headers)
+
+        if settings.GATEWAY_STREAM_RESPONSES:
+            return await ServiceClient.astream_request(
+                service_name=self.service_name,
+                path=path,
+                method=method,
+                data=data,
+                headers=headers,
+                params=params
+            )
+
+        data, status_code, validators = await ServiceClient.aforward_request(
+            service_name=self.service_name,
+            path=path,
+            method=method,
+            data=data,
+            headers=headers,
+            params=params
+        )
+
+        if status_code == 304:
+            return with_validators(HttpResponseNotModified(), validators)
+        return with_validators(JsonResponse(data, status=status_code, safe=False), validators)
+
+    def _get_headers(self, request):
+        """Extrair cabeçalhos relevantes da requisição original."""
+        headers = {}
+        if 'Authorization' in request.headers:
+            headers['Authorization'] = request.headers['Authorization']
+        return headers
+
+
+class AsyncAuthProxyView(AsyncProxyView):
+    """Versão assíncrona de AuthProxyView."""
+
+    service_name = 'AUTH'
+    path_prefix = '/api/auth'
+
+    async def post(self, request, *args, **kwargs):
+        logger.info(f"Encaminhando requisição para AUTH: {request.path}")
+
+        try:
+            return await self.forward(request, 'POST')
+        except Exception as e:
+            logger.error(f"Erro ao encaminhar requisição para AUTH: {str(e)}")
+            return JsonResponse(
+                {"error": "Erro de comunicação com o serviço de autenticação"},
+                status=500
+            )
+
+
+class AsyncRecommendationView(AsyncProxyView):
+    """Versão assíncrona de RecommendationView."""
+
+    service_name = 'RECOMMENDATION'
+    path_prefix = '/api/recommendations'
+
+    async def get(self, request, *args, **kwargs):
+        return await self.forward(request, 'GET', forward_params=True, cached=True)
+
+
+class AsyncProductsView(AsyncProxyView):
+    """Versão assíncrona de ProductsView."""
+
+    service_name = 'MAIN'
+    path_prefix = '/api/products'
+
+    async def get(self, request, *args, **kwargs):
+        return await self.forward(request, 'GET', forward_params=True, cached=True)
+
+    async def post(self, request, *args, **kwargs):
+        return await self.forward(request, 'POST')
+
+
+class AsyncPaymentProxyView(AsyncProxyView):
+    """Versão assíncrona de PaymentProxyView."""
+
+    service_name = 'PAYMENT'
+    path_prefix = '/api/payments'
+
+    async def post(self, request, *args, **kwargs):
+        return await self.forward(request, 'POST')
+
+    async def get(self, request, *args, **kwargs):
+        return await self.forward(request, 'GET')
+
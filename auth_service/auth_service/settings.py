@@ -161,3 +161,58 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# Cache em memória dos claims de usuário usados na validação de tokens
+# (CACHES[CACHE_ALIAS]). Invalidado ao salvar/remover o usuário; o TTL
+# limita a defasagem entre processos.
+USER_CLAIMS_CACHE = {
+    'CACHE_ALIAS': 'user_claims',
+    'TTL': 60,
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'user_claims': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'user_claims',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Ações permitidas por recurso e papel ('authenticated', 'staff').
+# Superusuários têm todas as ações; permissões do Django no formato
+# '<recurso>.<ação>' complementam a política.
+AUTHORIZATION_POLICY = {
+    'product': {
+        'staff': ['create', 'update', 'partial_update', 'destroy', 'toggle_featured', 'update_stock',
+                  'bulk_update_stock', 'bulk_upsert'],
+    },
+    'category': {
+        'staff': ['create', 'update', 'partial_update', 'destroy'],
+    },
+    'cart': {
+        'authenticated': [
+            'create', 'update', 'partial_update', 'destroy',
+            'add_item', 'update_item', 'remove_item', 'clear',
+        ],
+    },
+    'order': {
+        'authenticated': ['create', 'checkout'],
+        'staff': ['update', 'partial_update', 'destroy'],
+    },
+    'payment': {
+        'authenticated': ['check_status'],
+    },
+}
+
+# Serviços avisados no logout para recusar o access token antes do exp, e na
+# desativação, troca de senha ou remoção de um usuário para recusar todos os
+# tokens dele (necessário onde o token é verificado localmente, com cache)
+TOKEN_REVOCATION_HOOKS = [
+    url for url in os.environ.get(
+        'TOKEN_REVOCATION_HOOKS',
+        'http://main_service:8000/api/products/token/revoke/'
+    ).split(',') if url
+]
+
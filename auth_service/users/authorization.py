@@ -0,0 +1,58 @@
+from django.conf import settings
+
+
+def get_authorization_policy():
+    """Política de autorização por recurso (AUTHORIZATION_POLICY)."""
+    return getattr(settings, 'AUTHORIZATION_POLICY', {})
+
+
+def get_user_roles(user):
+    """Papéis do usuário usados na política de autorização."""
+    if not user.is_active:
+        return []
+    roles = ['authenticated']
+    if user.is_staff:
+        roles.append('staff')
+    if user.is_superuser:
+        roles.append('superuser')
+    return roles
+
+
+def get_permission_set(user, resources=None):
+    """
+    Retorna {recurso: [ações permitidas]} para o usuário.
+
+    Superusuários recebem '*' (todas as ações) em todos os recursos. Além da
+    política, permissões do Django no formato '<recurso>.<ação>' concedidas
+    ao usuário ou aos seus grupos também entram no conjunto.
+
+    Args:
+        user: Usuário autenticado
+        resources: Lista de recursos desejados (None para todos)
+    """
+    policy = get_authorization_policy()
+    if resources is None:
+        resources = list(policy)
+
+    roles = get_user_roles(user)
+    django_permissions = user.get_all_permissions() if user.is_active else set()
+
+    permission_set = {}
+    for resource in resources:
+        if 'superuser' in roles:
+            permission_set[resource] = ['*']
+            continue
+
+        actions = set()
+        for role in roles:
+            actions.update(policy.get(resource, {}).get(role, []))
+        prefix = f"{resource}."
+        actions.update(perm[len(prefix):] for perm in django_permissions if perm.startswith(prefix))
+        permission_set[resource] = sorted(actions)
+
+    return permission_set
+
+
+def is_action_allowed(permission_set, resource, action):
+    actions = permission_set.get(resource, [])
+    return '*' in actions or action in actions
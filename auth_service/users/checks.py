@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.security, deploy=True)
+def check_token_signing_key(app_configs, **kwargs):
+    """Recusa o deploy com a chave padrão: os outros serviços não verificariam os tokens."""
+    if not settings.SIMPLE_JWT['SIGNING_KEY'].startswith('django-insecure-'):
+        return []
+    return [
+        Error(
+            "SIMPLE_JWT['SIGNING_KEY'] é a SECRET_KEY padrão do projeto.",
+            hint=(
+                "Defina DJANGO_SECRET_KEY com o mesmo valor de AUTH_JWT_SIGNING_KEY "
+                "dos serviços que verificam os tokens localmente."
+            ),
+            id='users.E001',
+        )
+    ]
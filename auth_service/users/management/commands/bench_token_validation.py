@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from users.models import User
+from users.tokens import UserRefreshToken, user_claims_cache
+from users.views import TokenValidationView
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede validações de token por segundo no TokenValidationView, sem o '
+        'cache de claims (uma consulta por validação) e com o cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000,
+                            help='Validações por cenário')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Usuários distintos nos tokens validados')
+
+    def handle(self, *args, **options):
+        # Banco de teste descartável, para não tocar nos dados reais
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            self._run(options['iterations'], options['users'])
+        finally:
+            runner.teardown_databases(old_config)
+
+    def _run(self, iterations, user_count):
+        users = [
+            User.objects.create_user(email=f'bench{i}@example.com', password='bench')
+            for i in range(user_count)
+        ]
+        tokens = [str(UserRefreshToken.for_user(user).access_token) for user in users]
+
+        factory = APIRequestFactory()
+        view = TokenValidationView.as_view()
+
+        def build_requests():
+            # Cada requisição só pode ter o corpo lido uma vez
+            return [
+                factory.post('/api/auth/token/validate/', {'token': tokens[i % len(tokens)]}, format='json')
+                for i in range(iterations)
+            ]
+
+        def without_cache(request):
+            user_claims_cache.clear()
+            return view(request)
+
+        self._report('antes  (sem cache de claims)', build_requests(), without_cache)
+
+        user_claims_cache.clear()
+        self._report('depois (com cache de claims)', build_requests(), view)
+
+    def _report(self, label, requests, call):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for request in requests:
+                response = call(request)
+                assert response.status_code == 200, response.status_code
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label}: {len(requests) / elapsed:9.1f} validações/s | "
+            f"{len(queries) / len(requests):.3f} consultas por validação"
+        )
@@ -0,0 +1,37 @@
+import logging
+
+import requests
+from django.conf import settings
+from django.db import transaction
+
+from .tokens import UserRevocationToken
+
+logger = logging.getLogger(__name__)
+
+
+def post_revocation(payload):
+    """Envia o aviso a TOKEN_REVOCATION_HOOKS; falhas são registradas e ignoradas."""
+    for url in getattr(settings, 'TOKEN_REVOCATION_HOOKS', []):
+        try:
+            requests.post(url, json=payload, timeout=1)
+        except requests.RequestException as e:
+            logger.warning(f"Falha ao notificar revogação de token em {url}: {str(e)}")
+
+
+def notify_token_revoked(access_token):
+    """
+    Avisa os serviços que verificam tokens localmente (TOKEN_REVOCATION_HOOKS)
+    que o access token foi revogado. Falhas não impedem o logout.
+    """
+    post_revocation({'token': access_token})
+
+
+def notify_user_tokens_revoked(user):
+    """
+    Avisa os mesmos serviços que os tokens já emitidos para o usuário não
+    valem mais (desativação, troca de senha, remoção). O aviso é um token
+    assinado (UserRevocationToken), conferido com a mesma chave dos access
+    tokens, e parte depois do commit da alteração.
+    """
+    payload = {'user_revocation': str(UserRevocationToken.for_user(user))}
+    transaction.on_commit(lambda: post_revocation(payload))
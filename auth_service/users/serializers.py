@@ -85,6 +85,16 @@ class TokenValidationSerializer(serializers.Serializer):
     token = serializers.CharField(required=True)
 
 
+class AuthorizationSerializer(serializers.Serializer):
+    """
+    Serializer para consulta de permissões em lote
+    """
+    token = serializers.CharField(required=True)
+    resources = serializers.ListField(child=serializers.CharField(), required=False)
+    resource = serializers.CharField(required=False)
+    action = serializers.CharField(required=False)
+
+
 class TokenRefreshSerializer(serializers.Serializer):
     """
     Serializer para refresh de tokens
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .revocation import notify_user_tokens_revoked
+from .tokens import user_claims_cache
+
+# Alterações do usuário que revogam os tokens já emitidos
+REVOKING_FIELDS = ('is_active', 'password')
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_claims(sender, instance, **kwargs):
+    """Usuário alterado, desativado ou removido: descarta os claims em cache."""
+    user_claims_cache.invalidate(str(instance.pk))
+
+
+@receiver(pre_save, sender=get_user_model())
+def remember_revoking_fields(sender, instance, update_fields=None, **kwargs):
+    """Guarda is_active e senha anteriores para comparar no post_save."""
+    instance._revoking_fields = None
+    if instance.pk is None:
+        return
+    # Ex.: last_login no login, que não precisa da consulta
+    if update_fields is not None and not set(update_fields) & set(REVOKING_FIELDS):
+        return
+    instance._revoking_fields = (
+        sender.objects.filter(pk=instance.pk).values_list(*REVOKING_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def revoke_user_tokens(sender, instance, created, **kwargs):
+    """
+    Usuário desativado ou com a senha alterada: os serviços que verificam
+    tokens localmente passam a recusar os tokens emitidos até agora.
+    """
+    previous = getattr(instance, '_revoking_fields', None)
+    if created or previous is None:
+        return
+    was_active, old_password = previous
+    if (was_active and not instance.is_active) or old_password != instance.password:
+        notify_user_tokens_revoked(instance)
+
+
+@receiver(post_delete, sender=get_user_model())
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    """Usuário removido: os tokens dele também deixam de valer."""
+    notify_user_tokens_revoked(instance)
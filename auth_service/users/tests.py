@@ -1,3 +1,150 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .tokens import UserRefreshToken, get_user_claims, user_claims_cache
+
+User = get_user_model()
+
+REVOCATION_HOOK = 'http://main_service:8000/api/products/token/revoke/'
+
+
+@override_settings(TOKEN_REVOCATION_HOOKS=[REVOCATION_HOOK])
+class UserTokenRevocationTests(TestCase):
+    """Desativação, troca de senha e remoção avisam os serviços com verificação local."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente@exemplo.com', 'senha-antiga')
+        post = mock.patch('users.revocation.requests.post')
+        self.post = post.start()
+        self.addCleanup(post.stop)
+
+    def save(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(**kwargs)
+
+    def test_deactivation_sends_a_signed_user_revocation(self):
+        self.user.is_active = False
+        self.save()
+
+        self.post.assert_called_once()
+        url = self.post.call_args.args[0]
+        revocation = self.post.call_args.kwargs['json']['user_revocation']
+        claims = jwt.decode(
+            revocation, settings.SIMPLE_JWT['SIGNING_KEY'], algorithms=[settings.SIMPLE_JWT['ALGORITHM']]
+        )
+        self.assertEqual(url, REVOCATION_HOOK)
+        self.assertEqual(claims['token_type'], 'user_revocation')
+        self.assertEqual(claims['user_id'], str(self.user.pk))
+        self.assertIn('iat', claims)
+
+    def test_password_change_sends_a_user_revocation(self):
+        self.user.set_password('senha-nova')
+        self.save()
+
+        self.assertIn('user_revocation', self.post.call_args.kwargs['json'])
+
+    def test_other_changes_do_not_revoke(self):
+        self.user.first_name = 'Maria'
+        self.save()
+        self.save(update_fields=['last_login'])
+
+        self.post.assert_not_called()
+
+    def test_deleted_user_is_revoked(self):
+        user_id = str(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        revocation = self.post.call_args.kwargs['json']['user_revocation']
+        claims = jwt.decode(revocation, options={'verify_signature': False})
+        self.assertEqual(claims['user_id'], user_id)
+
+
+class AuthorizationViewTests(TestCase):
+    """Conjunto de permissões por recurso em uma resposta."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cliente@exemplo.com', 'senha')
+        self.token = str(UserRefreshToken.for_user(self.user).access_token)
+
+    def authorize(self, **data):
+        return self.client.post(
+            '/api/auth/authorize/', {'token': self.token, **data}, content_type='application/json'
+        )
+
+    def test_batch_response_has_one_entry_per_resource(self):
+        response = self.authorize(resources=['cart', 'product'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'user_id', 'permissions', 'expires_at'})
+        self.assertEqual(response.data['user_id'], str(self.user.pk))
+        self.assertIn('add_item', response.data['permissions']['cart'])
+        self.assertEqual(response.data['permissions']['product'], [])
+        self.assertEqual(response.data['expires_at'], AccessToken(self.token)['exp'])
+
+    def test_staff_and_superuser_permissions(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertIn('create', self.authorize(resources=['product']).data['permissions']['product'])
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertEqual(self.authorize(resources=['product']).data['permissions'], {'product': ['*']})
+
+    def test_single_action_keeps_the_authorized_flag(self):
+        response = self.authorize(resource='cart', action='add_item')
+        self.assertEqual(set(response.data['permissions']), {'cart'})
+        self.assertTrue(response.data['authorized'])
+
+        self.assertFalse(self.authorize(resource='product', action='destroy').data['authorized'])
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.post(
+            '/api/auth/authorize/', {'token': 'invalido', 'resources': ['cart']}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class UserClaimsCacheTests(TestCase):
+    """Claims do usuário em cache: hit sem consulta, invalidado ao salvar."""
+
+    def setUp(self):
+        user_claims_cache.clear()
+        self.user = User.objects.create_user('cliente@exemplo.com', 'senha')
+
+    def test_hit_skips_the_database_and_save_invalidates(self):
+        self.assertEqual(get_user_claims(self.user.pk)['email'], 'cliente@exemplo.com')
+        with self.assertNumQueries(0):
+            get_user_claims(self.user.pk)
+
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertTrue(get_user_claims(self.user.pk)['is_staff'])
+
+    def test_entries_expire_after_ttl(self):
+        get_user_claims(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+
+        self.assertFalse(get_user_claims(self.user.pk)['is_staff'])
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertTrue(get_user_claims(self.user.pk)['is_staff'])
+
+    def validate(self, token):
+        return self.client.post('/api/auth/token/validate/', {'token': token}, content_type='application/json')
+
+    def test_validate_endpoint_uses_cached_claims(self):
+        token = str(UserRefreshToken.for_user(self.user).access_token)
+        response = self.validate(token)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user_id'], str(self.user.pk))
+        self.assertTrue(response.data['is_active'])
+        with self.assertNumQueries(0):
+            self.validate(token)
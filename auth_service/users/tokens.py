@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+# Claims do usuário embutidos nos tokens e devolvidos na validação
+USER_CLAIM_FIELDS = ('email', 'is_active', 'is_staff')
+
+
+def get_user_claims_cache_settings():
+    config = {
+        'CACHE_ALIAS': 'user_claims',
+        'TTL': 60,
+    }
+    config.update(getattr(settings, 'USER_CLAIMS_CACHE', {}))
+    return config
+
+
+class UserClaimsCache:
+    """
+    Claims de cada usuário no cache CACHE_ALIAS (CACHES['user_claims']:
+    LocMemCache do processo, que descarta as entradas menos usadas ao
+    passar de MAX_ENTRIES).
+
+    As entradas são removidas pelos sinais de save/delete do usuário
+    (users.signals); o TTL limita a defasagem quando a alteração acontece
+    em outro processo ou via queryset.update(), que não dispara sinais.
+    """
+
+    def __init__(self, config=None):
+        self._config = config
+
+    @property
+    def config(self):
+        if self._config is not None:
+            return self._config
+        return get_user_claims_cache_settings()
+
+    @property
+    def cache(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    def get(self, user_id):
+        return self.cache.get(self._cache_key(user_id))
+
+    def set(self, user_id, claims):
+        self.cache.set(self._cache_key(user_id), claims, timeout=self.config['TTL'])
+
+    def invalidate(self, user_id):
+        self.cache.delete(self._cache_key(user_id))
+
+    def clear(self):
+        self.cache.clear()
+
+    @staticmethod
+    def _cache_key(user_id):
+        return f'user-claims:{user_id}'
+
+
+user_claims_cache = UserClaimsCache()
+
+
+def build_user_claims(user):
+    return {field: getattr(user, field) for field in USER_CLAIM_FIELDS}
+
+
+def get_user_claims(user_id):
+    """
+    Retorna os claims do usuário, consultando o banco apenas em um miss.
+
+    Returns:
+        Dicionário com os claims ou None se o usuário não existir
+    """
+    user_id = str(user_id)
+    claims = user_claims_cache.get(user_id)
+    if claims is not None:
+        return claims
+
+    User = get_user_model()
+    claims = User.objects.filter(id=user_id).values(*USER_CLAIM_FIELDS).first()
+    if claims is not None:
+        user_claims_cache.set(user_id, claims)
+    return claims
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token com os claims do usuário (email, is_active, is_staff).
+    O access token derivado herda os mesmos claims, o que permite aos
+    outros microserviços identificar o usuário sem consultar este serviço.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in build_user_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserRefreshToken
+
+
+class UserRevocationToken(Token):
+    """
+    Aviso assinado aos outros microserviços: os tokens do usuário emitidos
+    antes do iat deste foram revogados (usuário desativado ou senha alterada).
+    """
+    token_type = 'user_revocation'
+    lifetime = timedelta(minutes=1)
@@ -5,6 +5,7 @@ from .views import (
     LogoutView,
     ProfileView,
     TokenValidationView,
+    AuthorizationView,
     ChangePasswordView,
     RefreshTokenView
 )
@@ -24,6 +25,9 @@ urlpatterns = [
     # Gerenciamento de tokens
     path('token/validate/', TokenValidationView.as_view(), name='validate_token'),
     path('token/refresh/', RefreshTokenView.as_view(), name='refresh_token'),
+
+    # Autorização (conjunto de permissões por recurso)
+    path('authorize/', AuthorizationView.as_view(), name='authorize'),
 ]
 
 
@@ -7,7 +7,10 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from .serializers import UserSerializer, UserProfileSerializer, PasswordChangeSerializer, TokenValidationSerializer, TokenRefreshSerializer
+from .serializers import UserSerializer, UserProfileSerializer, PasswordChangeSerializer, TokenValidationSerializer, TokenRefreshSerializer, AuthorizationSerializer
+from .authorization import get_permission_set, is_action_allowed
+from .revocation import notify_token_revoked
+from .tokens import UserRefreshToken, UserTokenObtainPairSerializer, get_user_claims
 
 User = get_user_model()
 
@@ -32,7 +35,7 @@ class RegisterView(generics.CreateAPIView):
 
         # Gerando tokens para o novo usuário
         user = serializer.instance # Obtém a referência ao objeto de usuário já criado no banco de dados
-        refresh = RefreshToken.for_user(user) # Cria um token para o usuário
+        refresh = UserRefreshToken.for_user(user) # Cria um token para o usuário (com email, is_active e is_staff)
         
         # Cria o a resposta JSON vai ser enviado ao cliente
         response_data = {
@@ -59,6 +62,9 @@ class LoginView(TokenObtainPairView):
         - O IP é obtido do cabeçalho HTTP_X_FORWARDED_FOR ou do REMOTE_ADDR.
         - O IP é salvo no banco de dados.   
     """
+    # Tokens com os claims do usuário (email, is_active, is_staff)
+    serializer_class = UserTokenObtainPairSerializer
+
     def post(self, request, *args, **kwargs):
         response = super().post(request, *args, **kwargs)
         
@@ -100,6 +106,12 @@ class LogoutView(APIView):
                 # Adiciona o token à blacklist para invalidá-lo imediatamente
                 # Mesmo que ainda não tenha expirado, não poderá mais ser usado
                 token.blacklist()
+
+                # O access token em uso continua válido até expirar; os serviços
+                # que o verificam localmente são avisados para recusá-lo já
+                auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+                if auth_header.startswith('Bearer '):
+                    notify_token_revoked(auth_header.split(' ')[1])
                 
                 # Retorna uma mensagem de sucesso ao cliente
                 return Response({"message": "Logout realizado com sucesso"}, status=status.HTTP_200_OK)
@@ -146,20 +158,21 @@ class TokenValidationView(APIView):
             # Extrai o ID do usuário
             user_id = valid_token.get('user_id')
             
-            try:
-                user = User.objects.get(id=user_id)
-                return Response({
-                    'valid': True,
-                    'user_id': str(user.id),
-                    'email': user.email,
-                    'is_active': user.is_active,
-                    'is_staff': user.is_staff,
-                })
-            except User.DoesNotExist:
+            # Claims do usuário em cache (invalidado quando o usuário é salvo);
+            # o banco só é consultado em um miss
+            claims = get_user_claims(user_id)
+            if claims is None:
                 return Response(
                     {'error': 'Usuário não encontrado'},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            return Response({
+                'valid': True,
+                'user_id': str(user_id),
+                'email': claims['email'],
+                'is_active': claims['is_active'],
+                'is_staff': claims['is_staff'],
+            })
                 
         except (InvalidToken, TokenError):
             return Response(
@@ -168,6 +181,54 @@ class TokenValidationView(APIView):
             )
 
 
+class AuthorizationView(APIView):
+    """
+    View que retorna, em uma única resposta, o conjunto de permissões do
+    usuário do token por recurso. Os outros microserviços guardam esse
+    conjunto em cache até o token expirar, em vez de consultar cada ação.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+        serializer = AuthorizationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        try:
+            valid_token = AccessToken(data['token'])
+        except (InvalidToken, TokenError):
+            return Response(
+                {'valid': False, 'error': 'Token inválido ou expirado'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            user = User.objects.get(id=valid_token.get('user_id'))
+        except User.DoesNotExist:
+            return Response(
+                {'error': 'Usuário não encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        resources = data.get('resources')
+        if resources is None and data.get('resource'):
+            resources = [data['resource']]
+        permission_set = get_permission_set(user, resources)
+
+        response_data = {
+            'user_id': str(user.id),
+            'permissions': permission_set,
+            'expires_at': valid_token.get('exp'),
+        }
+        # Compatibilidade com a consulta de uma única ação
+        if data.get('resource') and data.get('action'):
+            response_data['authorized'] = is_action_allowed(
+                permission_set, data['resource'], data['action']
+            )
+        return Response(response_data)
+
+
 class ChangePasswordView(APIView):
     """
     View para alteração de senha
@@ -216,7 +277,18 @@ class RefreshTokenView(APIView):
         
         try:
             refresh = RefreshToken(refresh_token)
-            access_token = str(refresh.access_token)
+            access = refresh.access_token
+
+            # Atualiza os claims do usuário no novo access token
+            claims = get_user_claims(refresh.get('user_id'))
+            if claims is None:
+                return Response(
+                    {'error': 'Usuário não encontrado'},
+                    status=status.HTTP_401_UNAUTHORIZED
+                )
+            for claim, value in claims.items():
+                access[claim] = value
+            access_token = str(access)
             
             return Response({
                 'access': access_token,
@@ -0,0 +1,229 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_value(value):
+    # isoformat mantém os microssegundos (o DjangoJSONEncoder corta em milissegundos)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def decode_value(value, sample):
+    """Inverso de encode_value, com o tipo de sample (um valor da mesma coluna)."""
+    if isinstance(sample, datetime):
+        value = parse_datetime(value)
+    elif isinstance(sample, date):
+        value = parse_date(value)
+    elif isinstance(sample, Decimal):
+        value = Decimal(value)
+    elif not isinstance(value, type(sample)):
+        raise ValueError(value)
+    if value is None:
+        raise ValueError(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre uma ordenação estável.
+
+    Em vez de OFFSET, o cursor guarda os valores das colunas de ordenação do
+    último item da página e a próxima página é filtrada por
+    (created_at, id) < (valor, id): com um índice nessas colunas, a página
+    1000 custa o mesmo que a primeira.
+
+    A ordenação é a do queryset (busca por relevância, ?ordering=) ou, sem
+    nenhuma, cursor_ordering da view (padrão: mais recentes primeiro); o id
+    é acrescentado como desempate. O cursor é opaco e só vale para a mesma
+    ordenação. O tamanho da página vem de ?limit=, até max_page_size.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        self.ordering = ordering = self.complete_ordering(
+            queryset.query.order_by or getattr(view, 'cursor_ordering', self.ordering)
+        )
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+        if cursor:
+            try:
+                queryset = queryset.filter(self.keyset_filter(ordering, cursor['values'], reverse))
+            except (TypeError, ValueError, ValidationError):
+                # Valores que não cabem nas colunas (cursor montado à mão)
+                raise NotFound(self.invalid_cursor_message)
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Voltando (reverse), sempre há o item de onde o cursor partiu
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = results
+        return results
+
+    def paginate_rows(self, rows, ordering, request):
+        """
+        O mesmo que paginate_queryset para uma lista já ordenada por
+        complete_ordering(ordering) (ex.: o catálogo em memória do DoceCostura):
+        o cursor é localizado por busca binária e vale nos dois caminhos.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.complete_ordering(ordering)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['reverse'])
+        start, end = 0, len(rows)
+        if cursor and rows:
+            position = self.cursor_position(rows, cursor['values'], inclusive=reverse)
+            if reverse:
+                end = position
+            else:
+                start = position
+
+        if reverse:
+            results = rows[max(end - self.page_size, 0):end]
+            has_more = end > self.page_size
+        else:
+            results = rows[start:start + self.page_size]
+            has_more = start + self.page_size < len(rows)
+
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = results
+        return results
+
+    def cursor_position(self, rows, values, inclusive=False):
+        """Índice do primeiro item de rows depois do cursor (ou igual a ele, se inclusive)."""
+        names = [field.lstrip('-') for field in self.ordering]
+        descending = [field.startswith('-') for field in self.ordering]
+        try:
+            values = [decode_value(value, getattr(rows[0], name)) for value, name in zip(values, names)]
+        except (TypeError, ValueError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+
+        def compare(row):
+            for name, value, desc in zip(names, values, descending):
+                current = getattr(row, name)
+                if current != value:
+                    return 1 if (current < value) == desc else -1
+            return 0
+
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            try:
+                result = compare(rows[middle])
+            except TypeError:
+                # Ex.: data sem fuso horário num cursor montado à mão
+                raise NotFound(self.invalid_cursor_message)
+            if result > 0 or (inclusive and result == 0):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    @staticmethod
+    def complete_ordering(ordering):
+        """Ordenação com o id como desempate, na direção da última coluna."""
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    @staticmethod
+    def keyset_filter(ordering, values, reverse=False):
+        """(a, b) > (x, y) como a > x OR (a = x AND b > y), respeitando a direção de cada coluna."""
+        conditions = []
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            equal = [Q(**{previous.lstrip('-'): values[index]}) for index, previous in enumerate(ordering[:position])]
+            after = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+            conditions.append(reduce(and_, equal + [after]))
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            cursor = {'ordering': data['o'], 'values': data['v'], 'reverse': bool(data['r'])}
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor['ordering'] != self.ordering or len(cursor['values']) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, item, reverse):
+        values = [encode_value(getattr(item, field.lstrip('-'))) for field in self.ordering]
+        data = json.dumps({'o': self.ordering, 'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(data.encode()).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
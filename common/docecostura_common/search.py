@@ -0,0 +1,171 @@
+import logging
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.template import loader
+from rest_framework import filters
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 40
+MAX_QUERY_TERMS = 8
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Palavras sem valor de busca (já sem acentos)
+STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no',
+    'nas', 'nos', 'um', 'uma', 'uns', 'umas', 'para', 'pra', 'por', 'com', 'sem',
+    'ao', 'aos', 'ou', 'que', 'se',
+})
+
+
+def fold(text):
+    """Minúsculas e sem acentos: 'Bordado à Mão' -> 'bordado a mao'."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token):
+    """
+    Reduz o plural em português ao singular ('linhas' -> 'linha',
+    'botoes' -> 'botao', 'materiais' -> 'material'). Aplicado igualmente
+    aos textos indexados e às buscas, então só precisa ser consistente.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith(('oes', 'aes')):
+        return token[:-3] + 'ao'
+    if len(token) > 4 and token.endswith('ais'):
+        return token[:-2] + 'l'
+    if len(token) > 4 and token.endswith('eis'):
+        return token[:-3] + 'el'
+    if token.endswith('ns'):
+        return token[:-2] + 'm'
+    if token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Termos normalizados do texto, na ordem em que aparecem (com repetições)."""
+    return [
+        stem(token)[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(fold(text or ''))
+        if token not in STOPWORDS
+    ]
+
+
+class SearchIndex:
+    """
+    Índice de busca de um modelo, guardado no modelo de termos do serviço
+    (term_model: campos scope, object_id, term e weight, com índices em
+    (scope, term, object_id) e (scope, object_id, term)).
+
+    Cada objeto vira um termo por palavra distinta dos campos indexados,
+    com a soma dos pesos dos campos em que ela aparece. Cada palavra da
+    consulta seleciona, por prefixo, uma faixa do índice (scope, term);
+    todas as palavras precisam casar e o resultado é ordenado pela soma dos
+    pesos, dobrando os termos iguais à palavra buscada. O custo depende dos
+    objetos encontrados, não do tamanho do catálogo.
+    """
+
+    def __init__(self, term_model, scope, fields):
+        self.term_model = term_model
+        self.scope = scope
+        self.fields = fields  # {campo: peso}
+
+    def build_terms(self, obj):
+        terms = {}
+        for field, weight in self.fields.items():
+            for term in set(tokenize(str(getattr(obj, field) or ''))):
+                terms[term] = terms.get(term, 0) + weight
+        return terms
+
+    def update(self, objects):
+        """(Re)indexa os objetos: um DELETE e um INSERT em lote."""
+        objects = list(objects)
+        if not objects:
+            return
+        rows = [
+            self.term_model(scope=self.scope, object_id=obj.pk, term=term, weight=weight)
+            for obj in objects
+            for term, weight in self.build_terms(obj).items()
+        ]
+        with transaction.atomic():
+            self.remove([obj.pk for obj in objects])
+            self.term_model.objects.bulk_create(rows, batch_size=500)
+
+    def remove(self, object_ids):
+        self.term_model.objects.filter(scope=self.scope, object_id__in=object_ids).delete()
+
+    def rebuild(self, queryset, chunk_size=1000):
+        """Reindexa todo o queryset; devolve a quantidade de objetos."""
+        self.term_model.objects.filter(scope=self.scope).delete()
+        total = 0
+        chunk = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) == chunk_size:
+                self.update(chunk)
+                total += len(chunk)
+                chunk = []
+        self.update(chunk)
+        return total + len(chunk)
+
+    def search(self, queryset, query):
+        """
+        Filtra queryset pelos objetos que casam com todas as palavras de query,
+        anotados com search_rank e ordenados por relevância.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not tokens:
+            return queryset
+
+        exact, prefix = [], []
+        for token in tokens:
+            # Prefixo como faixa do índice (scope, term), em qualquer banco
+            # (no Postgres, LIKE 'x%' só usaria o índice com pattern_ops)
+            token_range = Q(term__gte=token, term__lte=token + 'z' * (MAX_TERM_LENGTH - len(token)))
+            matches = self.term_model.objects.filter(token_range, scope=self.scope)
+            queryset = queryset.filter(pk__in=matches.values('object_id'))
+            exact.append(When(term=token, then=F('weight') * 2))
+            prefix.append(When(token_range, then=F('weight')))
+
+        # Relevância: percorre só os termos do objeto encontrado (índice
+        # scope, object_id, term); termo igual à palavra buscada vale o dobro
+        rank = Subquery(
+            self.term_model.objects
+            .filter(scope=self.scope, object_id=OuterRef('pk'))
+            .order_by()
+            .values('object_id')
+            .annotate(rank=Sum(Case(*exact, *prefix, default=0, output_field=IntegerField())))
+            .values('rank'),
+            output_field=IntegerField()
+        )
+        return queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
+
+
+class SearchIndexFilter(filters.SearchFilter):
+    """
+    SearchFilter que consulta o índice de busca da view (search_index)
+    em vez de icontains em cada coluna. O parâmetro continua sendo ?search=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        index = getattr(view, 'search_index', None)
+        query = request.query_params.get(self.search_param, '')
+        if index is None or not query.strip():
+            return queryset
+        return index.search(queryset, query)
+
+    def to_html(self, request, queryset, view):
+        if not getattr(view, 'search_index', None):
+            return ''
+        context = {
+            'param': self.search_param,
+            'term': request.query_params.get(self.search_param, ''),
+        }
+        return loader.get_template(self.template).render(context)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from services.models import Product
+from services.search import product_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstrói o índice de busca de produtos. O índice é mantido a cada '
+        'escrita; use após alterações feitas com queryset.update().'
+    )
+
+    def handle(self, *args, **options):
+        total = product_index.rebuild(Product.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"{total} produtos indexados"))
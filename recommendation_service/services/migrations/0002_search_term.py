@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    # Só usa as funções de tokenização; as linhas são gravadas com o modelo histórico
+    from services.search import product_index
+
+    SearchTerm = apps.get_model('services', 'SearchTerm')
+    rows = [
+        SearchTerm(scope=product_index.scope, object_id=product.pk, term=term, weight=weight)
+        for product in apps.get_model('services', 'Product').objects.iterator()
+        for term, weight in product_index.build_terms(product).items()
+    ]
+    SearchTerm.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('term', models.CharField(max_length=40)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'term', 'object_id'], name='search_term_lookup')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('scope', 'object_id', 'term'), name='unique_search_term'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
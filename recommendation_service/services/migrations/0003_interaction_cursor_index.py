@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_search_term'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['timestamp', 'id'], name='interaction_timestamp_id'),
+        ),
+    ]
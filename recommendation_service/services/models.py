@@ -23,6 +23,26 @@ class Product(models.Model):
         ]
 
 
+class SearchTerm(models.Model):
+    """
+    Índice invertido da busca (services.search): um termo normalizado de um
+    objeto indexado, com o peso dos campos em que aparece.
+    """
+    scope = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    term = models.CharField(max_length=40)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('scope', 'object_id', 'term'), name='unique_search_term'),
+        ]
+        indexes = [
+            # Busca por faixa de termo (prefixo) sem ler a tabela de produtos
+            models.Index(fields=('scope', 'term', 'object_id'), name='search_term_lookup'),
+        ]
+
+
 class UserProfile(models.Model):
     """Modelo para armazenar perfis de usuários"""
     user_id = models.CharField(max_length=100, unique=True)
@@ -66,6 +86,8 @@ class UserInteraction(models.Model):
             models.Index(fields=['product']),
             models.Index(fields=['interaction_type']),
             models.Index(fields=['timestamp']),
+            # Paginação por cursor (docecostura_common.pagination)
+            models.Index(fields=['timestamp', 'id'], name='interaction_timestamp_id'),
         ]
 
 
@@ -0,0 +1,7 @@
+# Normalização, índice e filtro da busca ficam em docecostura_common.search,
+# compartilhado com o DoceCostura; aqui só o índice do serviço
+from docecostura_common.search import SearchIndex, SearchIndexFilter  # noqa: F401
+
+from .models import SearchTerm
+
+product_index = SearchIndex(SearchTerm, 'product', {'name': 3, 'category': 2, 'description': 1})
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product
+from .search import product_index
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Reindexa o produto salvo, se algum campo indexado pode ter mudado."""
+    if update_fields is not None and not set(update_fields) & set(product_index.fields):
+        return
+    product_index.update([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    product_index.remove([instance.pk])
@@ -1,3 +1,141 @@
+import base64
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Product, SearchTerm, UserInteraction, UserProfile
+from .search import product_index
+
+
+def make_cursor(ordering, values, reverse=False):
+    """Cursor no formato de KeysetPagination.encode_cursor, montado à mão."""
+    data = json.dumps({'o': ordering, 'v': values, 'r': int(reverse)})
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+class ProductSearchTests(TestCase):
+    """?search= em /products/: sem acentos, plural, prefixo, relevância e índice atualizado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bastidor = Product.objects.create(
+            product_id='BAS-01', name='Bastidor para bordado', category='Bordados',
+            price=Decimal('15.00'), description='Madeira'
+        )
+        cls.linha = Product.objects.create(
+            product_id='LIN-01', name='Linha de costura', category='Linhas',
+            price=Decimal('4.00'), description='Ideal para bordados à mão'
+        )
+        cls.agulhas = Product.objects.create(
+            product_id='AGU-01', name='Agulhas de mão', category='Aviamentos',
+            price=Decimal('6.00'), description='Kit com 10 agulhas'
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/recommendations/products/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_search_folds_accents_and_ranks_name_matches_first(self):
+        self.assertEqual(self.search('BORDADOS'), ['Bastidor para bordado', 'Linha de costura'])
+        self.assertEqual(self.search('mao'), ['Agulhas de mão', 'Linha de costura'])
+        self.assertEqual(self.search('agulha mão'), ['Agulhas de mão'])
+        self.assertEqual(self.search('aviamento'), ['Agulhas de mão'])
+        self.assertEqual(self.search('tesoura'), [])
+
+    def test_prefix_search_and_incremental_index(self):
+        self.assertEqual(self.search('bast'), ['Bastidor para bordado'])
+
+        self.linha.name = 'Linha para bastidor'
+        self.linha.save()
+        self.assertEqual(self.search('bast'), ['Bastidor para bordado', 'Linha para bastidor'])
+
+        self.bastidor.delete()
+        self.assertEqual(self.search('bast'), ['Linha para bastidor'])
+        self.assertFalse(SearchTerm.objects.filter(object_id=self.bastidor.pk).exists())
+
+    def test_blank_search_lists_everything(self):
+        self.assertEqual(len(self.search('  ')), 3)
+        self.assertEqual(len(self.search('de para')), 3)
+
+    def test_rebuild_command_recreates_the_index(self):
+        # update() não dispara sinais: o índice fica desatualizado até o rebuild
+        Product.objects.filter(pk=self.agulhas.pk).update(name='Tesoura de picotar')
+        self.assertEqual(self.search('tesoura'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('tesoura'), ['Tesoura de picotar'])
+        self.assertEqual(
+            set(SearchTerm.objects.filter(object_id=self.agulhas.pk).values_list('term', flat=True)),
+            set(product_index.build_terms(Product.objects.get(pk=self.agulhas.pk)))
+        )
+
+
+class InteractionKeysetPaginationTests(TestCase):
+    """Interações paginadas por cursor (timestamp, id), sem OFFSET."""
+
+    URL = '/api/recommendations/interactions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        user = UserProfile.objects.create(user_id='42')
+        product = Product.objects.create(
+            product_id='LIN-01', name='Linha de costura', category='Linhas', price=Decimal('4.00')
+        )
+        # Mesmo timestamp para todas: o id desempata
+        now = timezone.now()
+        UserInteraction.objects.bulk_create([
+            UserInteraction(user=user, product=product, interaction_type='view', timestamp=now)
+            for _ in range(25)
+        ])
+        cls.ids = list(UserInteraction.objects.order_by('-id').values_list('id', flat=True))
+
+    def walk(self, params=None):
+        pages = []
+        response = self.client.get(self.URL, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([item['id'] for item in data['results']])
+            if not data['next']:
+                return pages, data
+            response = self.client.get(data['next'])
+
+    def test_cursor_walks_every_interaction_once_in_order(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.URL, {'limit': 10})
+
+        pages, last = self.walk({'limit': 10})
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.ids)
+
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([item['id'] for item in previous['results']], pages[1])
+        self.assertIsNone(self.client.get(self.URL).json()['previous'])
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.client.get(self.URL).json()['results']), 20)
+        self.assertEqual(len(self.client.get(self.URL, {'limit': 'x'}).json()['results']), 20)
+        with mock.patch('docecostura_common.pagination.KeysetPagination.max_page_size', 5):
+            response = self.client.get(self.URL, {'limit': 1000})
+        self.assertEqual(len(response.json()['results']), 5)
 
-# Create your tests here.
+    def test_invalid_and_tampered_cursors_are_rejected(self):
+        ordering = ['-timestamp', '-id']
+        for cursor in (
+            'invalido',
+            base64.urlsafe_b64encode(b'{"o": 1}').decode(),
+            make_cursor(['-created_at', '-id'], ['2026-10-18T10:00:00+00:00', 1]),
+            make_cursor(ordering, [1]),
+            make_cursor(ordering, ['abc', 1]),
+            make_cursor(ordering, [timezone.now().isoformat(), 'x']),
+            make_cursor(ordering, [None, 1]),
+            make_cursor(ordering, [[1], 2]),
+        ):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(self.URL, {'cursor': cursor}).status_code, 404)
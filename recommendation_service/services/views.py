@@ -1,11 +1,12 @@
 from django.shortcuts import render
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
+from docecostura_common.pagination import KeysetPagination
 
 from .models import Product, UserProfile, UserInteraction, Recommendation, SimilarProducts
 from .serializers import (
@@ -16,6 +17,7 @@ from .serializers import (
     SimilarProductsSerializer
 )
 from .recommendation_engine import RecommendationEngine
+from .search import SearchIndexFilter, product_index
 
 # Create your views here.
 
@@ -23,8 +25,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     """ViewSet para operações CRUD em produtos"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['name', 'category', 'description']
+    # ?search= usa o índice invertido (services.search), ordenado por relevância
+    filter_backends = [SearchIndexFilter]
+    search_index = product_index
     
     @action(detail=True, methods=['get'])
     def similar_products(self, request, pk=None):
@@ -112,6 +115,8 @@ class UserInteractionViewSet(viewsets.ModelViewSet):
     """ViewSet para registrar interações de usuário"""
     queryset = UserInteraction.objects.all()
     serializer_class = UserInteractionSerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-timestamp', '-id')
     
     def create(self, request, *args, **kwargs):
         """Registra uma nova interação de usuário e atualiza recomendações"""